@@ -1,8 +1,13 @@
-from flask import Flask, redirect, url_for
+from flask import Flask, Response, abort, redirect, url_for
 from flask_login import LoginManager
 import os
-from auth import User
-from csv_handler import get_user_by_id
+from auth import User, user_from_session
+from storage import get_user_by_id
+import metrics
+import user_cache
+
+# Build current_user from the signed session cookie instead of storage
+USER_SESSION_CACHE = os.environ.get('USER_SESSION_CACHE', '').lower() in ('1', 'true', 'yes')
 
 # Initialize extensions
 login_manager = LoginManager()
@@ -10,8 +15,7 @@ login_manager = LoginManager()
 def create_app():
     app = Flask(__name__, template_folder='../templates')
 
-    @login_manager.user_loader
-    def load_user(user_id):
+    def build_user(user_id):
         user_data = get_user_by_id(user_id)
         if user_data:
             return User(
@@ -22,6 +26,14 @@ def create_app():
             )
         return None
 
+    @login_manager.user_loader
+    def load_user(user_id):
+        if USER_SESSION_CACHE:
+            user = user_from_session(user_id)
+            if user:
+                return user
+        return user_cache.cache.get(user_id, build_user)
+
     # Configuration
     app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-secret-key-change-in-production')
 
@@ -33,15 +45,24 @@ def create_app():
     def home():
         return redirect(url_for('auth.login'))
 
+    @app.route('/metrics')
+    def metrics_endpoint():
+        # Prometheus scrape target; only served when METRICS_ENABLED is on
+        if not metrics.METRICS_ENABLED:
+            abort(404)
+        return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
     # Register blueprints
     from auth import auth_bp
     from reminders import reminders_bp
+    from internal import internal_bp
 
     app.register_blueprint(auth_bp)
     app.register_blueprint(reminders_bp)
+    app.register_blueprint(internal_bp)
 
     # Note: BackgroundScheduler removed for Vercel deployment
-    # Email reminders will need to be handled differently in serverless environment
+    # Email reminders are sent by scheduler.py, or by a cron calling /internal/sweep (see internal.py)
 
     return app
 
@@ -1,7 +1,7 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash
-from werkzeug.security import generate_password_hash, check_password_hash
+from flask import Blueprint, render_template, request, redirect, url_for, flash, session
 from flask_login import login_user, login_required, logout_user, current_user
-from csv_handler import add_user, get_user_by_email, get_user_by_id, update_user_email_credentials
+from passwords import PasswordCheckTimeout, hash_password, needs_rehash, verify_password
+from storage import EmailTakenError, add_user, get_user_by_email, get_user_by_id, update_user_email_credentials, update_user_password_hash
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -24,6 +24,20 @@ class User:
     def is_anonymous(self):
         return False
 
+# Public fields of the logged-in user, kept in the signed session cookie so
+# the user loader can skip storage (see USER_SESSION_CACHE in app.py). The
+# cookie is signed, not encrypted, so no password hash goes in it.
+SESSION_USER_KEY = '_user'
+
+def remember_in_session(user):
+    session[SESSION_USER_KEY] = {'id': str(user.id), 'username': user.username, 'email': user.email}
+
+def user_from_session(user_id):
+    data = session.get(SESSION_USER_KEY)
+    if not data or data.get('id') != str(user_id):
+        return None
+    return User(id=data['id'], username=data['username'], email=data['email'], password_hash=None)
+
 @auth_bp.route('/register', methods=['GET', 'POST'])
 def register():
     if request.method == 'POST':
@@ -38,8 +52,13 @@ def register():
             return redirect(url_for('auth.register'))
         
         # Create new user
-        password_hash = generate_password_hash(password, method='sha256')
-        user_id = add_user(username, email, password_hash)
+        password_hash = hash_password(password)
+        try:
+            user_id = add_user(username, email, password_hash)
+        except EmailTakenError:
+            # Someone registered the same email since the check above
+            flash('Email address already exists')
+            return redirect(url_for('auth.register'))
         
         flash('Account created successfully! Please log in.')
         return redirect(url_for('auth.login'))
@@ -54,7 +73,16 @@ def login():
         
         user_data = get_user_by_email(email)
         
-        if user_data and check_password_hash(user_data['password_hash'], password):
+        try:
+            valid = bool(user_data) and verify_password(user_data['password_hash'], password)
+        except PasswordCheckTimeout:
+            flash('Login is busy right now, please try again.')
+            return render_template('login.html')
+        
+        if valid:
+            # Upgrade hashes made with older settings while we have the password
+            if needs_rehash(user_data['password_hash']):
+                update_user_password_hash(user_data['id'], hash_password(password))
             user = User(
                 id=user_data['id'],
                 username=user_data['username'],
@@ -62,6 +90,7 @@ def login():
                 password_hash=user_data['password_hash']
             )
             login_user(user)
+            remember_in_session(user)
             return redirect(url_for('reminders.dashboard'))
         else:
             flash('Invalid email or password')
@@ -72,6 +101,7 @@ def login():
 @login_required
 def logout():
     logout_user()
+    session.pop(SESSION_USER_KEY, None)
     return redirect(url_for('auth.login'))
 
 @auth_bp.route('/email_credentials', methods=['GET', 'POST'])
@@ -84,8 +114,14 @@ def email_credentials():
         new_email = request.form.get('email')
         new_app_password = request.form.get('app_password')
         if new_email and new_app_password:
-            success = update_user_email_credentials(user_id, new_email, new_app_password)
+            try:
+                success = update_user_email_credentials(user_id, new_email, new_app_password)
+            except EmailTakenError:
+                flash('Email address already exists')
+                return redirect(url_for('auth.email_credentials'))
             if success:
+                if session.get(SESSION_USER_KEY):
+                    session[SESSION_USER_KEY] = dict(session[SESSION_USER_KEY], email=new_email)
                 flash('Email credentials updated successfully.')
             else:
                 flash('Failed to update email credentials.')
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Benchmark: edit every row of a 10k-row reminders.csv, full rewrite vs journaled mode
+"""
+import os
+import sys
+import time
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import csv_handler
+
+ROWS = int(os.environ.get('BENCH_ROWS', 10000))
+# Full rewrites are O(N) each, so only a sample is timed and the total extrapolated
+REWRITE_SAMPLE = int(os.environ.get('BENCH_REWRITE_SAMPLE', 200))
+
+def setup(journaled):
+    tmp_dir = tempfile.mkdtemp()
+    csv_handler.USERS_CSV = os.path.join(tmp_dir, 'users.csv')
+    csv_handler.REMINDERS_CSV = os.path.join(tmp_dir, 'reminders.csv')
+    csv_handler.REMINDERS_JOURNAL = journaled
+    csv_handler.init_csv_files()
+
+    # Seed in journaled mode (appends are cheap either way) and start from a clean snapshot
+    csv_handler.REMINDERS_JOURNAL = True
+    start = datetime.now() + timedelta(days=1)
+    ids = [
+        csv_handler.add_reminder(i % 100 + 1, f'Reminder {i}', 'benchmark row', start + timedelta(minutes=i))
+        for i in range(ROWS)
+    ]
+    csv_handler.compact_reminders()
+    csv_handler.REMINDERS_JOURNAL = journaled
+    return ids
+
+def edit(ids):
+    when = datetime.now() + timedelta(days=2)
+    begin = time.perf_counter()
+    for reminder_id in ids:
+        csv_handler.update_reminder(reminder_id, f'Edited {reminder_id}', 'edited', when)
+    return time.perf_counter() - begin
+
+def main():
+    ids = setup(journaled=False)
+    sample = ids[:REWRITE_SAMPLE]
+    rewrite_time = edit(sample)
+    rewrite_total = rewrite_time / len(sample) * len(ids)
+    print(f"Full rewrite: {len(sample)} edits in {rewrite_time:.2f}s "
+          f"({rewrite_time / len(sample) * 1000:.2f} ms/edit, ~{rewrite_total:.1f}s for {len(ids)} edits)")
+
+    ids = setup(journaled=True)
+    journal_time = edit(ids)
+    print(f"Journaled:    {len(ids)} edits in {journal_time:.2f}s "
+          f"({journal_time / len(ids) * 1000:.3f} ms/edit, compaction threshold {csv_handler.JOURNAL_COMPACT_BYTES} bytes)")
+
+    begin = time.perf_counter()
+    csv_handler.compact_reminders()
+    print(f"Final compaction: {time.perf_counter() - begin:.3f}s")
+    print(f"Speedup: {rewrite_total / journal_time:.0f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Benchmark: login throughput for a burst of concurrent logins at different
+hash settings, verifying inline on the request threads vs in a process pool
+"""
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import passwords
+
+LOGINS = int(os.environ.get('BENCH_LOGINS', 64))
+THREADS = int(os.environ.get('BENCH_THREADS', 16))
+WORKERS = [int(n) for n in os.environ.get('BENCH_WORKERS', f'0,2,{os.cpu_count() or 1}').split(',')]
+METHODS = os.environ.get('BENCH_METHODS', 'pbkdf2:sha256:100000,pbkdf2:sha256:600000,scrypt:32768:8:1').split(',')
+
+def burst(password_hash):
+    """Seconds for LOGINS verifications spread over THREADS request threads"""
+    with ThreadPoolExecutor(max_workers=THREADS) as threads:
+        begin = time.perf_counter()
+        results = list(threads.map(lambda _: passwords.verify_password(password_hash, 'secret'), range(LOGINS)))
+        elapsed = time.perf_counter() - begin
+    assert all(results)
+    return elapsed
+
+def main():
+    print(f"{LOGINS} logins over {THREADS} threads, {os.cpu_count()} CPUs")
+    for method in METHODS:
+        password_hash = passwords.hash_password('secret', method=method)
+        begin = time.perf_counter()
+        passwords.verify_password(password_hash, 'secret')
+        single = time.perf_counter() - begin
+        for workers in WORKERS:
+            passwords.PASSWORD_VERIFY_WORKERS = workers
+            if workers:
+                burst(password_hash)  # start the workers outside the timing
+            elapsed = burst(password_hash)
+            passwords.shutdown_pool()
+            label = 'inline' if not workers else f'pool of {workers}'
+            print(f"{method:24} {label:10} one {single * 1000:7.1f} ms   "
+                  f"{LOGINS / elapsed:7.1f} logins/s   burst {elapsed:6.2f} s")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Benchmark: building reminder emails the old way (MIMEMultipart + f-string +
+as_string) vs messages.py, per reminder and as digests
+"""
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import messages
+from records import Reminder
+
+ROWS = int(os.environ.get('BENCH_ROWS', 10000))
+PER_RECIPIENT = int(os.environ.get('BENCH_PER_RECIPIENT', 5))
+REPEAT = int(os.environ.get('BENCH_REPEAT', 3))
+
+def best(func):
+    times = []
+    for _ in range(REPEAT):
+        messages._display_time.cache_clear()
+        begin = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - begin)
+    return min(times)
+
+def old_message(reminder):
+    msg = MIMEMultipart()
+    msg["From"] = 'sender@example.com'
+    msg["To"] = 'to@example.com'
+    msg["Subject"] = f"Reminder: {reminder.title}"
+    body = f"""
+        Hello!
+
+        This is a reminder for: {reminder.title}
+
+        Description: {reminder.description or 'No description provided'}
+
+        Scheduled Time: {reminder.reminder_time.strftime('%Y-%m-%d %H:%M')}
+
+        ---
+        This is an automated reminder from the Reminder App.
+        """
+    msg.attach(MIMEText(body, "plain"))
+    return msg.as_string()
+
+def main():
+    start = datetime(2030, 1, 1, 9, 0, 0)
+    reminders = [Reminder(i, 1, f'Reminder {i}', 'Some description', start + timedelta(hours=i % 24), start)
+                 for i in range(ROWS)]
+
+    old = best(lambda: [old_message(reminder) for reminder in reminders])
+    new = best(lambda: [messages.serialize(messages.build_reminder_message(
+        'sender@example.com', 'to@example.com', r.title, r.description, r.reminder_time)) for r in reminders])
+    digest = best(lambda: [messages.serialize(messages.build_digest_message(
+        'sender@example.com', 'to@example.com', reminders[i:i + PER_RECIPIENT]))
+        for i in range(0, ROWS, PER_RECIPIENT)])
+
+    print(f"{ROWS} reminders")
+    print(f"{'MIMEMultipart + as_string':28} {old * 1000:8.1f} ms   {ROWS} messages")
+    print(f"{'EmailMessage, per reminder':28} {new * 1000:8.1f} ms   {ROWS} messages   {old / new:4.1f}x")
+    print(f"{'EmailMessage, digests':28} {digest * 1000:8.1f} ms   {-(-ROWS // PER_RECIPIENT)} messages   {old / digest:4.1f}x")
+
+if __name__ == '__main__':
+    main()
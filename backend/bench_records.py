@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Benchmark: memory held by 100k cached reminders, dicts of strings vs slotted records
+"""
+import csv
+import gc
+import io
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import csv_handler
+from records import Reminder
+
+ROWS = int(os.environ.get('BENCH_ROWS', 100000))
+
+def make_csv():
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=csv_handler.REMINDER_FIELDS)
+    writer.writeheader()
+    start = datetime(2030, 1, 1, 9, 0, 0)
+    created = datetime(2029, 12, 1, 8, 30, 0).strftime('%Y-%m-%d %H:%M:%S')
+    for i in range(ROWS):
+        writer.writerow({
+            'id': i + 1,
+            'user_id': i % 500 + 1,
+            'title': f'Reminder {i}',
+            'description': 'benchmark row',
+            'reminder_time': (start + timedelta(minutes=i)).strftime('%Y-%m-%d %H:%M:%S'),
+            'created_at': created,
+            'is_completed': 'True' if i % 3 == 0 else 'False',
+            'recipient_email': '',
+        })
+    return buf.getvalue()
+
+def measure(label, build, data):
+    begin = time.perf_counter()
+    build(csv.DictReader(io.StringIO(data)))
+    elapsed = time.perf_counter() - begin
+
+    # Measured separately: tracing slows the build down a lot
+    gc.collect()
+    tracemalloc.start()
+    rows = build(csv.DictReader(io.StringIO(data)))
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:8} {len(rows)} rows: {size / 1024 / 1024:7.1f} MiB "
+          f"({size / len(rows):.0f} bytes/row), built in {elapsed:.2f}s")
+    return size
+
+def main():
+    data = make_csv()
+    dict_size = measure('dicts', lambda reader: {row['id']: row for row in reader}, data)
+    record_size = measure('records', lambda reader: {row.id: row for row in map(Reminder.from_dict, reader)}, data)
+    print(f"Records use {record_size / dict_size:.0%} of the memory of dicts")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite: storage, sweep, import and export on synthetic data.
+
+For each size it writes a fresh users.csv / reminders.csv (SIZE reminders,
+one user per 100 of them, user 1 owning 10% so export has something to
+stream), then times:
+
+  load_cold                 first read after the files change (CSV only)
+  get_reminders_by_user_id  warm lookups, one per user sampled
+  add_reminder / update_reminder
+  sweep                     check_and_send_reminders against a local SMTP sink
+  import / export           the Flask routes, through the test client
+
+Results go to stdout (or --output) as JSON. --compare takes an earlier
+result file and lists every benchmark that got slower by more than
+--threshold, exiting 1 if there are any, so it can gate a CI job.
+
+    python bench_suite.py --sizes 1k,10k,100k,1m --output run.json
+    python bench_suite.py --compare run.json
+
+STORAGE_BACKEND=sqlite runs the same benchmarks on the SQLite backend (the
+generated CSV files are migrated into a fresh database first).
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from flask import Flask
+
+import csv_handler
+import email_service
+import smtp_pool
+import storage
+from dispatcher import Dispatcher
+from records import Reminder, User
+from smtp_sink import SMTPSink
+
+DEFAULT_SIZES = os.environ.get('BENCH_SIZES', '1k,10k')
+REPEAT = int(os.environ.get('BENCH_REPEAT', 3))
+# Operations per timed run; writes that rewrite a whole file get fewer
+LOOKUPS = int(os.environ.get('BENCH_LOOKUPS', 100))
+ADDS = int(os.environ.get('BENCH_ADDS', 100))
+UPDATES = int(os.environ.get('BENCH_UPDATES', 10))
+# Reminders already due when the sweep runs (at most 10% of the size)
+DUE = int(os.environ.get('BENCH_DUE', 1000))
+IMPORT_ROWS = int(os.environ.get('BENCH_IMPORT_ROWS', 1000))
+
+def parse_size(value):
+    value = value.strip().lower()
+    multiplier = {'k': 1000, 'm': 1000000}.get(value[-1:], 1)
+    return int(float(value.rstrip('km')) * multiplier)
+
+def generate(tmp_dir, size):
+    """Write the synthetic CSV files; returns (user ids, number of due reminders)"""
+    users = max(size // 100, 10)
+    due = min(DUE, size // 10)
+    start = datetime.now().replace(microsecond=0)
+    with open(os.path.join(tmp_dir, 'users.csv'), 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=csv_handler.USER_FIELDS, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(User(i, f'user{i}', f'user{i}@example.com', 'hash', f'app-pw-{i}')
+                         for i in range(1, users + 1))
+    with open(os.path.join(tmp_dir, 'reminders.csv'), 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=csv_handler.REMINDER_FIELDS, extrasaction='ignore')
+        writer.writeheader()
+        for i in range(1, size + 1):
+            user_id = 1 if i % 10 == 0 else i % users + 1
+            # The first ``due`` reminders are in the past, the rest spread over the next year
+            when = start - timedelta(minutes=i) if i <= due else start + timedelta(minutes=i % 525600 + 60)
+            writer.writerow(Reminder(i, user_id, f'Reminder {i}', 'benchmark row', when, start))
+    return list(range(1, users + 1)), due
+
+def use_files(tmp_dir):
+    csv_handler.USERS_CSV = os.path.join(tmp_dir, 'users.csv')
+    csv_handler.REMINDERS_CSV = os.path.join(tmp_dir, 'reminders.csv')
+    if storage.STORAGE_BACKEND == 'sqlite':
+        storage.backend.SQLITE_PATH = os.path.join(tmp_dir, 'alertify.db')
+    storage.init_storage()
+
+def drop_caches():
+    """Make the CSV store re-read its files on the next call"""
+    for table in [csv_handler._users, csv_handler._reminders, *csv_handler._reminder_shards.values()]:
+        table.signature = None
+
+def timed(func, repeat=REPEAT, setup=None):
+    runs = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        begin = time.perf_counter()
+        func()
+        runs.append(time.perf_counter() - begin)
+    return runs
+
+def logged_in_client(user_id):
+    from app import create_app
+    app = create_app()
+    app.config['TESTING'] = True
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+    return client
+
+def import_upload(rows, offset):
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(['title', 'description', 'reminder_time', 'recipient_email'])
+    start = datetime(2031, 1, 1)
+    for i in range(rows):
+        writer.writerow([f'Imported {offset + i}', 'from bench', (start + timedelta(minutes=offset + i)).strftime('%Y-%m-%d %H:%M:%S'), ''])
+    return out.getvalue().encode('utf-8')
+
+def run_size(size):
+    """Every benchmark at one size; returns {name: (ops per run, [seconds per run])}"""
+    tmp_dir = tempfile.mkdtemp(prefix=f'alertify-bench-{size}-')
+    begin = time.perf_counter()
+    user_ids, due = generate(tmp_dir, size)
+    generated = time.perf_counter() - begin
+    use_files(tmp_dir)
+    results = {'generate': (size, [generated])}
+    sample = user_ids[:LOOKUPS]
+
+    if storage.STORAGE_BACKEND == 'csv':
+        results['load_cold'] = (1, timed(lambda: storage.get_reminders_by_user_id(1), setup=drop_caches))
+
+    storage.get_reminders_by_user_id(1)
+    results['get_reminders_by_user_id'] = (len(sample), timed(
+        lambda: [storage.get_reminders_by_user_id(user_id) for user_id in sample]))
+
+    when = datetime.now() + timedelta(days=30)
+    results['add_reminder'] = (ADDS, timed(
+        lambda: [storage.add_reminder(user_ids[i % len(user_ids)], f'Added {i}', '', when) for i in range(ADDS)]))
+
+    # Ids past the due ones, so the sweep below still has its full set
+    targets = list(range(size, size - UPDATES, -1))
+    results['update_reminder'] = (len(targets), timed(
+        lambda: [storage.update_reminder(reminder_id, f'Updated {reminder_id}', 'edited', when) for reminder_id in targets]))
+
+    client = logged_in_client(1)
+    exported = len(storage.get_reminders_by_user_id(1))
+    def do_export():
+        response = client.get('/export_reminders?gzip=0')
+        assert sum(len(chunk) for chunk in response.response) > 0
+    results['export'] = (exported, timed(do_export))
+
+    uploads = [import_upload(IMPORT_ROWS, IMPORT_ROWS * run) for run in range(REPEAT)]
+    def do_import():
+        upload = uploads.pop()
+        response = client.post('/import_reminders', data={'csv_file': (io.BytesIO(upload), 'bench.csv')},
+                               headers={'Accept': 'application/json'}, content_type='multipart/form-data')
+        assert response.status_code == 200, response.status_code
+    results['import'] = (IMPORT_ROWS, timed(do_import))
+
+    # Sends every due reminder once, so it is only run once
+    with SMTPSink() as sink:
+        email_service.smtp_pool.pool = smtp_pool.SMTPConnectionPool(host=sink.host, port=sink.port, starttls=False)
+        email_service.dispatcher = Dispatcher(rate=1e9, burst=10 ** 9)
+        try:
+            results['sweep'] = (due, timed(lambda: email_service.check_and_send_reminders(Flask(__name__)), repeat=1))
+        finally:
+            email_service.smtp_pool.pool.close_all()
+        assert len(sink.messages) == due, (len(sink.messages), due)
+    return results
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+def summarize(size, name, ops, runs):
+    best = min(runs)
+    return {
+        'size': size,
+        'name': name,
+        'ops': ops,
+        'runs': [round(run, 6) for run in runs],
+        'min': round(best, 6),
+        'median': round(statistics.median(runs), 6),
+        'per_op': round(best / ops, 9) if ops else None,
+    }
+
+def compare(current, baseline, threshold):
+    """Benchmarks in ``current`` slower than in ``baseline`` by more than ``threshold``x"""
+    before = {(r['size'], r['name']): r for r in baseline['results']}
+    regressions = []
+    for result in current['results']:
+        old = before.get((result['size'], result['name']))
+        if old and old['min'] > 0 and result['min'] / old['min'] > threshold:
+            regressions.append({'size': result['size'], 'name': result['name'],
+                                'before': old['min'], 'after': result['min'],
+                                'ratio': round(result['min'] / old['min'], 2)})
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark storage, sweep, import and export on synthetic data.')
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help='comma-separated reminder counts, e.g. 1k,10k,100k,1m')
+    parser.add_argument('--output', help='write the JSON results here instead of stdout')
+    parser.add_argument('--compare', help='earlier results to check this run against')
+    parser.add_argument('--threshold', type=float, default=1.25, help='slowdown ratio reported as a regression')
+    args = parser.parse_args(argv)
+
+    sizes = [parse_size(size) for size in args.sizes.split(',') if size.strip()]
+    report = {
+        'meta': {
+            'started': datetime.now().isoformat(timespec='seconds'),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'backend': storage.STORAGE_BACKEND,
+            'repeat': REPEAT,
+            'sizes': sizes,
+        },
+        'results': [],
+    }
+    for size in sizes:
+        print(f"Running size {size}...", file=sys.stderr)
+        # The app logs each send with print(); keep stdout for the JSON
+        with redirect_stdout(sys.stderr):
+            results = run_size(size)
+        for name, (ops, runs) in results.items():
+            report['results'].append(summarize(size, name, ops, runs))
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            report['regressions'] = compare(report, json.load(f), args.threshold)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+    for regression in report.get('regressions', []):
+        print(f"⚠️  {regression['name']} at {regression['size']} rows: {regression['before']:.4f}s -> "
+              f"{regression['after']:.4f}s ({regression['ratio']}x)", file=sys.stderr)
+    return 1 if report.get('regressions') else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Benchmark: strptime/strftime vs the timestamps codec on 100k reminder rows
+"""
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import timestamps
+
+ROWS = int(os.environ.get('BENCH_ROWS', 100000))
+REPEAT = int(os.environ.get('BENCH_REPEAT', 3))
+
+def best(func):
+    times = []
+    for _ in range(REPEAT):
+        timestamps._parse.cache_clear()
+        timestamps._format.cache_clear()
+        timestamps.from_epoch.cache_clear()
+        begin = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - begin)
+    return min(times)
+
+def report(label, old, new):
+    print(f"{label:32} strptime/strftime {old * 1000:7.1f} ms   codec {new * 1000:7.1f} ms   {old / new:5.1f}x")
+
+def main():
+    start = datetime(2030, 1, 1, 9, 0, 0)
+    times = [start + timedelta(minutes=i) for i in range(ROWS)]
+    strings = [when.strftime(timestamps.TIME_FORMAT) for when in times]
+    epochs = [str(timestamps.to_epoch(when)) for when in times]
+    # Rows as the sweep sees them: reminder_time plus a created_at shared by each import batch
+    rows = [{'reminder_time': value, 'created_at': strings[i - i % 1000], 'is_completed': 'False'}
+            for i, value in enumerate(strings)]
+    now = times[ROWS // 2]
+
+    report('parse (all distinct)',
+           best(lambda: [datetime.strptime(value, timestamps.TIME_FORMAT) for value in strings]),
+           best(lambda: [timestamps.parse_time(value) for value in strings]))
+    report('format (all distinct)',
+           best(lambda: [when.strftime(timestamps.TIME_FORMAT) for when in times]),
+           best(lambda: [timestamps.format_time(when) for when in times]))
+    report('decode row (2 timestamps)',
+           best(lambda: [(datetime.strptime(row['reminder_time'], timestamps.TIME_FORMAT),
+                          datetime.strptime(row['created_at'], timestamps.TIME_FORMAT)) for row in rows]),
+           best(lambda: [(timestamps.parse_time(row['reminder_time']),
+                          timestamps.parse_time(row['created_at'])) for row in rows]))
+
+    # The sweep's per-row work before records: parse reminder_time and compare
+    report('sweep scan',
+           best(lambda: [row for row in rows if row['is_completed'] != 'True'
+                         and datetime.strptime(row['reminder_time'], timestamps.TIME_FORMAT) <= now]),
+           best(lambda: [row for row in rows if row['is_completed'] != 'True'
+                         and timestamps.parse_time(row['reminder_time']) <= now]))
+
+    epoch_time = best(lambda: [timestamps.from_epoch(value) for value in epochs])
+    string_time = best(lambda: [timestamps.parse_time(value) for value in strings])
+    print(f"{'epoch column vs string (decode)':32} epoch {epoch_time * 1000:7.1f} ms   string {string_time * 1000:7.1f} ms")
+
+if __name__ == '__main__':
+    main()
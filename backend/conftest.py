@@ -0,0 +1,67 @@
+"""
+Shared pytest fixtures for the backend test scripts.
+
+Each test starts with the data files pointed at its own temporary directory
+(``temp_files``), and module-level settings the tests swap out (the SMTP pool,
+the dispatcher, the sweep token, feature flags, ...) are put back afterwards,
+so one test's setup never leaks into the next.
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import csv_handler
+import email_service
+import internal
+import metrics
+import outbox
+import passwords
+import scheduler
+import smtp_pool
+import sqlite_handler
+import user_cache
+
+# Module globals that tests replace; each one is restored after every test
+SHARED_STATE = [
+    (csv_handler, 'USERS_CSV'),
+    (csv_handler, 'REMINDERS_CSV'),
+    (csv_handler, 'REMINDERS_JOURNAL'),
+    (csv_handler, 'REMINDER_SHARDS'),
+    (sqlite_handler, 'SQLITE_PATH'),
+    (outbox, 'OUTBOX_PATH'),
+    (smtp_pool, 'pool'),
+    (email_service, 'dispatcher'),
+    (email_service, 'send_digest_email'),
+    (email_service, 'EMAIL_DIGEST'),
+    (email_service, 'EMAIL_OUTBOX'),
+    (internal, 'SWEEP_TOKEN'),
+    (internal, 'SWEEP_CHECKPOINT'),
+    (internal, 'SWEEP_LOCK'),
+    (metrics, 'METRICS_ENABLED'),
+    (passwords, 'PASSWORD_VERIFY_WORKERS'),
+    (passwords, 'PASSWORD_VERIFY_TIMEOUT'),
+    (passwords, '_get_pool'),
+    (scheduler, 'check_and_send_reminders'),
+]
+
+@pytest.fixture(autouse=True)
+def restore_shared_state(monkeypatch):
+    for module, name in SHARED_STATE:
+        monkeypatch.setattr(module, name, getattr(module, name))
+
+@pytest.fixture
+def temp_files(monkeypatch, tmp_path):
+    """Fresh, empty data files in a temporary directory; returns its path"""
+    tmp_dir = str(tmp_path)
+    monkeypatch.setattr(csv_handler, 'USERS_CSV', os.path.join(tmp_dir, 'users.csv'))
+    monkeypatch.setattr(csv_handler, 'REMINDERS_CSV', os.path.join(tmp_dir, 'reminders.csv'))
+    monkeypatch.setattr(sqlite_handler, 'SQLITE_PATH', os.path.join(tmp_dir, 'alertify.db'))
+    monkeypatch.setattr(outbox, 'OUTBOX_PATH', os.path.join(tmp_dir, 'outbox.db'))
+    monkeypatch.setattr(internal, 'SWEEP_CHECKPOINT', os.path.join(tmp_dir, 'sweep.cursor'))
+    monkeypatch.setattr(internal, 'SWEEP_LOCK', os.path.join(tmp_dir, 'sweep'))
+    csv_handler.init_csv_files()
+    user_cache.cache.clear()
+    return tmp_dir
@@ -1,262 +1,988 @@
+import bisect
 import csv
+import heapq
+import math
+import io
 import os
+import functools
+import json
+import tempfile
+import zlib
+from contextlib import ExitStack
 from datetime import datetime
 from werkzeug.security import generate_password_hash, check_password_hash
+import file_lock
+from records import EmailTakenError, Reminder, User, normalize_email
+from timestamps import parse_time
 
 # File paths - use /tmp for Vercel deployment
 TMP_DIR = '/tmp'
 USERS_CSV = os.path.join(TMP_DIR, 'users.csv')
 REMINDERS_CSV = os.path.join(TMP_DIR, 'reminders.csv')
+# Sidecar files holding the last id handed out for each CSV
+SEQUENCE_SUFFIX = '.seq'
+
+USER_FIELDS = ['id', 'username', 'email', 'password_hash', 'app_password']
+REMINDER_FIELDS = ['id', 'user_id', 'title', 'description', 'reminder_time', 'created_at', 'is_completed', 'recipient_email']
+# Also store reminder_time as integer seconds (reminder_epoch); when present
+# it is read instead of parsing the string
+REMINDER_EPOCH_COLUMN = os.environ.get('REMINDER_EPOCH_COLUMN', '').lower() in ('1', 'true', 'yes')
+if REMINDER_EPOCH_COLUMN:
+    REMINDER_FIELDS = REMINDER_FIELDS + ['reminder_epoch']
+
+# Split reminders over this many files by a hash of user_id (1 = reminders.csv only)
+REMINDER_SHARDS = max(int(os.environ.get('REMINDER_SHARDS', 1)), 1)
+# JSON file next to reminders.csv recording the shard layout in use
+MANIFEST_SUFFIX = '.manifest'
+
+# Journaled mode: append reminder changes to a log instead of rewriting reminders.csv
+REMINDERS_JOURNAL = os.environ.get('REMINDERS_JOURNAL', '').lower() in ('1', 'true', 'yes')
+JOURNAL_COMPACT_BYTES = int(os.environ.get('JOURNAL_COMPACT_BYTES', 1024 * 1024))
+
+# In-memory store
+class _CsvTable:
+    """Process-level copy of one CSV file, indexed by id and selected columns.
+
+    The file is parsed once and kept in memory; it is only re-read when its
+    mtime or size changes on disk (e.g. another worker wrote to it). Writes go
+    through to the file and the recorded signature is refreshed so our own
+    writes don't trigger a reload.
+
+    In journaled mode a mutation appends one small record to ``<file>.journal``
+    instead of rewriting the whole file. Reads merge the base file with the
+    journal, and once the journal passes ``JOURNAL_COMPACT_BYTES`` it is folded
+    back into a fresh snapshot of the base file.
+    """
+
+    def __init__(self, fieldnames, record_type, unique=(), grouped=(), normalize=None):
+        self.fieldnames = fieldnames
+        self.record_type = record_type
+        self.unique = unique
+        self.grouped = grouped
+        # field -> function applied to values before they are indexed or looked up
+        self.normalize = normalize or {}
+        self.journaled = False
+        self.path = None
+        self.journal_path = None
+        self.journal_offset = 0
+        self.signature = None
+        # Column names in the file's header row, as last read
+        self.header = None
+        self.rows = {}
+        self.indexes = {}
+
+    @staticmethod
+    def _stat(path):
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        # The inode changes on every atomic rewrite, so another worker's
+        # rewrite is noticed even within one mtime tick and at the same size
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def _current_signature(self):
+        return (self._stat(self.path), self._stat(self.journal_path))
+
+    def load(self, path, journaled=False):
+        """Make sure the cache reflects the file at ``path`` and its journal."""
+        self.journaled = journaled
+        if path != self.path:
+            self.path = path
+            self.journal_path = path + '.journal'
+            self.signature = None
+        signature = self._current_signature()
+        base, journal = signature
+        if base is not None and signature == self.signature:
+            return self
+
+        if (base is not None and self.signature is not None and base == self.signature[0]
+                and journal is not None and journal[2] >= self.journal_offset):
+            # Only the journal moved on: apply the new records
+            self._replay()
+        else:
+            self._reset([])
+            self.header = None
+            if base is not None:
+                with open(path, 'r', encoding='utf-8') as f:
+                    reader = csv.DictReader(f)
+                    self._reset(reader)
+                    self.header = reader.fieldnames
+            self.journal_offset = 0
+            self._replay()
+        self.signature = signature
+        return self
+
+    @staticmethod
+    def _key(row_id):
+        try:
+            return int(row_id)
+        except (TypeError, ValueError):
+            return None
+
+    def _record(self, row):
+        return row if isinstance(row, self.record_type) else self.record_type.from_dict(row)
+
+    def _decode(self, row):
+        """The record for a stored row, or None if it can't be read (like _key)"""
+        try:
+            return self._record(row)
+        except (KeyError, TypeError, ValueError):
+            return None
+
+    def _reset(self, rows):
+        self.rows = {}
+        self.indexes = {field: {} for field in self.unique + self.grouped}
+        # A malformed line (e.g. a half-written append) costs that row, not the table
+        for row in filter(None, map(self._decode, rows)):
+            self._upsert(row)
+
+    def _replay(self):
+        """Apply journal records written after ``journal_offset``."""
+        try:
+            with open(self.journal_path, 'rb') as f:
+                f.seek(self.journal_offset)
+                data = f.read()
+        except FileNotFoundError:
+            return
+        # Leave a half-written trailing record for the next load
+        data = data[:data.rfind(b'\n') + 1]
+        self.journal_offset += len(data)
+        for record in csv.reader(io.StringIO(data.decode('utf-8'), newline='')):
+            if not record:
+                continue
+            op = record[0]
+            if op == 'D' and len(record) == 2:
+                self._discard(self._key(record[1]))
+            elif op in ('I', 'U') and len(record) == len(self.record_type.fields) + 1:
+                row = self._decode(dict(zip(self.record_type.fields, record[1:])))
+                if row is not None:
+                    self._upsert(row)
+
+    def _upsert(self, row):
+        row_id = row.id
+        old = self.rows.get(row_id)
+        # Assigning over an existing key keeps the row's position in file order
+        self.rows[row_id] = row
+        for field in self.unique:
+            index = self.indexes[field]
+            value = self._index_value(field, row)
+            if old is not None:
+                old_value = self._index_value(field, old)
+                if old_value == value:
+                    continue
+                if index.get(old_value) == row_id:
+                    self._unindex(field, old_value, row_id)
+            index.setdefault(value, row_id)
+        for field in self.grouped:
+            index = self.indexes[field]
+            if old is not None:
+                if old.get(field) == row.get(field):
+                    continue
+                self._ungroup(field, old.get(field), row_id)
+            index.setdefault(row.get(field), {})[row_id] = None
+
+    def _discard(self, row_id):
+        row = self.rows.pop(row_id, None)
+        if row is None:
+            return
+        for field in self.unique:
+            value = self._index_value(field, row)
+            if self.indexes[field].get(value) == row_id:
+                self._unindex(field, value, row_id)
+        for field in self.grouped:
+            self._ungroup(field, row.get(field), row_id)
+
+    def _unindex(self, field, value, row_id):
+        # Files written before the value was unique can still hold duplicates:
+        # hand the entry to the next row with it, in file order, if any
+        del self.indexes[field][value]
+        for other_id, other in self.rows.items():
+            if other_id != row_id and self._index_value(field, other) == value:
+                self.indexes[field][value] = other_id
+                break
+
+    def _ungroup(self, field, value, row_id):
+        group = self.indexes[field].get(value)
+        if group is not None:
+            group.pop(row_id, None)
+            if not group:
+                del self.indexes[field][value]
+
+    def get(self, row_id):
+        return self.rows.get(self._key(row_id))
+
+    def _index_value(self, field, row):
+        value = row.get(field)
+        return self.normalize[field](value) if field in self.normalize else value
+
+    def find(self, field, value):
+        if field in self.normalize:
+            value = self.normalize[field](value)
+        row_id = self.indexes[field].get(value)
+        return self.rows.get(row_id) if row_id is not None else None
+
+    def group(self, field, value):
+        return [self.rows[row_id] for row_id in self.indexes[field].get(value, ())]
+
+    def max_id(self):
+        return max(self.rows, default=0)
+
+    def insert(self, row):
+        """Append a row to the file (or journal) and the cache."""
+        self.write_batch(inserts=[row])
+
+    def replace(self, row):
+        """Swap in a modified copy of an existing row."""
+        self.write_batch(updates=[row])
+
+    def replace_many(self, rows):
+        self.write_batch(updates=rows)
+
+    def remove(self, row_id):
+        self.write_batch(deletes=[row_id])
+
+    def remove_many(self, row_ids):
+        self.write_batch(deletes=row_ids)
+
+    def write_batch(self, inserts=(), updates=(), deletes=()):
+        """Apply any number of inserts, updates and deletes with a single write.
+
+        Pure inserts are appended; anything else is one journal append in
+        journaled mode, or one atomic rewrite of the file otherwise.
+        """
+        inserts = [self._record(row) for row in inserts]
+        updates = [self._record(row) for row in updates]
+        deletes = [self._key(row_id) for row_id in deletes]
+        for row in inserts + updates:
+            self._upsert(row)
+        for row_id in deletes:
+            self._discard(row_id)
+
+        try:
+            if self.journaled:
+                self._journal(
+                    [('I', row) for row in inserts]
+                    + [('U', row) for row in updates]
+                    + [('D', {'id': row_id}) for row_id in deletes]
+                )
+            elif updates or deletes or (inserts and self.header != list(self.fieldnames)):
+                # Appending under a header with other columns (e.g. one written
+                # before REMINDER_EPOCH_COLUMN was switched) would misalign the
+                # rows, so the file is rewritten with the current header instead
+                self.rewrite()
+            elif inserts:
+                self._append(inserts)
+        except BaseException:
+            # The cache already holds the batch; make the next load re-read the file
+            self.signature = None
+            raise
+
+    def _append(self, rows):
+        with open(self.path, 'a', newline='', encoding='utf-8') as f:
+            start = f.tell()
+            writer = csv.DictWriter(f, fieldnames=self.fieldnames, extrasaction='ignore')
+            writer.writerows(rows)
+        if self.signature and self.signature[0] and start == self.signature[0][2]:
+            # Nobody else appended since our last read
+            self.signature = self._current_signature()
+
+    def _journal(self, records):
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        for op, row in records:
+            if op == 'D':
+                writer.writerow([op, row['id']])
+            else:
+                # Only the record's own fields: the journal doesn't change
+                # shape with optional columns like reminder_epoch
+                writer.writerow([op] + [row.get(field) or '' for field in self.record_type.fields])
+        with open(self.journal_path, 'ab') as f:
+            start = f.tell()
+            f.write(buf.getvalue().encode('utf-8'))
+            end = f.tell()
+        if start == self.journal_offset:
+            # Nobody else appended since our last read
+            self.journal_offset = end
+            self.signature = self._current_signature()
+        if end >= JOURNAL_COMPACT_BYTES:
+            self.compact()
+
+    def compact(self):
+        """Fold the journal into a fresh snapshot of the base file."""
+        self.load(self.path, self.journaled)
+        self.rewrite()
+
+    def rewrite(self):
+        """Atomically replace the file with the cached rows."""
+        with file_lock.atomic_write(self.path, newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=self.fieldnames, extrasaction='ignore')
+            writer.writeheader()
+            writer.writerows(self.rows.values())
+        self.header = list(self.fieldnames)
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+        self.journal_offset = 0
+        self.signature = self._current_signature()
+
+class _ReminderTable(_CsvTable):
+    """reminders.csv plus a min-heap of pending reminders keyed by reminder_time.
+
+    Heap entries are ``(reminder_time, id)``. They are never
+    removed eagerly: an entry whose reminder has since been completed, deleted
+    or rescheduled is simply dropped when it reaches the top.
+
+    For the dashboard, each user also gets lazily built sorted views of their
+    reminders (per sort column and status filter), dropped whenever one of
+    that user's reminders changes.
+    """
+
+    def __init__(self, fieldnames, record_type, unique=(), grouped=()):
+        super().__init__(fieldnames, record_type, unique, grouped)
+        self.due = []
+        self.views = {}
+
+    @staticmethod
+    def _due_entry(row):
+        if row.is_completed or row.reminder_time is None:
+            return None
+        return (row.reminder_time, row.id)
+
+    def _rebuild_due(self):
+        self.due = [entry for entry in map(self._due_entry, self.rows.values()) if entry]
+        heapq.heapify(self.due)
+
+    def _reset(self, rows):
+        # Heapify once after a full load instead of pushing row by row
+        self.due = None
+        self.views = {}
+        super()._reset(rows)
+        self._rebuild_due()
+
+    def _discard(self, row_id):
+        row = self.rows.get(row_id)
+        super()._discard(row_id)
+        if row is not None:
+            self.views.pop(row.get('user_id'), None)
+
+    def _upsert(self, row):
+        old = self.rows.get(row.id)
+        super()._upsert(row)
+        if old is not None:
+            self.views.pop(old.get('user_id'), None)
+        self.views.pop(row.get('user_id'), None)
+        if self.due is None:
+            return
+        if old is None or old.reminder_time != row.reminder_time or old.is_completed != row.is_completed:
+            entry = self._due_entry(row)
+            if entry:
+                heapq.heappush(self.due, entry)
+        if len(self.due) > 2 * len(self.rows) + 64:
+            self._rebuild_due()
+
+    def _is_pending(self, entry):
+        row = self.rows.get(entry[1])
+        return row is not None and not row.is_completed and row.reminder_time == entry[0]
+
+    def pop_due(self, now):
+        """Return pending reminders due at ``now``, earliest first, in O(k log n).
+
+        The entries go back on the heap: a reminder only leaves the queue once
+        it is completed (e.g. a failed send is retried on the next sweep).
+        """
+        due = []
+        seen = set()
+        while self.due and self.due[0][0] <= now:
+            entry = heapq.heappop(self.due)
+            if entry[1] not in seen and self._is_pending(entry):
+                seen.add(entry[1])
+                due.append(entry)
+        for entry in due:
+            heapq.heappush(self.due, entry)
+        return [self.rows[entry[1]] for entry in due]
+
+    def next_due(self, after=None):
+        """Earliest pending reminder time, strictly after ``after`` if given."""
+        # Stale entries at the top are dropped for good; valid ones that are
+        # not after ``after`` are set aside and pushed back
+        skipped = []
+        found = None
+        while self.due:
+            entry = self.due[0]
+            if not self._is_pending(entry):
+                heapq.heappop(self.due)
+            elif after is not None and entry[0] <= after:
+                skipped.append(heapq.heappop(self.due))
+            else:
+                found = entry[0]
+                break
+        for entry in skipped:
+            heapq.heappush(self.due, entry)
+        return found
+
+    def _view(self, user_id, sort, status):
+        """Sorted ``(sort value, id)`` pairs for one user's reminders."""
+        views = self.views.setdefault(user_id, {})
+        view = views.get((sort, status))
+        if view is None:
+            rows = (self.rows[row_id] for row_id in self.indexes['user_id'].get(user_id, ()))
+            if status is not None:
+                want_completed = status == 'completed'
+                rows = (row for row in rows if row.is_completed == want_completed)
+            view = views[(sort, status)] = sorted((getattr(row, sort) or datetime.min, row.id) for row in rows)
+        return view
+
+    def page(self, user_id, sort, descending, status, start, end, offset, limit):
+        """Return ``(rows, total)`` for one page, materializing only that page."""
+        view = self._view(user_id, sort, status)
+        start, end = parse_time(start), parse_time(end)
+        if sort == 'reminder_time':
+            # The view is ordered by reminder_time, so the range is a slice
+            lo = bisect.bisect_left(view, (start,)) if start else 0
+            hi = bisect.bisect_right(view, (end, math.inf)) if end else len(view)
+        else:
+            lo, hi = 0, len(view)
+            if start or end:
+                view = [entry for entry in view
+                        if (not start or (self.rows[entry[1]].reminder_time or datetime.min) >= start)
+                        and (not end or (self.rows[entry[1]].reminder_time or datetime.min) <= end)]
+                hi = len(view)
+
+        total = max(hi - lo, 0)
+        if descending:
+            indexes = range(hi - 1 - offset, max(lo, hi - offset - limit) - 1, -1)
+        else:
+            indexes = range(lo + offset, min(hi, lo + offset + limit))
+        return [self.rows[view[i][1]] for i in indexes], total
+
+# Emails are unique regardless of case or surrounding spaces
+_users = _CsvTable(USER_FIELDS, User, unique=('email',), normalize={'email': normalize_email})
+_reminders = _ReminderTable(REMINDER_FIELDS, Reminder, grouped=('user_id',))
+# One table per shard file when reminders are sharded
+_reminder_shards = {}
+
+def _users_table():
+    return _users.load(USERS_CSV)
+
+def _reminders_table(path=None):
+    path = path or REMINDERS_CSV
+    if path == REMINDERS_CSV:
+        table = _reminders
+    else:
+        table = _reminder_shards.get(path)
+        if table is None:
+            table = _reminder_shards[path] = _ReminderTable(REMINDER_FIELDS, Reminder, grouped=('user_id',))
+    return table.load(path, REMINDERS_JOURNAL)
+
+# Sharding: with REMINDER_SHARDS > 1 reminders live in reminders.0.csv,
+# reminders.1.csv, ... and a user's reminders all go to the shard picked by
+# crc32(user_id). The manifest records the shard files and ``first_id``: shard
+# s only hands out ids first_id + s + k * shards, so an id alone says which
+# shard holds it. Ids below first_id predate the layout and are looked up in
+# every shard.
+_layout = {'key': None, 'paths': None, 'first_id': 1}
+
+def _shard_paths(shards):
+    if shards == 1:
+        return [REMINDERS_CSV]
+    root, ext = os.path.splitext(REMINDERS_CSV)
+    return [f'{root}.{shard}{ext}' for shard in range(shards)]
+
+def _read_manifest(manifest_path):
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def _reminder_layout():
+    """The shard files and first_id in use, moving reminders over first if
+    REMINDER_SHARDS no longer matches the manifest."""
+    manifest_path = REMINDERS_CSV + MANIFEST_SUFFIX
+    key = (REMINDERS_CSV, REMINDER_SHARDS, _CsvTable._stat(manifest_path))
+    if _layout['key'] != key:
+        if REMINDER_SHARDS == 1 and key[2] is None:
+            paths, first_id = [REMINDERS_CSV], 1
+        else:
+            with file_lock.exclusive_lock(manifest_path):
+                paths, first_id = _reshard(manifest_path)
+            key = (REMINDERS_CSV, REMINDER_SHARDS, _CsvTable._stat(manifest_path))
+        _layout.update(key=key, paths=paths, first_id=first_id)
+    return _layout['paths'], _layout['first_id']
+
+def _reshard(manifest_path):
+    """Redistribute reminders into REMINDER_SHARDS files, keeping their ids.
+
+    Runs under the manifest's exclusive lock. Workers should be stopped while
+    REMINDER_SHARDS is changed; this is meant for a one-off migration.
+    """
+    directory = os.path.dirname(REMINDERS_CSV)
+    manifest = _read_manifest(manifest_path)
+    old_paths = [os.path.join(directory, name) for name in manifest['files']] if manifest else [REMINDERS_CSV]
+    new_paths = _shard_paths(REMINDER_SHARDS)
+    if manifest and old_paths == new_paths:
+        return new_paths, manifest['first_id']
+
+    with ExitStack() as stack:
+        for path in sorted(set(old_paths + new_paths)):
+            stack.enter_context(file_lock.exclusive_lock(path))
+
+        shards = [[] for _ in new_paths]
+        last_id = manifest['first_id'] - 1 if manifest else 0
+        for path in old_paths:
+            if not os.path.exists(path):
+                continue
+            table = _reminders_table(path)
+            for row in table.rows.values():
+                shards[_shard_index(row.user_id, len(new_paths))].append(row)
+            try:
+                with open(path + SEQUENCE_SUFFIX, 'r', encoding='utf-8') as f:
+                    last_id = max(last_id, _read_sequence(f) or 0)
+            except FileNotFoundError:
+                pass
+            last_id = max(last_id, table.max_id())
+        first_id = last_id + 1
+
+        for path, rows in zip(new_paths, shards):
+            with file_lock.atomic_write(path, newline='', encoding='utf-8') as f:
+                writer = csv.DictWriter(f, fieldnames=REMINDER_FIELDS, extrasaction='ignore')
+                writer.writeheader()
+                writer.writerows(sorted(rows, key=lambda row: row.id))
+            for suffix in ('.journal', SEQUENCE_SUFFIX):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+
+        for path in set(old_paths) - set(new_paths):
+            for stale in (path, path + '.journal', path + SEQUENCE_SUFFIX):
+                if os.path.exists(stale):
+                    os.remove(stale)
+
+        if len(new_paths) == 1:
+            # Back to a single file: plain sequential ids again
+            with open(REMINDERS_CSV + SEQUENCE_SUFFIX, 'w', encoding='utf-8') as f:
+                f.write(str(last_id))
+            os.remove(manifest_path)
+            return new_paths, 1
+
+        with file_lock.atomic_write(manifest_path, encoding='utf-8') as f:
+            json.dump({
+                'shards': len(new_paths),
+                'first_id': first_id,
+                'files': [os.path.basename(path) for path in new_paths],
+            }, f)
+    return new_paths, first_id
+
+def _shard_index(user_id, shards):
+    return zlib.crc32(str(user_id).encode('utf-8')) % shards
+
+def _user_shard(user_id):
+    """(shard path, first id, id stride) for a user's reminders"""
+    paths, first_id = _reminder_layout()
+    shard = _shard_index(user_id, len(paths))
+    return paths[shard], first_id + shard, len(paths)
+
+def _id_shards(reminder_id):
+    """Shard files that can hold ``reminder_id``"""
+    paths, first_id = _reminder_layout()
+    reminder_id = int(reminder_id)
+    if reminder_id >= first_id:
+        return [paths[(reminder_id - first_id) % len(paths)]]
+    return paths
+
+def _group_by_shard(reminder_ids):
+    """{shard path: ids} for the shards each id may live in"""
+    groups = {}
+    for reminder_id in reminder_ids:
+        for path in _id_shards(reminder_id):
+            groups.setdefault(path, []).append(reminder_id)
+    return groups
+
+# Locking: readers hold a shared lock and writers an exclusive one on the CSV
+# they touch, so several workers can share the files (see file_lock.py)
+def _locked(get_path, exclusive=False):
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            lock = file_lock.exclusive_lock if exclusive else file_lock.shared_lock
+            with lock(get_path()):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def _users_path():
+    return USERS_CSV
+
+# ID allocation
+def _read_sequence(f):
+    f.seek(0)
+    try:
+        return int(f.read().strip())
+    except ValueError:
+        return None
+
+def _id_after(last_id, first, stride):
+    if last_id < first:
+        return first
+    return first + ((last_id - first) // stride + 1) * stride
+
+def _next_id(table, last_id, first, stride):
+    if last_id is None:
+        last_id = table.max_id()
+    next_id = _id_after(last_id, first, stride)
+    if table.get(next_id) is not None:
+        # The counter is behind the data
+        next_id = _id_after(max(last_id, table.max_id()), first, stride)
+    return next_id
+
+def _allocate_id(table, csv_path, count=1, first=1, stride=1):
+    """Hand out the next id (or a block of ``count`` ids, returning the first)
+    from the ``<csv>.seq`` counter in O(1).
+
+    Ids run first, first + stride, ...; a reminder shard only hands out ids in
+    its own residue class. A block of ids is spaced ``stride`` apart.
+
+    Callers hold the CSV's exclusive lock, so concurrent workers never get the
+    same id. Only when the counter is missing, corrupt or behind the data do
+    we fall back to scanning for max(id).
+    """
+    with open(csv_path + SEQUENCE_SUFFIX, 'a+', encoding='utf-8') as f:
+        next_id = _next_id(table, _read_sequence(f), first, stride)
+        f.seek(0)
+        f.truncate()
+        f.write(str(next_id + (count - 1) * stride))
+        f.flush()
+    return next_id
+
+def _peek_id(table, csv_path, first=1, stride=1):
+    try:
+        with open(csv_path + SEQUENCE_SUFFIX, 'r', encoding='utf-8') as f:
+            last_id = _read_sequence(f)
+    except FileNotFoundError:
+        last_id = None
+    return _next_id(table, last_id, first, stride)
 
 # Ensure CSV files exist with headers
 def init_csv_files():
-    # Users CSV
-    if not os.path.exists(USERS_CSV):
-        with open(USERS_CSV, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerow(['id', 'username', 'email', 'password_hash', 'app_password'])
-    
-    # Reminders CSV
-    if not os.path.exists(REMINDERS_CSV):
-        with open(REMINDERS_CSV, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerow(['id', 'user_id', 'title', 'description', 'reminder_time', 'created_at', 'is_completed', 'recipient_email'])
+    # The header goes into a temp file that is hard-linked into place, so the
+    # file never exists without it (a worker's append can't be overwritten by
+    # another's header) and os.link lets only one worker create it
+    for path, fieldnames in [(USERS_CSV, USER_FIELDS)] + [(path, REMINDER_FIELDS) for path in _reminder_layout()[0]]:
+        if os.path.exists(path):
+            continue
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', prefix=os.path.basename(path) + '.')
+        try:
+            with open(fd, 'w', newline='', encoding='utf-8') as f:
+                csv.writer(f).writerow(fieldnames)
+            os.chmod(tmp_path, 0o644)
+            os.link(tmp_path, path)
+        except FileExistsError:
+            pass
+        finally:
+            os.remove(tmp_path)
+
+# Common name for backend initialisation (see storage.py)
+init_storage = init_csv_files
 
 # User management functions
+@_locked(_users_path)
 def get_next_user_id():
-    if not os.path.exists(USERS_CSV):
-        return 1
-    
-    with open(USERS_CSV, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        users = list(reader)
-        
-    if not users:
-        return 1
-    return max(int(user['id']) for user in users) + 1
+    return _peek_id(_users_table(), USERS_CSV)
 
+@_locked(_users_path, exclusive=True)
 def add_user(username, email, password_hash, app_password=''):
     init_csv_files()
-    user_id = get_next_user_id()
+    table = _users_table()
+    # Checked under the exclusive lock, so two registrations can't both pass
+    if table.find('email', email) is not None:
+        raise EmailTakenError(email)
+    user_id = _allocate_id(table, USERS_CSV)
 
-    with open(USERS_CSV, 'a', newline='', encoding='utf-8') as f:
-        writer = csv.writer(f)
-        writer.writerow([user_id, username, email, password_hash, app_password])
+    table.insert(User(user_id, username, email, password_hash, app_password or ''))
 
     return user_id
 
+@_locked(_users_path)
 def get_user_by_email(email):
-    if not os.path.exists(USERS_CSV):
-        return None
-    
-    with open(USERS_CSV, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for user in reader:
-            if user['email'] == email:
-                return user
-    return None
+    return _users_table().find('email', email)
 
+@_locked(_users_path)
 def get_user_by_id(user_id):
-    if not os.path.exists(USERS_CSV):
-        return None
+    return _users_table().get(user_id)
 
-    with open(USERS_CSV, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for user in reader:
-            if user['id'] == str(user_id):
-                return user
-    return None
+@_locked(_users_path)
+def get_users_by_ids(user_ids):
+    """Resolve many users at once; returns {user_id (str): user} for the ones that exist"""
+    table = _users_table()
+    users = {}
+    for user_id in set(map(str, user_ids)):
+        user = table.get(user_id)
+        if user is not None:
+            users[user_id] = user
+    return users
 
+@_locked(_users_path, exclusive=True)
 def update_user_email_credentials(user_id, new_email, new_app_password):
-    if not os.path.exists(USERS_CSV):
+    table = _users_table()
+    user = table.get(user_id)
+    if user is None:
         return False
+    # Checked under the exclusive lock, like add_user
+    owner = table.find('email', new_email)
+    if owner is not None and owner.id != user.id:
+        raise EmailTakenError(new_email)
 
-    users = []
-    updated = False
-
-    with open(USERS_CSV, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        fieldnames = reader.fieldnames
-        for user in reader:
-            if user['id'] == str(user_id):
-                user['email'] = new_email
-                user['app_password'] = new_app_password
-                updated = True
-            users.append(user)
-
-    if updated:
-        with open(USERS_CSV, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
-            writer.writeheader()
-            writer.writerows(users)
+    table.replace(user.replace(email=new_email, app_password=new_app_password))
+
+    return True
 
-    return updated
+@_locked(_users_path, exclusive=True)
+def update_user_password_hash(user_id, password_hash):
+    table = _users_table()
+    user = table.get(user_id)
+    if user is None:
+        return False
+
+    table.replace(user.replace(password_hash=password_hash))
+
+    return True
 
 
 
 # Reminder management functions
-def get_next_reminder_id():
-    if not os.path.exists(REMINDERS_CSV):
-        return 1
-    
-    with open(REMINDERS_CSV, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        reminders = list(reader)
-        
-    if not reminders:
-        return 1
-    return max(int(reminder['id']) for reminder in reminders) + 1
+def get_next_reminder_id(user_id=None):
+    """The id the next reminder will get; with shards, pass the user it is for"""
+    paths, first_id = _reminder_layout()
+    shard = _shard_index(user_id, len(paths)) if user_id is not None else 0
+    with file_lock.shared_lock(paths[shard]):
+        return _peek_id(_reminders_table(paths[shard]), paths[shard], first_id + shard, len(paths))
 
 def add_reminder(user_id, title, description, reminder_time, recipient_email=None):
     init_csv_files()
-    reminder_id = get_next_reminder_id()
-    created_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    
-    with open(REMINDERS_CSV, 'a', newline='', encoding='utf-8') as f:
-        writer = csv.writer(f)
-        writer.writerow([
+    path, first, stride = _user_shard(user_id)
+    with file_lock.exclusive_lock(path):
+        table = _reminders_table(path)
+        reminder_id = _allocate_id(table, path, first=first, stride=stride)
+        created_at = datetime.now().replace(microsecond=0)
+
+        table.insert(Reminder(
             reminder_id,
-            user_id,
+            int(user_id),
             title,
             description or '',
-            reminder_time.strftime('%Y-%m-%d %H:%M:%S'),
+            reminder_time.replace(microsecond=0),
             created_at,
-            'False',
+            False,
             recipient_email or ''
-        ])
-    
+        ))
+
     return reminder_id
 
+def upsert_reminders(user_id, inserts, updates):
+    """Add and update many of a user's reminders with a single write
+
+    inserts are dicts with the add_reminder arguments (title, description,
+    reminder_time, recipient_email); updates are as for update_reminders.
+    Returns the ids of the new reminders.
+    """
+    init_csv_files()
+    path, first, stride = _user_shard(user_id)
+    with file_lock.exclusive_lock(path):
+        table = _reminders_table(path)
+        created_at = datetime.now().replace(microsecond=0)
+        first_id = _allocate_id(table, path, len(inserts), first, stride) if inserts else None
+
+        new_rows = [Reminder(
+            first_id + offset * stride,
+            int(user_id),
+            insert['title'],
+            insert.get('description') or '',
+            insert['reminder_time'].replace(microsecond=0),
+            created_at,
+            False,
+            insert.get('recipient_email') or ''
+        ) for offset, insert in enumerate(inserts)]
+
+        changed = _updated_rows(table, updates)
+
+        if new_rows or changed:
+            table.write_batch(inserts=new_rows, updates=changed)
+    return [row.id for row in new_rows]
+
 def get_reminders_by_user_id(user_id):
-    if not os.path.exists(REMINDERS_CSV):
-        return []
-    
-    reminders = []
-    with open(REMINDERS_CSV, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for reminder in reader:
-            if reminder['user_id'] == str(user_id):
-                reminders.append(reminder)
-    
-    return reminders
+    path = _user_shard(user_id)[0]
+    with file_lock.shared_lock(path):
+        return _reminders_table(path).group('user_id', str(user_id))
+
+def iter_reminders_by_user_id(user_id):
+    """Yield a user's reminders one at a time instead of building a list"""
+    path = _user_shard(user_id)[0]
+    # Snapshot the ids under the lock; don't hold it while the caller consumes rows
+    with file_lock.shared_lock(path):
+        table = _reminders_table(path)
+        reminder_ids = list(table.indexes['user_id'].get(str(user_id), ()))
+    for reminder_id in reminder_ids:
+        reminder = table.get(reminder_id)
+        if reminder is not None:
+            yield reminder
+
+def get_reminders_page(user_id, page=1, per_page=20, sort='created_at', order='asc', status=None, start=None, end=None):
+    """One page of a user's reminders and the number of reminders matching the filters
+
+    sort is 'reminder_time' or 'created_at', order 'asc' or 'desc', status
+    'completed', 'pending' or None, and start/end are inclusive
+    'YYYY-MM-DD HH:MM:SS' bounds on reminder_time.
+    """
+    if sort not in ('reminder_time', 'created_at'):
+        raise ValueError(f'Cannot sort reminders by {sort!r}')
+    path = _user_shard(user_id)[0]
+    with file_lock.shared_lock(path):
+        rows, total = _reminders_table(path).page(
+            str(user_id), sort, order == 'desc', status, start, end,
+            (max(page, 1) - 1) * per_page, per_page
+        )
+        return rows, total
 
 def get_reminder_by_id(reminder_id):
-    if not os.path.exists(REMINDERS_CSV):
-        return None
-    
-    with open(REMINDERS_CSV, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for reminder in reader:
-            if reminder['id'] == str(reminder_id):
+    for path in _id_shards(reminder_id):
+        with file_lock.shared_lock(path):
+            reminder = _reminders_table(path).get(reminder_id)
+            if reminder is not None:
                 return reminder
     return None
 
+def _apply_update(reminder, title, description, reminder_time, recipient_email=None):
+    return reminder.replace(
+        title=title,
+        description=description or '',
+        reminder_time=reminder_time.replace(microsecond=0),
+        recipient_email=recipient_email or ''
+    )
+
+def _updated_rows(table, updates):
+    changed = []
+    for update in updates:
+        reminder = table.get(update['id'])
+        if reminder is not None:
+            changed.append(_apply_update(
+                reminder,
+                update['title'],
+                update.get('description'),
+                update['reminder_time'],
+                update.get('recipient_email')
+            ))
+    return changed
+
 def update_reminder(reminder_id, title, description, reminder_time, recipient_email=None):
-    if not os.path.exists(REMINDERS_CSV):
-        return False
-    
-    reminders = []
-    updated = False
-    
-    with open(REMINDERS_CSV, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for reminder in reader:
-            if reminder['id'] == str(reminder_id):
-                reminder['title'] = title
-                reminder['description'] = description or ''
-                reminder['reminder_time'] = reminder_time.strftime('%Y-%m-%d %H:%M:%S')
-                reminder['recipient_email'] = recipient_email or ''
-                updated = True
-            reminders.append(reminder)
-    
-    if updated:
-        with open(REMINDERS_CSV, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerow(['id', 'user_id', 'title', 'description', 'reminder_time', 'created_at', 'is_completed', 'recipient_email'])
-            for reminder in reminders:
-                writer.writerow([
-                    reminder['id'],
-                    reminder['user_id'],
-                    reminder['title'],
-                    reminder['description'],
-                    reminder['reminder_time'],
-                    reminder['created_at'],
-                    reminder['is_completed'],
-                    reminder.get('recipient_email', '') or ''
-                ])
-    
-    return updated
+    for path in _id_shards(reminder_id):
+        with file_lock.exclusive_lock(path):
+            table = _reminders_table(path)
+            reminder = table.get(reminder_id)
+            if reminder is None:
+                continue
+
+            table.replace(_apply_update(reminder, title, description, reminder_time, recipient_email))
+
+            return True
+    return False
+
+def update_reminders(updates):
+    """Apply several update_reminder calls with one write per shard; returns how many were found
+
+    Each update is a dict with the update_reminder arguments: id, title,
+    description, reminder_time and optionally recipient_email.
+    """
+    by_id = {str(update['id']): update for update in updates}
+    count = 0
+    for path, reminder_ids in _group_by_shard(by_id).items():
+        with file_lock.exclusive_lock(path):
+            table = _reminders_table(path)
+            changed = _updated_rows(table, [by_id[reminder_id] for reminder_id in reminder_ids])
+            if changed:
+                table.replace_many(changed)
+            count += len(changed)
+    return count
 
 def delete_reminder(reminder_id):
-    if not os.path.exists(REMINDERS_CSV):
-        return False
-    
-    reminders = []
-    deleted = False
-    
-    with open(REMINDERS_CSV, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for reminder in reader:
-            if reminder['id'] != str(reminder_id):
-                reminders.append(reminder)
-            else:
-                deleted = True
-    
-    if deleted:
-        with open(REMINDERS_CSV, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerow(['id', 'user_id', 'title', 'description', 'reminder_time', 'created_at', 'is_completed', 'recipient_email'])
-            for reminder in reminders:
-                writer.writerow([
-                    reminder['id'],
-                    reminder['user_id'],
-                    reminder['title'],
-                    reminder['description'],
-                    reminder['reminder_time'],
-                    reminder['created_at'],
-                    reminder['is_completed'],
-                    reminder.get('recipient_email', '') or ''
-                ])
-    
-    return deleted
+    for path in _id_shards(reminder_id):
+        with file_lock.exclusive_lock(path):
+            table = _reminders_table(path)
+            if table.get(reminder_id) is None:
+                continue
+
+            table.remove(reminder_id)
+
+            return True
+    return False
+
+def delete_reminders(reminder_ids):
+    """Delete several reminders with one write per shard; returns how many were found"""
+    count = 0
+    for path, shard_ids in _group_by_shard(reminder_ids).items():
+        with file_lock.exclusive_lock(path):
+            table = _reminders_table(path)
+            found = [reminder_id for reminder_id in shard_ids if table.get(reminder_id) is not None]
+            if found:
+                table.remove_many(found)
+            count += len(found)
+    return count
+
+def iter_all_reminders():
+    """Yield every reminder, one shard at a time"""
+    for path in _reminder_layout()[0]:
+        with file_lock.shared_lock(path):
+            reminders = list(_reminders_table(path).rows.values())
+        yield from reminders
 
 def get_all_reminders():
-    if not os.path.exists(REMINDERS_CSV):
-        return []
-    
-    with open(REMINDERS_CSV, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        return list(reader)
+    return list(iter_all_reminders())
+
+def get_due_reminders(now=None):
+    """Pending reminders whose reminder_time has passed, earliest first"""
+    now = now or datetime.now()
+    shards = []
+    for path in _reminder_layout()[0]:
+        with file_lock.shared_lock(path):
+            shards.append(_reminders_table(path).pop_due(now))
+    if len(shards) == 1:
+        return shards[0]
+    return list(heapq.merge(*shards, key=lambda reminder: reminder.reminder_time))
+
+def get_next_due_time(after=None):
+    """When the next pending reminder is due (after ``after`` if given), or None"""
+    times = []
+    for path in _reminder_layout()[0]:
+        with file_lock.shared_lock(path):
+            times.append(_reminders_table(path).next_due(after))
+    return min((time for time in times if time is not None), default=None)
 
 def mark_reminder_completed(reminder_id):
-    if not os.path.exists(REMINDERS_CSV):
-        return False
-    
-    reminders = []
-    updated = False
-    
-    with open(REMINDERS_CSV, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for reminder in reader:
-            if reminder['id'] == str(reminder_id):
-                reminder['is_completed'] = 'True'
-                updated = True
-            reminders.append(reminder)
-    
-    if updated:
-        with open(REMINDERS_CSV, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerow(['id', 'user_id', 'title', 'description', 'reminder_time', 'created_at', 'is_completed', 'recipient_email'])
-            for reminder in reminders:
-                writer.writerow([
-                    reminder['id'],
-                    reminder['user_id'],
-                    reminder['title'],
-                    reminder['description'],
-                    reminder['reminder_time'],
-                    reminder['created_at'],
-                    reminder['is_completed'],
-                    reminder.get('recipient_email', '') or ''
-                ])
-    
-    return updated
+    for path in _id_shards(reminder_id):
+        with file_lock.exclusive_lock(path):
+            table = _reminders_table(path)
+            reminder = table.get(reminder_id)
+            if reminder is None:
+                continue
+
+            table.replace(reminder.replace(is_completed=True))
+
+            return True
+    return False
+
+def mark_reminders_completed(reminder_ids):
+    """Mark several reminders completed with one write per shard; returns how many were found"""
+    count = 0
+    for path, shard_ids in _group_by_shard(reminder_ids).items():
+        with file_lock.exclusive_lock(path):
+            table = _reminders_table(path)
+            reminders = [table.get(reminder_id) for reminder_id in shard_ids]
+            completed = [reminder.replace(is_completed=True) for reminder in reminders if reminder is not None]
+            if completed:
+                table.replace_many(completed)
+            count += len(completed)
+    return count
+
+def compact_reminders():
+    """Fold each reminders journal back into its CSV file"""
+    for path in _reminder_layout()[0]:
+        with file_lock.exclusive_lock(path):
+            _reminders_table(path).compact()
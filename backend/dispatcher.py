@@ -0,0 +1,101 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# Number of sender accounts served in parallel
+SEND_WORKERS = int(os.environ.get('SEND_WORKERS', 8))
+# Per-sender token bucket: sustained messages per second and burst size
+SENDER_RATE = float(os.environ.get('SENDER_RATE', 1.0))
+SENDER_BURST = int(os.environ.get('SENDER_BURST', 10))
+
+class TokenBucket:
+    """Classic token bucket: ``rate`` tokens per second, holding at most ``capacity``."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, deadline=None):
+        """Take one token, sleeping until one is available.
+
+        With ``deadline`` (a time.monotonic() value), give up and return False
+        instead of sleeping past it.
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait = (1 - self.tokens) / self.rate
+            if deadline is not None and now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+class Dispatcher:
+    """Fan sends out over a thread pool, one worker per sender account.
+
+    Jobs for the same sender run one after another on the same worker, so
+    they share a pooled SMTP session and are paced by that sender's token
+    bucket. Different senders are served concurrently. Buckets outlive a
+    single dispatch, so the limit also holds across sweeps.
+    """
+
+    def __init__(self, workers=None, rate=None, burst=None):
+        self.workers = workers or SEND_WORKERS
+        self.rate = rate or SENDER_RATE
+        self.burst = burst or SENDER_BURST
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, sender):
+        with self._lock:
+            bucket = self._buckets.get(sender)
+            if bucket is None:
+                bucket = self._buckets[sender] = TokenBucket(self.rate, self.burst)
+            return bucket
+
+    def _send_group(self, sender, jobs, send, deadline=None):
+        bucket = self.bucket(sender)
+        results = []
+        for index, job in enumerate(jobs):
+            if (deadline is not None and time.monotonic() >= deadline) or not bucket.acquire(deadline):
+                # Out of time: the rest of the group is not attempted
+                results.extend((rest, None) for rest in jobs[index:])
+                break
+            try:
+                ok = bool(send(job))
+            except Exception as e:
+                print(f"❌ Unexpected error while sending for {sender}: {e}")
+                ok = False
+            results.append((job, ok))
+        return results
+
+    def dispatch(self, jobs, sender_of, send, deadline=None):
+        """Run ``send(job)`` for every job and return ``[(job, succeeded), ...]``.
+
+        ``sender_of(job)`` names the account a job is sent from; it is used to
+        group jobs and to pick the rate limit. With ``deadline`` (a
+        time.monotonic() value) no job is started after it, nor one that would
+        have to wait for its rate limit past it; those come back with
+        ``succeeded`` set to None.
+        """
+        groups = OrderedDict()
+        for job in jobs:
+            groups.setdefault(sender_of(job), []).append(job)
+        if not groups:
+            return []
+
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(groups))) as executor:
+            futures = [executor.submit(self._send_group, sender, group, send, deadline) for sender, group in groups.items()]
+            return [result for future in futures for result in future.result()]
+
+# Shared dispatcher, so rate limits carry over between sweeps
+dispatcher = Dispatcher()
@@ -1,111 +1,230 @@
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+import os
+import time
 from datetime import datetime
-from csv_handler import get_all_reminders, mark_reminder_completed, get_user_by_id
+from storage import get_due_reminders, mark_reminders_completed, get_users_by_ids
+from dispatcher import dispatcher
+import csv_handler
+from messages import build_digest_message, serialize
+import metrics
+import outbox
+import smtp_pool
 
 # Email configuration (should be moved to environment variables in production)
 # No default credentials, user must set their own
 DEFAULT_SENDER_EMAIL = None
 DEFAULT_APP_PASSWORD = None
 
-def send_reminder_email(receiver_email, reminder_title, reminder_description, reminder_time, user_id=None):
-    """Send a reminder email to the specified recipient"""
+# Due reminders are sent, and marked completed, in chunks of this many
+SWEEP_BATCH_SIZE = int(os.environ.get('SWEEP_BATCH_SIZE', 200))
+# Send a sender's due reminders for the same recipient as one digest email
+EMAIL_DIGEST = os.environ.get('EMAIL_DIGEST', '').lower() in ('1', 'true', 'yes')
+# Most reminders listed in one digest
+EMAIL_DIGEST_MAX = int(os.environ.get('EMAIL_DIGEST_MAX', 50))
+# Queue emails in the durable outbox (outbox.py) instead of sending during the sweep
+EMAIL_OUTBOX = os.environ.get('EMAIL_OUTBOX', '').lower() in ('1', 'true', 'yes')
+# Held for the length of a sweep, so the scheduler and /internal/sweep never overlap
+SWEEP_LOCK = os.environ.get('SWEEP_LOCK', os.path.join(csv_handler.TMP_DIR, 'sweep'))
+
+def send_digest_email(receiver_email, reminders, sender_email, app_password):
+    """Send one email covering several reminders for the same recipient"""
     try:
-        # Get user-specific credentials, no defaults
-        if user_id:
-            user = get_user_by_id(user_id)
-            sender_email = user.get('email') if user else None
-            app_password = user.get('app_password') if user else None
-        else:
-            sender_email = None
-            app_password = None
-
-        # Check if credentials are set
-        if not sender_email or not app_password:
-            print(f"❌ Email credentials not set for user {user_id}. Please set email credentials in settings.")
-            return False
-
-        # Create email
-        msg = MIMEMultipart()
-        msg["From"] = sender_email
-        msg["To"] = receiver_email
-        msg["Subject"] = f"Reminder: {reminder_title}"
-
-        body = f"""
-        Hello!
-
-        This is a reminder for: {reminder_title}
-
-        Description: {reminder_description or 'No description provided'}
-
-        Scheduled Time: {reminder_time.strftime('%Y-%m-%d %H:%M')}
-
-        ---
-        This is an automated reminder from the Reminder App.
-        """
-
-        msg.attach(MIMEText(body, "plain"))
-
-        # Connect to Gmail SMTP server
-        server = smtplib.SMTP("smtp.gmail.com", 587)
-        server.starttls()
-        server.login(sender_email, app_password)
-
-        # Send email
-        server.sendmail(sender_email, receiver_email, msg.as_string())
-        server.quit()
-
+        msg = build_digest_message(sender_email, receiver_email, reminders)
+        smtp_pool.pool.sendmail(sender_email, app_password, receiver_email, serialize(msg))
         print(f"✅ Email sent successfully to {receiver_email}")
         return True
-
     except Exception as e:
         print(f"❌ Error sending email to {receiver_email}: {e}")
         return False
 
-def check_and_send_reminders(app):
-    """Check for reminders that are due and send emails"""
+def sweep_key(reminder):
+    """Order of a reminder within a sweep; cursors are values of this"""
+    return (reminder.reminder_time, reminder.id)
+
+def check_and_send_reminders(app, budget=None, chunk_size=None, cursor=None):
+    """Check for reminders that are due and send emails
+
+    Due reminders are handled in chunks of ``chunk_size`` (SWEEP_BATCH_SIZE),
+    each marked completed with one write. With ``budget`` (seconds) no send,
+    and no chunk, is started once it has run out. The returned ``cursor`` is
+    the sweep_key of the last reminder before the first one left unhandled;
+    pass it back to carry on from there. It is None once everything due was
+    handled. Returns the sweep's counters.
+    """
+    started = time.monotonic()
+    deadline = started + budget if budget is not None else None
+    stats = {'scanned': 0, 'sent': 0, 'failed': 0, 'skipped': 0, 'queued': 0, 'chunks': 0}
     with app.app_context():
         current_time = datetime.now()
-        
-        # Get all reminders
-        all_reminders = get_all_reminders()
-        
-        for reminder in all_reminders:
-            # Skip completed reminders
-            if reminder['is_completed'] == 'True':
-                continue
-                
-            # Parse reminder time
-            try:
-                reminder_time = datetime.strptime(reminder['reminder_time'], '%Y-%m-%d %H:%M:%S')
-            except ValueError:
+
+        # Only pending reminders that are already due, earliest first
+        due_reminders = sorted(get_due_reminders(current_time), key=sweep_key)
+        if cursor is not None:
+            due_reminders = [reminder for reminder in due_reminders if sweep_key(reminder) > cursor]
+
+        chunk_size = chunk_size or SWEEP_BATCH_SIZE
+        position = 0
+        unsent = set()
+        while position < len(due_reminders) and not unsent:
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+            chunk = due_reminders[position:position + chunk_size]
+            with metrics.SWEEP_CHUNK_SECONDS.time():
+                unsent = _sweep_chunk(chunk, stats, deadline)
+            position += len(chunk)
+            stats['scanned'] += len(chunk) - len(unsent)
+            stats['chunks'] += 1
+
+        resume = position
+        if unsent:
+            # Reminders the deadline cut off stay after the cursor, so the next call sends them
+            resume = min(i for i in range(position - len(chunk), position) if due_reminders[i].id in unsent)
+        stats['remaining'] = len(due_reminders) - position + len(unsent)
+        if not stats['remaining']:
+            stats['cursor'] = None
+        else:
+            stats['cursor'] = sweep_key(due_reminders[resume - 1]) if resume else cursor
+    elapsed = time.monotonic() - started
+    stats['elapsed'] = round(elapsed, 3)
+    if metrics.METRICS_ENABLED:
+        metrics.SWEEP_SECONDS.observe(elapsed)
+        for result in ('sent', 'failed', 'skipped', 'queued'):
+            metrics.SWEEP_REMINDERS.inc(stats[result], result)
+    return stats
+
+def _sweep_chunk(due_reminders, stats, deadline=None):
+    """Send one chunk; returns the ids of reminders not attempted before ``deadline``"""
+    # Resolve every sender's credentials once for the whole chunk
+    users = get_users_by_ids({str(reminder.user_id) for reminder in due_reminders})
+
+    jobs = []
+    digests = {}
+    for reminder in due_reminders:
+        user = users.get(str(reminder.user_id))
+        if user:
+            # Check if user has set email credentials
+            if not user.get('email') or not user.get('app_password'):
+                print(f"⚠️  Skipping reminder '{reminder.title}' - user {reminder.user_id} has not set email credentials")
+                stats['skipped'] += 1
                 continue
-                
-            # Check if reminder is due
-            if reminder_time <= current_time:
-                user = get_user_by_id(reminder['user_id'])
-                if user:
-                    # Check if user has set email credentials
-                    if not user.get('email') or not user.get('app_password'):
-                        print(f"⚠️  Skipping reminder '{reminder['title']}' - user {reminder['user_id']} has not set email credentials")
-                        continue
-
-                    # Use custom recipient email if provided, otherwise use user's email
-                    recipient_email = reminder.get('recipient_email', '') or user['email']
-
-                    # Send email
-                    success = send_reminder_email(
-                        recipient_email,
-                        reminder['title'],
-                        reminder['description'],
-                        reminder_time,
-                        reminder['user_id']
-                    )
-
-                    if success:
-                        # Mark reminder as completed
-                        mark_reminder_completed(reminder['id'])
-                        print(f"✅ Reminder '{reminder['title']}' sent to {recipient_email} and marked as completed")
-                    else:
-                        print(f"❌ Failed to send reminder '{reminder['title']}' to {recipient_email}")
+
+            # Use custom recipient email if provided, otherwise use user's email
+            recipient_email = reminder.recipient_email or user.email
+            key = (user.email, user.app_password, recipient_email)
+            job = digests.get(key) if EMAIL_DIGEST else None
+            if job is None or len(job['reminders']) >= EMAIL_DIGEST_MAX:
+                job = digests[key] = {
+                    'user_id': reminder.user_id,
+                    'reminders': [],
+                    'recipient_email': recipient_email,
+                    'sender_email': user.email,
+                    'app_password': user.app_password,
+                }
+                jobs.append(job)
+            job['reminders'].append(reminder)
+        else:
+            stats['skipped'] += 1
+
+    if EMAIL_OUTBOX:
+        stats['queued'] += enqueue_reminder_emails(jobs)
+        return set()
+
+    # Send concurrently, grouped and rate limited per sender account,
+    # and mark the chunk's sent reminders completed with one write
+    results = dispatcher.dispatch(
+        jobs,
+        lambda job: job['sender_email'],
+        lambda job: send_digest_email(
+            job['recipient_email'],
+            job['reminders'],
+            sender_email=job['sender_email'],
+            app_password=job['app_password']
+        ),
+        deadline=deadline
+    )
+
+    sent_ids = []
+    unsent = set()
+    for job, success in results:
+        for reminder in job['reminders']:
+            if success is None:
+                # Out of time; left pending for the next sweep
+                unsent.add(reminder.id)
+            elif success:
+                sent_ids.append(reminder.id)
+                print(f"✅ Reminder '{reminder.title}' sent to {job['recipient_email']}")
+            else:
+                stats['failed'] += 1
+                print(f"❌ Failed to send reminder '{reminder.title}' to {job['recipient_email']}")
+
+    if sent_ids:
+        mark_reminders_completed(sent_ids)
+        stats['sent'] += len(sent_ids)
+        print(f"✅ Marked {len(sent_ids)} reminders as completed")
+    return unsent
+
+def enqueue_reminder_emails(jobs):
+    """Queue the sweep's emails in the outbox; returns how many reminders were queued
+
+    The reminders stay pending until the sender has sent their email, so one
+    that ends up in the dead letters still shows as not sent.
+    """
+    known = outbox.known_keys(outbox.reminder_key(r) for job in jobs for r in job['reminders'])
+    queued = 0
+    for job in jobs:
+        # Already queued by an earlier sweep and not sent yet
+        reminders = [r for r in job['reminders'] if outbox.reminder_key(r) not in known]
+        if not reminders:
+            continue
+        msg = build_digest_message(job['sender_email'], job['recipient_email'], reminders)
+        if outbox.enqueue(job['user_id'], job['recipient_email'], reminders, serialize(msg)) is not None:
+            queued += len(reminders)
+
+    if queued:
+        print(f"✅ Queued {queued} reminders for sending")
+    return queued
+
+def _send_queued(message, users):
+    user = users.get(str(message['user_id']))
+    if not user or not user.email or not user.app_password:
+        message['error'] = f"email credentials not set for user {message['user_id']}"
+        return False
+    try:
+        smtp_pool.pool.sendmail(user.email, user.app_password, message['recipient_email'], message['message'])
+        return True
+    except Exception as e:
+        message['error'] = e
+        return False
+
+def drain_outbox(limit=None):
+    """Send what is ready in the outbox; returns how many messages were tried"""
+    messages = outbox.claim(limit)
+    if not messages:
+        return 0
+    # Credentials are looked up at send time, so updated ones are used for retries
+    users = get_users_by_ids({str(message['user_id']) for message in messages})
+    results = dispatcher.dispatch(
+        messages,
+        lambda message: users[str(message['user_id'])].email if str(message['user_id']) in users else '',
+        lambda message: _send_queued(message, users)
+    )
+
+    sent_ids = []
+    reminder_ids = []
+    for message, success in results:
+        if success:
+            sent_ids.append(message['id'])
+            reminder_ids.extend(message['reminder_ids'].split(','))
+            print(f"✅ Email sent successfully to {message['recipient_email']}")
+            continue
+        error = message.get('error', 'unknown error')
+        status = outbox.mark_failed(message, error)
+        if status == outbox.DEAD:
+            print(f"❌ Giving up on email to {message['recipient_email']} after {message['attempts']} attempts: {error}")
+        else:
+            print(f"⚠️  Email to {message['recipient_email']} failed (attempt {message['attempts']}), will retry: {error}")
+    # Completed before the message is recorded as sent: a crash in between
+    # resends it once the lease runs out, rather than leaving it pending forever
+    if reminder_ids:
+        mark_reminders_completed(reminder_ids)
+    outbox.mark_sent(sent_ids)
+    return len(messages)
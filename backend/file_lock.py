@@ -0,0 +1,130 @@
+"""
+Cross-process file locking and atomic file replacement.
+
+Locks are advisory fcntl.flock locks on a ``<path>.lock`` sidecar. The data
+file itself can't carry the lock because atomic rewrites swap in a new inode.
+Readers take a shared lock and writers an exclusive one. Within a process a
+per-path mutex also serialises threads, because the in-memory caches built
+on top of these files are not thread-safe. Locks are re-entrant per thread:
+taking a lock you already hold is a no-op. Asking for an exclusive lock while
+holding only a shared one is an error, since upgrading is how two writers
+deadlock.
+
+On platforms without fcntl (Windows) only the in-process mutex applies.
+"""
+import os
+import stat
+import tempfile
+import threading
+from contextlib import contextmanager
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+LOCK_SUFFIX = '.lock'
+
+_local = threading.local()
+_mutexes = {}
+_mutexes_lock = threading.Lock()
+
+def _held():
+    held = getattr(_local, 'held', None)
+    if held is None:
+        held = _local.held = {}
+    return held
+
+def _mutex(path):
+    with _mutexes_lock:
+        mutex = _mutexes.get(path)
+        if mutex is None:
+            mutex = _mutexes[path] = threading.Lock()
+        return mutex
+
+@contextmanager
+def _lock(path, exclusive, blocking=True):
+    held = _held()
+    if path in held:
+        if exclusive and not held[path]:
+            raise RuntimeError(f'Cannot upgrade a shared lock on {path} to exclusive')
+        yield True
+        return
+
+    mutex = _mutex(path)
+    if not mutex.acquire(blocking):
+        yield False
+        return
+    try:
+        fd = os.open(path + LOCK_SUFFIX, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if fcntl is not None:
+                flags = fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH
+                try:
+                    fcntl.flock(fd, flags if blocking else flags | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    locked = False
+                else:
+                    locked = True
+                if not locked:
+                    yield False
+                    return
+            held[path] = exclusive
+            try:
+                yield True
+            finally:
+                del held[path]
+        finally:
+            # Closing the descriptor releases the flock
+            os.close(fd)
+    finally:
+        mutex.release()
+
+def shared_lock(path):
+    """Hold a shared (reader) lock on ``path`` for the duration of a with-block."""
+    return _lock(path, False)
+
+def exclusive_lock(path):
+    """Hold an exclusive (writer) lock on ``path`` for the duration of a with-block."""
+    return _lock(path, True)
+
+def try_exclusive_lock(path):
+    """Like exclusive_lock, but don't wait: the with-block gets True if the lock
+    was taken and False if someone else holds it."""
+    return _lock(path, True, blocking=False)
+
+@contextmanager
+def atomic_write(path, mode='w', **open_kwargs):
+    """Write a replacement for ``path`` that appears all at once or not at all.
+
+    Data goes to a temp file in the same directory, is fsync'd, and is then
+    swapped in with os.replace. The directory is fsync'd too so the rename
+    survives a crash. The replacement keeps the mode of the file it replaces
+    (0644 for a new file) rather than mkstemp's 0600.
+    """
+    directory = os.path.dirname(path) or '.'
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(path) + '.')
+    try:
+        try:
+            file_mode = stat.S_IMODE(os.stat(path).st_mode)
+        except FileNotFoundError:
+            file_mode = 0o644
+        os.chmod(tmp_path, file_mode)
+        with open(fd, mode, **open_kwargs) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    _fsync_directory(directory)
+
+def _fsync_directory(directory):
+    if not hasattr(os, 'O_DIRECTORY'):
+        return
+    fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
@@ -0,0 +1,87 @@
+import csv
+import io
+from datetime import datetime
+from storage import get_reminders_by_user_id, upsert_reminders
+from timestamps import TIME_FORMAT, parse_time
+
+def _parse_upload_time(value):
+    """Like parse_time, but also takes the unpadded forms strptime allows ('2030-1-2 9:00:00')"""
+    parsed = parse_time(value)
+    if parsed is None:
+        try:
+            parsed = datetime.strptime(value, TIME_FORMAT)
+        except ValueError:
+            return None
+    return parsed
+
+def import_reminders_csv(user_id, stream):
+    """Import reminders for a user from an uploaded CSV byte stream
+
+    The upload is decoded and parsed row by row. Rows matching one of the
+    user's reminders by (title, reminder_time) update it, the rest become new
+    reminders, and everything is applied with a single storage write.
+
+    Returns a report: counts of imported/updated/skipped rows plus one entry
+    per data row with its line number, title, status and (if skipped) reason.
+    """
+    # Index the user's reminders once instead of rescanning them per row
+    existing = {
+        (reminder.title, reminder.reminder_time): reminder.id
+        for reminder in get_reminders_by_user_id(user_id)
+    }
+
+    inserts = []
+    updates = {}
+    pending = {}
+    rows = []
+
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    try:
+        for row in csv.DictReader(text):
+            entry = {'line': len(rows) + 2, 'title': row.get('title') or '', 'status': 'skipped'}
+            rows.append(entry)
+
+            # Validate required fields
+            if not row.get('title') or not row.get('reminder_time'):
+                entry['reason'] = 'missing title or reminder_time'
+                continue
+
+            # Parse reminder time
+            reminder_time = _parse_upload_time(row['reminder_time'])
+            if reminder_time is None:
+                entry['reason'] = 'reminder_time is not YYYY-MM-DD HH:MM:SS'
+                continue
+
+            change = {
+                'title': row['title'],
+                'description': row.get('description', ''),
+                'reminder_time': reminder_time,
+                'recipient_email': row.get('recipient_email', '') or None,
+            }
+            key = (row['title'], reminder_time)
+            if key in existing:
+                # Update existing reminder
+                updates[key] = dict(change, id=existing[key])
+                entry['status'] = 'updated'
+            elif key in pending:
+                # Repeated within the upload: the last row wins
+                inserts[pending[key]] = change
+                entry['status'] = 'updated'
+            else:
+                # Create new reminder
+                pending[key] = len(inserts)
+                inserts.append(change)
+                entry['status'] = 'imported'
+    finally:
+        # Don't let the wrapper close the upload's stream
+        text.detach()
+
+    if inserts or updates:
+        upsert_reminders(user_id, inserts, list(updates.values()))
+
+    return {
+        'imported': sum(1 for entry in rows if entry['status'] == 'imported'),
+        'updated': sum(1 for entry in rows if entry['status'] == 'updated'),
+        'skipped': sum(1 for entry in rows if entry['status'] == 'skipped'),
+        'rows': rows,
+    }
@@ -0,0 +1,115 @@
+"""
+Internal endpoints for deployments without a long-running scheduler.
+
+On Vercel there is no process to run scheduler.py, so a cron job (Vercel
+Cron, or any external pinger) calls ``/internal/sweep`` instead. Each call
+sweeps due reminders in chunks of SWEEP_CHUNK_SIZE, starting no send once
+SWEEP_TIME_BUDGET seconds have passed, and answers with its counters and a
+continuation cursor; a backlog larger than one call's budget drains over
+successive calls.
+
+The cursor is returned in the response and also saved to SWEEP_CHECKPOINT,
+so a cron that can't pass it back still resumes where the last call
+stopped. Once a call gets through everything due the checkpoint is cleared
+and the next call starts over, which retries any failed sends.
+
+Requests need ``Authorization: Bearer <SWEEP_TOKEN>`` (Vercel Cron sends
+CRON_SECRET this way, so that is the default). Without a token configured
+the endpoint is disabled.
+"""
+import hmac
+import math
+import os
+
+from flask import Blueprint, abort, current_app, jsonify, request
+
+import csv_handler
+import file_lock
+from email_service import SWEEP_LOCK, check_and_send_reminders
+from timestamps import format_time, parse_time
+
+internal_bp = Blueprint('internal', __name__, url_prefix='/internal')
+
+SWEEP_TOKEN = os.environ.get('SWEEP_TOKEN') or os.environ.get('CRON_SECRET')
+# Stay under the platform's function timeout (10 s on Vercel's hobby plan)
+SWEEP_TIME_BUDGET = float(os.environ.get('SWEEP_TIME_BUDGET', 8))
+SWEEP_CHECKPOINT = os.environ.get('SWEEP_CHECKPOINT', os.path.join(csv_handler.TMP_DIR, 'sweep.cursor'))
+# Reminders per chunk unless the caller asks otherwise; small, so each chunk's
+# completed-marking write lands well before the budget runs out
+SWEEP_CHUNK_SIZE = int(os.environ.get('SWEEP_CHUNK_SIZE', 20))
+
+def encode_cursor(cursor):
+    """'<reminder_time>|<id>' for a sweep_key, or None"""
+    if cursor is None:
+        return None
+    return f'{format_time(cursor[0])}|{cursor[1]}'
+
+def decode_cursor(value):
+    """The sweep_key in an encoded cursor; raises ValueError if it isn't one"""
+    reminder_time, _, reminder_id = (value or '').partition('|')
+    when = parse_time(reminder_time)
+    if when is None or not reminder_id.isdigit():
+        raise ValueError(f'Invalid cursor {value!r}')
+    return (when, int(reminder_id))
+
+def load_checkpoint():
+    try:
+        with open(SWEEP_CHECKPOINT, 'r', encoding='utf-8') as f:
+            return decode_cursor(f.read().strip())
+    except (FileNotFoundError, ValueError):
+        return None
+
+def save_checkpoint(cursor):
+    if cursor is None:
+        try:
+            os.remove(SWEEP_CHECKPOINT)
+        except FileNotFoundError:
+            pass
+        return
+    with file_lock.atomic_write(SWEEP_CHECKPOINT, encoding='utf-8') as f:
+        f.write(encode_cursor(cursor))
+
+def _authorized():
+    if not SWEEP_TOKEN:
+        return False
+    header = request.headers.get('Authorization', '')
+    token = header[len('Bearer '):] if header.startswith('Bearer ') else request.headers.get('X-Sweep-Token', '')
+    return hmac.compare_digest(token.encode('utf-8'), SWEEP_TOKEN.encode('utf-8'))
+
+@internal_bp.route('/sweep', methods=['GET', 'POST'])
+def sweep():
+    if not SWEEP_TOKEN:
+        abort(404)
+    if not _authorized():
+        abort(401)
+
+    def to_float(value, default):
+        try:
+            number = float(value)
+        except (TypeError, ValueError):
+            return default
+        # 'inf' and 'nan' parse, but would break int() or every comparison
+        return number if math.isfinite(number) else default
+
+    # Callers may ask for less time than the configured budget, never more
+    budget = min(max(to_float(request.args.get('budget'), SWEEP_TIME_BUDGET), 0), SWEEP_TIME_BUDGET)
+    chunk_size = max(int(to_float(request.args.get('chunk'), 0)), 0) or SWEEP_CHUNK_SIZE
+
+    if request.args.get('cursor'):
+        try:
+            cursor = decode_cursor(request.args['cursor'])
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+    else:
+        cursor = load_checkpoint()
+
+    # Overlapping cron calls (or the scheduler) would send the same reminders twice
+    with file_lock.try_exclusive_lock(SWEEP_LOCK) as locked:
+        if not locked:
+            return jsonify({'error': 'A sweep is already running'}), 409
+        stats = check_and_send_reminders(current_app._get_current_object(), budget=budget,
+                                         chunk_size=chunk_size, cursor=cursor)
+        save_checkpoint(stats['cursor'])
+    stats['cursor'] = encode_cursor(stats['cursor'])
+    stats['done'] = not stats['remaining']
+    return jsonify(stats)
@@ -0,0 +1,107 @@
+"""
+Building reminder emails.
+
+Templates are split into literal text and field names once, when the module
+loads, so rendering is a join rather than a parse. Messages are single-part
+EmailMessage objects (no multipart wrapper) on the compat32 policy with CRLF
+line endings: the newer email policies parse and refold every header through
+the header registry, which made building a message several times slower
+than the old MIMEMultipart path, while compat32 only encodes what needs it.
+
+build_digest_message folds several reminders for one recipient into a single
+email; the sweep uses it when EMAIL_DIGEST is on (see email_service.py).
+"""
+from email import charset, policy
+from email.message import EmailMessage
+from functools import lru_cache
+from string import Formatter
+
+class Template:
+    """A ``str.format``-style template (plain ``{name}`` fields only), parsed once"""
+
+    def __init__(self, text):
+        self.parts = [(literal, field) for literal, field, _, _ in Formatter().parse(text)]
+
+    def render(self, **values):
+        return ''.join(literal + (str(values[field]) if field is not None else '')
+                       for literal, field in self.parts)
+
+REMINDER_SUBJECT = Template('Reminder: {title}')
+REMINDER_BODY = Template("""Hello!
+
+This is a reminder for: {title}
+
+Description: {description}
+
+Scheduled Time: {time}
+
+---
+This is an automated reminder from the Reminder App.
+""")
+
+DIGEST_SUBJECT = Template('Reminders: {count} due')
+DIGEST_ITEM = Template("""- {title} ({time})
+  {description}
+""")
+DIGEST_BODY = Template("""Hello!
+
+These reminders are due:
+
+{items}
+---
+This is an automated reminder from the Reminder App.
+""")
+
+NO_DESCRIPTION = 'No description provided'
+
+# Ready to hand to smtplib as is
+MESSAGE_POLICY = policy.compat32.clone(linesep='\r\n')
+ASCII = charset.Charset('us-ascii')
+# Mostly-ASCII text stays readable in quoted-printable
+UTF8 = charset.Charset('utf-8')
+UTF8.body_encoding = charset.QP
+
+@lru_cache(maxsize=1024)
+def _display_time(when):
+    # Reminders cluster on the same few slots, so most of these are cache hits
+    return when.strftime('%Y-%m-%d %H:%M') if when else ''
+
+def _message(sender_email, receiver_email, subject, body):
+    msg = EmailMessage(policy=MESSAGE_POLICY)
+    msg['From'] = sender_email
+    msg['To'] = receiver_email
+    msg['Subject'] = subject
+    msg['MIME-Version'] = '1.0'
+    msg.set_payload(body, ASCII if body.isascii() else UTF8)
+    return msg
+
+def build_reminder_message(sender_email, receiver_email, title, description, reminder_time):
+    return _message(
+        sender_email,
+        receiver_email,
+        REMINDER_SUBJECT.render(title=title),
+        REMINDER_BODY.render(title=title, description=description or NO_DESCRIPTION,
+                             time=_display_time(reminder_time)),
+    )
+
+def build_digest_message(sender_email, receiver_email, reminders):
+    """One email listing ``reminders``; a single reminder gets the normal email"""
+    if len(reminders) == 1:
+        reminder = reminders[0]
+        return build_reminder_message(sender_email, receiver_email, reminder.title,
+                                      reminder.description, reminder.reminder_time)
+    items = ''.join(
+        DIGEST_ITEM.render(title=reminder.title, description=reminder.description or NO_DESCRIPTION,
+                           time=_display_time(reminder.reminder_time))
+        for reminder in reminders
+    )
+    return _message(
+        sender_email,
+        receiver_email,
+        DIGEST_SUBJECT.render(count=len(reminders)),
+        DIGEST_BODY.render(items=items),
+    )
+
+def serialize(msg):
+    """The message as bytes with CRLF line endings, for smtplib"""
+    return msg.as_bytes()
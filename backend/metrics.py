@@ -0,0 +1,132 @@
+"""
+In-process timing histograms and counters, exposed in the Prometheus text
+format at /metrics.
+
+Set METRICS_ENABLED=1 to collect. When it is off, ``timed`` wrappers and
+``time()`` blocks cost one flag check and nothing is recorded. Values live
+in the process that observed them: each worker (and the scheduler) has its
+own, as with any Prometheus client without a push gateway.
+"""
+import bisect
+import functools
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '').lower() in ('1', 'true', 'yes')
+
+# Upper bounds in seconds, from in-memory lookups up to slow SMTP servers
+DEFAULT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+REGISTRY = []
+
+def _labels(labelnames, values):
+    if not labelnames:
+        return ''
+    pairs = ','.join('{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+                     for name, value in zip(labelnames, values))
+    return '{' + pairs + '}'
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts (last one is +Inf), sum]
+        self._series = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    @contextmanager
+    def time(self, *labels):
+        """Observe how long the block takes (also when it raises)"""
+        if not METRICS_ENABLED:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = sorted((labels, list(counts), total) for labels, (counts, total) in self._series.items())
+        for labels, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                le = _labels(self.labelnames + ('le',), labels + (bound,))
+                lines.append(f'{self.name}_bucket{le} {cumulative}')
+            lines.append(f'{self.name}_sum{_labels(self.labelnames, labels)} {total}')
+            lines.append(f'{self.name}_count{_labels(self.labelnames, labels)} {cumulative}')
+        return lines
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def inc(self, amount=1, *labels):
+        if not METRICS_ENABLED:
+            return
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            lines.append(f'{self.name}{_labels(self.labelnames, labels)} {value}')
+        return lines
+
+def timed(histogram, *labels):
+    """Decorator: observe each call's duration in ``histogram``"""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not METRICS_ENABLED:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - start, *labels)
+        return wrapper
+    return decorate
+
+def render():
+    """Every metric in the Prometheus text exposition format"""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+def reset():
+    for metric in REGISTRY:
+        with metric._lock:
+            getattr(metric, '_series', getattr(metric, '_values', {})).clear()
+
+STORAGE_SECONDS = Histogram('alertify_storage_seconds', 'Time spent in storage calls', ('operation',))
+SMTP_SECONDS = Histogram('alertify_smtp_seconds', 'Time spent talking to the SMTP server', ('phase',))
+SWEEP_SECONDS = Histogram('alertify_sweep_seconds', 'Duration of due-reminder sweeps',
+                          buckets=(0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 300))
+SWEEP_CHUNK_SECONDS = Histogram('alertify_sweep_chunk_seconds', 'Duration of one chunk of a sweep')
+SWEEP_REMINDERS = Counter('alertify_sweep_reminders_total', 'Due reminders handled by sweeps', ('result',))
@@ -0,0 +1,221 @@
+"""
+Durable outbox for reminder emails (SQLite).
+
+With EMAIL_OUTBOX on, the sweep doesn't talk to SMTP at all: it renders each
+email and stores it here. A separate sender (``python outbox.py``) drains the
+queue, marking a message's reminders completed once it is sent, retrying
+failed sends with exponential backoff and moving a message to the dead
+letters after OUTBOX_MAX_ATTEMPTS. Scanning for due reminders then runs at
+the speed of the store rather than of the mail server.
+
+Queued reminders stay pending until sent, so later sweeps see them again.
+Every queued reminder leaves an idempotency key (reminder id, created_at and
+reminder_time) in the same transaction as the message, and the sweep skips
+reminders whose key is already here, so nothing is queued twice.
+Rescheduling a reminder gives it a new key. A dead-lettered reminder stays
+pending (and overdue) until ``--retry-dead`` gets it sent.
+
+A message being sent is leased for OUTBOX_LEASE seconds. If the sender dies
+mid-send, the lease runs out and the message is tried again, so a crash
+between the SMTP hand-off and recording it can still resend that one
+message (SMTP offers nothing stronger).
+"""
+import argparse
+import os
+import random
+import sqlite3
+import threading
+import time
+
+import csv_handler
+
+OUTBOX_PATH = os.environ.get('OUTBOX_PATH', os.path.join(csv_handler.TMP_DIR, 'outbox.db'))
+OUTBOX_MAX_ATTEMPTS = int(os.environ.get('OUTBOX_MAX_ATTEMPTS', 8))
+# Retry n waits OUTBOX_BACKOFF_BASE * 2**(n-1) seconds (with jitter), at most OUTBOX_BACKOFF_MAX
+OUTBOX_BACKOFF_BASE = float(os.environ.get('OUTBOX_BACKOFF_BASE', 30))
+OUTBOX_BACKOFF_MAX = float(os.environ.get('OUTBOX_BACKOFF_MAX', 3600))
+OUTBOX_LEASE = float(os.environ.get('OUTBOX_LEASE', 300))
+OUTBOX_BATCH_SIZE = int(os.environ.get('OUTBOX_BATCH_SIZE', 200))
+# How often an idle sender looks for new messages
+OUTBOX_POLL_INTERVAL = float(os.environ.get('OUTBOX_POLL_INTERVAL', 5))
+
+PENDING = 'pending'
+SENDING = 'sending'
+SENT = 'sent'
+DEAD = 'dead'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    recipient_email TEXT NOT NULL,
+    reminder_ids TEXT NOT NULL,
+    message BLOB NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL,
+    last_error TEXT NOT NULL DEFAULT '',
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_outbox_ready ON outbox (status, next_attempt);
+
+CREATE TABLE IF NOT EXISTS outbox_keys (
+    key TEXT PRIMARY KEY,
+    message_id INTEGER NOT NULL
+)
+"""
+
+_local = threading.local()
+
+def _connect():
+    """Return this thread's connection, creating the schema on first use."""
+    conn = getattr(_local, 'conn', None)
+    if conn is not None and _local.path == OUTBOX_PATH:
+        return conn
+
+    conn = sqlite3.connect(OUTBOX_PATH, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA journal_mode=WAL')
+    with conn:
+        for statement in SCHEMA.split(';'):
+            conn.execute(statement)
+    _local.conn = conn
+    _local.path = OUTBOX_PATH
+    return conn
+
+def reminder_key(reminder):
+    """Idempotency key for one reminder occurrence"""
+    # created_at tells apart a reminder re-created at the same time (and, on
+    # a database that reused its id, with the same id)
+    return f"reminder:{reminder.id}:{reminder['created_at']}:{reminder['reminder_time']}"
+
+def known_keys(keys):
+    """The subset of ``keys`` that are already queued (or were sent)"""
+    conn = _connect()
+    keys = list(keys)
+    known = set()
+    for start in range(0, len(keys), 500):
+        chunk = keys[start:start + 500]
+        rows = conn.execute(f"SELECT key FROM outbox_keys WHERE key IN ({','.join('?' * len(chunk))})", chunk)
+        known.update(row['key'] for row in rows)
+    return known
+
+def enqueue(user_id, recipient_email, reminders, message, now=None):
+    """Queue one email for ``reminders``; returns its id, or None if any of them is already queued"""
+    now = now or time.time()
+    conn = _connect()
+    try:
+        with conn:
+            cursor = conn.execute(
+                'INSERT INTO outbox (user_id, recipient_email, reminder_ids, message, next_attempt, created_at, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (int(user_id), recipient_email, ','.join(str(r.id) for r in reminders), message, now, now, now)
+            )
+            conn.executemany('INSERT INTO outbox_keys (key, message_id) VALUES (?, ?)',
+                             [(reminder_key(r), cursor.lastrowid) for r in reminders])
+    except sqlite3.IntegrityError:
+        # Another sweep queued one of these first
+        return None
+    return cursor.lastrowid
+
+def claim(limit=None, now=None):
+    """Lease up to ``limit`` messages that are ready to send"""
+    now = now or time.time()
+    conn = _connect()
+    with conn:
+        conn.execute('BEGIN IMMEDIATE')
+        rows = conn.execute(
+            'SELECT * FROM outbox WHERE (status = ? AND next_attempt <= ?) OR (status = ? AND next_attempt <= ?) '
+            'ORDER BY next_attempt LIMIT ?',
+            (PENDING, now, SENDING, now, limit or OUTBOX_BATCH_SIZE)
+        ).fetchall()
+        conn.executemany(
+            'UPDATE outbox SET status = ?, attempts = attempts + 1, next_attempt = ?, updated_at = ? WHERE id = ?',
+            [(SENDING, now + OUTBOX_LEASE, now, row['id']) for row in rows]
+        )
+    return [dict(row, attempts=row['attempts'] + 1) for row in rows]
+
+def backoff(attempts):
+    """Seconds to wait before the next try after ``attempts`` failures"""
+    delay = min(OUTBOX_BACKOFF_BASE * 2 ** (attempts - 1), OUTBOX_BACKOFF_MAX)
+    # Jitter, so a burst of failures doesn't come back as a burst
+    return delay * random.uniform(0.5, 1.0)
+
+def mark_sent(message_ids, now=None):
+    now = now or time.time()
+    with _connect() as conn:
+        conn.executemany('UPDATE outbox SET status = ?, updated_at = ? WHERE id = ?',
+                         [(SENT, now, message_id) for message_id in message_ids])
+
+def mark_failed(message, error, now=None):
+    """Schedule a retry, or dead-letter the message once it is out of attempts; returns the new status"""
+    now = now or time.time()
+    status = DEAD if message['attempts'] >= OUTBOX_MAX_ATTEMPTS else PENDING
+    with _connect() as conn:
+        conn.execute(
+            'UPDATE outbox SET status = ?, next_attempt = ?, last_error = ?, updated_at = ? WHERE id = ?',
+            (status, now + backoff(message['attempts']), str(error), now, message['id'])
+        )
+    return status
+
+def next_attempt_time():
+    """When the earliest queued message is due (epoch seconds), or None"""
+    row = _connect().execute(
+        'SELECT MIN(next_attempt) FROM outbox WHERE status IN (?, ?)', (PENDING, SENDING)
+    ).fetchone()
+    return row[0]
+
+def dead_letters():
+    rows = _connect().execute('SELECT * FROM outbox WHERE status = ? ORDER BY id', (DEAD,))
+    return [dict(row) for row in rows]
+
+def retry_dead(message_ids=None, now=None):
+    """Put dead letters (all, or the given ids) back in the queue with fresh attempts"""
+    now = now or time.time()
+    with _connect() as conn:
+        if message_ids is None:
+            cursor = conn.execute(
+                'UPDATE outbox SET status = ?, attempts = 0, next_attempt = ?, updated_at = ? WHERE status = ?',
+                (PENDING, now, now, DEAD)
+            )
+        else:
+            cursor = conn.executemany(
+                'UPDATE outbox SET status = ?, attempts = 0, next_attempt = ?, updated_at = ? WHERE id = ? AND status = ?',
+                [(PENDING, now, now, message_id, DEAD) for message_id in message_ids]
+            )
+    return cursor.rowcount
+
+def counts():
+    """Number of messages in each status"""
+    rows = _connect().execute('SELECT status, COUNT(*) FROM outbox GROUP BY status')
+    return {status: count for status, count in rows}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Send queued reminder emails from the outbox.')
+    parser.add_argument('--once', action='store_true', help='send what is ready and exit')
+    parser.add_argument('--retry-dead', action='store_true', help='requeue every dead letter and exit')
+    args = parser.parse_args(argv)
+
+    if args.retry_dead:
+        print(f"Requeued {retry_dead()} dead letters")
+        return
+
+    # Imported here: email_service imports this module
+    from email_service import drain_outbox
+
+    while True:
+        sent = drain_outbox()
+        if args.once:
+            return
+        if not sent:
+            # Nothing was ready: sleep until the next retry, or poll for new mail
+            next_attempt = next_attempt_time()
+            delay = OUTBOX_POLL_INTERVAL if next_attempt is None else next_attempt - time.time()
+            time.sleep(min(max(delay, 0.1), OUTBOX_POLL_INTERVAL))
+
+if __name__ == '__main__':
+    try:
+        main()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,94 @@
+"""
+Password hashing for register/login.
+
+PASSWORD_HASH_METHOD and PASSWORD_SALT_LENGTH set how new hashes are made
+(any werkzeug method string, e.g. 'pbkdf2:sha256:600000' or 'scrypt:32768:8:1').
+Hashes made with other settings still verify; needs_rehash() tells login to
+store a fresh one, which is how legacy 'sha256$salt$digest' hashes from the
+old register() get upgraded. Those legacy hashes are checked here directly,
+since werkzeug deprecates the plain hashlib methods.
+
+Hashing is deliberately CPU-bound. With PASSWORD_VERIFY_WORKERS > 0,
+verification runs in a process pool of that size, so a burst of logins
+queues there instead of holding request threads on the CPU (and the GIL).
+If the pool doesn't answer within PASSWORD_VERIFY_TIMEOUT seconds,
+verify_password raises PasswordCheckTimeout rather than guessing.
+"""
+import hashlib
+import hmac
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:600000')
+PASSWORD_SALT_LENGTH = int(os.environ.get('PASSWORD_SALT_LENGTH', 16))
+PASSWORD_VERIFY_WORKERS = int(os.environ.get('PASSWORD_VERIFY_WORKERS', 0))
+PASSWORD_VERIFY_TIMEOUT = float(os.environ.get('PASSWORD_VERIFY_TIMEOUT', 30))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+class PasswordCheckTimeout(Exception):
+    """The verification pool was too busy to check a password in time"""
+
+@lru_cache(maxsize=None)
+def _method_prefix(method, salt_length):
+    # werkzeug normalises the method ('pbkdf2' -> 'pbkdf2:sha256:600000'),
+    # so take the prefix from a real hash rather than the setting itself
+    return generate_password_hash('', method=method, salt_length=salt_length).split('$', 1)[0]
+
+def hash_password(password, method=None, salt_length=None):
+    return generate_password_hash(password,
+                                  method=method or PASSWORD_HASH_METHOD,
+                                  salt_length=salt_length or PASSWORD_SALT_LENGTH)
+
+def _check(password_hash, password):
+    method, _, rest = password_hash.partition('$')
+    if ':' not in method and method in hashlib.algorithms_available:
+        # Legacy salted hashlib hash: hmac(salt, password)
+        salt, _, digest = rest.partition('$')
+        expected = hmac.new(salt.encode('utf-8'), password.encode('utf-8'), method).hexdigest()
+        return hmac.compare_digest(expected, digest)
+    return check_password_hash(password_hash, password)
+
+def needs_rehash(password_hash):
+    """True if the hash wasn't made with the current method settings"""
+    return password_hash.split('$', 1)[0] != _method_prefix(PASSWORD_HASH_METHOD, PASSWORD_SALT_LENGTH)
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn, not fork: the app process has threads (and open locks)
+            _pool = ProcessPoolExecutor(max_workers=PASSWORD_VERIFY_WORKERS,
+                                        mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=True)
+
+def verify_password(password_hash, password):
+    if not password_hash or password is None:
+        return False
+    if PASSWORD_VERIFY_WORKERS <= 0:
+        return _check(password_hash, password)
+    try:
+        future = _get_pool().submit(_check, password_hash, password)
+        return future.result(timeout=PASSWORD_VERIFY_TIMEOUT)
+    except FutureTimeoutError:
+        # Don't leave the check queued for a login that has already given up
+        future.cancel()
+        raise PasswordCheckTimeout()
+    except BrokenProcessPool:
+        # A worker died; start a fresh pool next time and answer this one inline
+        shutdown_pool()
+        return _check(password_hash, password)
@@ -0,0 +1,139 @@
+"""
+Compact record types for users and reminders.
+
+Rows are decoded once, when they are loaded: ids become ints, reminder_time
+and created_at datetimes, and is_completed a bool. Attribute access gives
+the decoded values (``reminder.reminder_time`` is a datetime); item access
+gives the stored string form the old dict rows had
+(``reminder['reminder_time']`` is ``'YYYY-MM-DD HH:MM:SS'``), so code and
+templates written against dicts keep working, and ``dict(record)`` turns a
+record back into that dict.
+
+Records use ``__slots__`` and are never modified once built: the stores swap
+in a new record instead, so they can be handed out without copying.
+"""
+from timestamps import format_time, from_epoch, parse_time, to_epoch
+
+def normalize_email(email):
+    """The form emails are indexed and compared in: trimmed and lower-cased"""
+    return (email or '').strip().lower()
+
+class EmailTakenError(ValueError):
+    """Raised by add_user when another user already has the email"""
+
+def _parse_bool(value):
+    return value is True or value == 'True' or value == 1
+
+class Record:
+    __slots__ = ()
+    fields = ()
+    # field -> function turning the decoded value back into its string form
+    encoders = {}
+
+    def __getitem__(self, field):
+        if field not in self.encoders:
+            raise KeyError(field)
+        return self.encoders[field](getattr(self, field))
+
+    def get(self, field, default=None):
+        if field not in self.encoders:
+            return default
+        return self.encoders[field](getattr(self, field))
+
+    def keys(self):
+        return self.fields
+
+    def __iter__(self):
+        return iter(self.fields)
+
+    def __contains__(self, field):
+        return field in self.encoders
+
+    def __len__(self):
+        return len(self.fields)
+
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return all(getattr(self, field) == getattr(other, field) for field in self.fields)
+
+    def __repr__(self):
+        values = ', '.join(f'{field}={getattr(self, field)!r}' for field in self.fields)
+        return f'{type(self).__name__}({values})'
+
+    def to_dict(self):
+        return {field: self[field] for field in self.fields}
+
+    def replace(self, **changes):
+        """A copy of this record with some fields changed"""
+        values = {field: getattr(self, field) for field in self.fields}
+        values.update(changes)
+        return type(self)(**values)
+
+class User(Record):
+    __slots__ = ('id', 'username', 'email', 'password_hash', 'app_password')
+    fields = __slots__
+    encoders = {'id': str, 'username': str, 'email': str, 'password_hash': str, 'app_password': str}
+
+    def __init__(self, id, username, email, password_hash, app_password=''):
+        self.id = id
+        self.username = username
+        self.email = email
+        self.password_hash = password_hash
+        self.app_password = app_password
+
+    @classmethod
+    def from_dict(cls, row):
+        """Build a user from a dict of stored values (e.g. a CSV row)"""
+        return cls(
+            int(row['id']),
+            row.get('username') or '',
+            row.get('email') or '',
+            row.get('password_hash') or '',
+            row.get('app_password') or '',
+        )
+
+class Reminder(Record):
+    __slots__ = ('id', 'user_id', 'title', 'description', 'reminder_time', 'created_at', 'is_completed', 'recipient_email')
+    fields = __slots__
+    encoders = {
+        'id': str,
+        'user_id': str,
+        'title': str,
+        'description': str,
+        'reminder_time': format_time,
+        'created_at': format_time,
+        'is_completed': str,
+        'recipient_email': str,
+        # Derived, not a field: only written when REMINDER_EPOCH_COLUMN is on
+        'reminder_epoch': lambda value: '' if value is None else str(value),
+    }
+
+    def __init__(self, id, user_id, title, description, reminder_time, created_at, is_completed=False, recipient_email=''):
+        self.id = id
+        self.user_id = user_id
+        self.title = title
+        self.description = description
+        self.reminder_time = reminder_time
+        self.created_at = created_at
+        self.is_completed = is_completed
+        self.recipient_email = recipient_email
+
+    @property
+    def reminder_epoch(self):
+        return to_epoch(self.reminder_time) if self.reminder_time is not None else None
+
+    @classmethod
+    def from_dict(cls, row):
+        """Build a reminder from a dict of stored values (e.g. a CSV row)"""
+        epoch = row.get('reminder_epoch')
+        return cls(
+            int(row['id']),
+            int(row['user_id']),
+            row.get('title') or '',
+            row.get('description') or '',
+            from_epoch(epoch) if epoch else parse_time(row.get('reminder_time')),
+            parse_time(row.get('created_at')),
+            _parse_bool(row.get('is_completed')),
+            row.get('recipient_email') or '',
+        )
@@ -1,18 +1,73 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, send_file
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, Response, stream_with_context
 import csv
 from flask_login import login_required, current_user
 from datetime import datetime
 import io
-from csv_handler import add_reminder, get_reminders_by_user_id, get_reminder_by_id, update_reminder
+import zlib
+from storage import add_reminder, iter_reminders_by_user_id, get_reminders_page, get_reminder_by_id, update_reminder
+from importer import import_reminders_csv
+from scheduler import notify_scheduler
 
 reminders_bp = Blueprint('reminders', __name__)
 
+# Export responses are flushed to the client in chunks of roughly this many bytes
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+# Dashboard paging
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+# Parameters the pagination links carry over; anything else could clash with url_for's own
+FILTER_ARGS = ('per_page', 'sort', 'order', 'status', 'start', 'end')
+
+def _page_args(args):
+    """Read and sanitise the dashboard's paging, sorting and filter parameters"""
+    def to_int(value, default):
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return default
+
+    def to_bound(value, time_of_day):
+        try:
+            return datetime.strptime(value, '%Y-%m-%d').strftime('%Y-%m-%d ') + time_of_day
+        except (TypeError, ValueError):
+            return None
+
+    sort = args.get('sort')
+    status = args.get('status')
+    return {
+        'page': max(to_int(args.get('page'), 1), 1),
+        'per_page': min(max(to_int(args.get('per_page'), DEFAULT_PAGE_SIZE), 1), MAX_PAGE_SIZE),
+        'sort': sort if sort in ('reminder_time', 'created_at') else 'created_at',
+        'order': 'desc' if args.get('order') == 'desc' else 'asc',
+        'status': status if status in ('completed', 'pending') else None,
+        'start': to_bound(args.get('start'), '00:00:00'),
+        'end': to_bound(args.get('end'), '23:59:59'),
+    }
+
 @reminders_bp.route('/dashboard')
 @login_required
 def dashboard():
-    # Get user's reminders
-    reminders = get_reminders_by_user_id(current_user.id)
-    return render_template('dashboard.html', reminders=reminders)
+    # Get one page of the user's reminders
+    query = _page_args(request.args)
+    reminders, total = get_reminders_page(current_user.id, **query)
+    pages = max((total + query['per_page'] - 1) // query['per_page'], 1)
+    return render_template('dashboard.html', reminders=reminders, total=total, pages=pages, query=query,
+                           filters={key: request.args[key] for key in FILTER_ARGS if request.args.get(key)})
+
+@reminders_bp.route('/api/reminders')
+@login_required
+def reminders_api():
+    # Same paging and filters as the dashboard, as JSON for lazy loading
+    query = _page_args(request.args)
+    reminders, total = get_reminders_page(current_user.id, **query)
+    return jsonify({
+        'reminders': [reminder.to_dict() for reminder in reminders],
+        'page': query['page'],
+        'per_page': query['per_page'],
+        'total': total,
+        'pages': max((total + query['per_page'] - 1) // query['per_page'], 1),
+    })
 
 @reminders_bp.route('/create_reminder', methods=['GET', 'POST'])
 @login_required
@@ -29,8 +84,9 @@ def create_reminder():
             flash('Invalid date/time format')
             return redirect(url_for('reminders.create_reminder'))
         
-        # Create new reminder using CSV
+        # Create new reminder in storage
         add_reminder(current_user.id, title, description, reminder_time, recipient_email)
+        notify_scheduler()
         
         flash('Reminder created successfully!')
         return redirect(url_for('reminders.dashboard'))
@@ -43,7 +99,7 @@ def edit_reminder(reminder_id):
     reminder = get_reminder_by_id(reminder_id)
     
     # Check if reminder exists and belongs to current user
-    if not reminder or reminder['user_id'] != str(current_user.id):
+    if not reminder or reminder.user_id != int(current_user.id):
         flash('You cannot edit this reminder')
         return redirect(url_for('reminders.dashboard'))
     
@@ -59,13 +115,13 @@ def edit_reminder(reminder_id):
             flash('Invalid date/time format')
             return redirect(url_for('reminders.edit_reminder', reminder_id=reminder_id))
         
-        # Update reminder using CSV
+        # Update reminder in storage
         update_reminder(reminder_id, title, description, reminder_time, recipient_email)
+        notify_scheduler()
         flash('Reminder updated successfully!')
         return redirect(url_for('reminders.dashboard'))
     
-    reminder_time = datetime.strptime(reminder['reminder_time'], '%Y-%m-%d %H:%M:%S')
-    return render_template('edit_reminder.html', reminder=reminder, reminder_time=reminder_time)
+    return render_template('edit_reminder.html', reminder=reminder, reminder_time=reminder.reminder_time)
 
 @reminders_bp.route('/delete_reminder/<int:reminder_id>')
 @login_required
@@ -73,51 +129,70 @@ def delete_reminder(reminder_id):
     reminder = get_reminder_by_id(reminder_id)
     
     # Check if reminder exists and belongs to current user
-    if not reminder or reminder['user_id'] != str(current_user.id):
+    if not reminder or reminder.user_id != int(current_user.id):
         flash('You cannot delete this reminder')
         return redirect(url_for('reminders.dashboard'))
     
-    # Delete reminder using CSV
-    from csv_handler import delete_reminder as delete_reminder_csv
-    delete_reminder_csv(reminder_id)
+    # Delete reminder from storage
+    from storage import delete_reminder as delete_stored_reminder
+    delete_stored_reminder(reminder_id)
     flash('Reminder deleted successfully!')
     return redirect(url_for('reminders.dashboard'))
 
-@reminders_bp.route('/export_reminders')
-@login_required
-def export_reminders():
-    # Get user's reminders
-    reminders = get_reminders_by_user_id(current_user.id)
-    
-    # Create CSV data in memory
+def _export_chunks(reminders, compress=False):
+    """Yield the CSV export in chunks of about EXPORT_CHUNK_SIZE bytes, optionally gzipped"""
     output = io.StringIO()
     writer = csv.writer(output)
-    
+    gzipper = zlib.compressobj(wbits=31) if compress else None
+
+    def flush():
+        data = output.getvalue().encode('utf-8')
+        output.seek(0)
+        output.truncate()
+        return gzipper.compress(data) if gzipper else data
+
     # Write header
     writer.writerow(['id', 'user_id', 'title', 'description', 'reminder_time', 'created_at', 'is_completed', 'recipient_email'])
-    
+
     # Write data
     for reminder in reminders:
         writer.writerow([
-            reminder['id'],
-            reminder['user_id'],
-            reminder['title'],
-            reminder['description'] or '',
+            reminder.id,
+            reminder.user_id,
+            reminder.title,
+            reminder.description,
             reminder['reminder_time'],
             reminder['created_at'],
-            'Yes' if reminder['is_completed'] == 'True' else 'No',
-            reminder.get('recipient_email', '') or ''
+            'Yes' if reminder.is_completed else 'No',
+            reminder.recipient_email
         ])
-    
-    # Prepare file for download
-    output.seek(0)
-    
-    return send_file(
-        io.BytesIO(output.getvalue().encode('utf-8')),
-        mimetype='text/csv',
-        as_attachment=True,
-        download_name=f'reminders_export_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
-    )
+        if output.tell() >= EXPORT_CHUNK_SIZE:
+            chunk = flush()
+            if chunk:
+                yield chunk
+
+    chunk = flush()
+    if gzipper:
+        chunk += gzipper.flush()
+    if chunk:
+        yield chunk
+
+@reminders_bp.route('/export_reminders')
+@login_required
+def export_reminders():
+    # Stream the user's reminders straight from storage, a chunk at a time
+    reminders = iter_reminders_by_user_id(current_user.id)
+
+    # gzip when the client accepts it, unless turned off with ?gzip=0
+    compress = 'gzip' in request.accept_encodings and request.args.get('gzip') != '0'
+
+    filename = f'reminders_export_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
+    response = Response(stream_with_context(_export_chunks(reminders, compress)), mimetype='text/csv')
+    response.headers['Content-Disposition'] = f'attachment; filename={filename}'
+    response.headers['Vary'] = 'Accept-Encoding'
+    if compress:
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
 
 @reminders_bp.route('/import_reminders', methods=['GET', 'POST'])
 @login_required
@@ -137,60 +212,18 @@ def import_reminders():
             return redirect(url_for('reminders.dashboard'))
         
         try:
-            # Read CSV file
-            stream = io.StringIO(file.stream.read().decode("UTF8"), newline=None)
-            csv_reader = csv.DictReader(stream)
-            
-            imported_count = 0
-            skipped_count = 0
-            
-            for row in csv_reader:
-                # Validate required fields
-                if not row.get('title') or not row.get('reminder_time'):
-                    skipped_count += 1
-                    continue
-                
-                # Parse reminder time
-                try:
-                    reminder_time = datetime.strptime(row['reminder_time'], '%Y-%m-%d %H:%M:%S')
-                except ValueError:
-                    skipped_count += 1
-                    continue
-                
-                # Check if reminder already exists (by title and time)
-                existing_reminder = None
-                user_reminders = get_reminders_by_user_id(current_user.id)
-                for user_reminder in user_reminders:
-                    if (user_reminder['title'] == row['title'] and 
-                        user_reminder['reminder_time'] == reminder_time.strftime('%Y-%m-%d %H:%M:%S')):
-                        existing_reminder = user_reminder
-                        break
-                
-                if existing_reminder:
-                    # Update existing reminder
-                    update_reminder(
-                        existing_reminder['id'],
-                        row['title'],
-                        row.get('description', ''),
-                        reminder_time,
-                        row.get('recipient_email', '') or None
-                    )
-                else:
-                    # Create new reminder
-                    add_reminder(
-                        current_user.id,
-                        row['title'],
-                        row.get('description', ''),
-                        reminder_time,
-                        row.get('recipient_email', '') or None
-                    )
-                    imported_count += 1
-            
-            flash(f'Imported {imported_count} reminders, skipped {skipped_count} due to missing fields.')
-            return redirect(url_for('reminders.dashboard'))
-        
+            # Stream the upload into one bulk write
+            report = import_reminders_csv(current_user.id, file.stream)
+            notify_scheduler()
         except Exception as e:
             flash('An error occurred while importing reminders.')
             return redirect(url_for('reminders.dashboard'))
+
+        if request.accept_mimetypes.best_match(['text/html', 'application/json']) == 'application/json':
+            return jsonify(report)
+
+        flash(f"Imported {report['imported']} reminders, updated {report['updated']}, "
+              f"skipped {report['skipped']} due to missing fields or invalid dates.")
+        return redirect(url_for('reminders.dashboard'))
     
     return render_template('import_reminders.html')
@@ -0,0 +1,124 @@
+"""
+Standalone due-reminder scheduler.
+
+Run it next to the web app (``python scheduler.py``). It sends whatever is
+due, then sleeps until the next pending reminder_time. The web app pings it
+over a local UDP socket whenever reminders are created, edited or imported,
+so a reminder that becomes the earliest one cuts the sleep short instead of
+waiting for a polling interval.
+"""
+import argparse
+import os
+import select
+import socket
+import threading
+from datetime import datetime
+
+import file_lock
+import smtp_pool
+from email_service import SWEEP_LOCK, check_and_send_reminders
+from storage import get_next_due_time
+
+SCHEDULER_HOST = os.environ.get('SCHEDULER_HOST', '127.0.0.1')
+SCHEDULER_PORT = int(os.environ.get('SCHEDULER_PORT', 8765))
+# Longest single sleep, so changes made without a ping (another host, a manual
+# edit of the data files) and failed sends are still picked up eventually
+SCHEDULER_MAX_SLEEP = float(os.environ.get('SCHEDULER_MAX_SLEEP', 300))
+
+def notify_scheduler(host=None, port=None):
+    """Wake a running scheduler because reminders changed; never raises"""
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            sock.sendto(b'wake', (host or SCHEDULER_HOST, port or SCHEDULER_PORT))
+    except OSError:
+        # Nobody listening, or no network: the scheduler's max sleep covers it
+        pass
+
+class Scheduler:
+    """Sleep until the next reminder is due, sweep, repeat.
+
+    Each sweep is ``check_and_send_reminders``, which sends in batches of
+    SWEEP_BATCH_SIZE. A ping on the wake socket ends the sleep early so the
+    next due time is recomputed.
+    """
+
+    def __init__(self, app, host=None, port=None, max_sleep=None):
+        self.app = app
+        self.max_sleep = max_sleep if max_sleep is not None else SCHEDULER_MAX_SLEEP
+        self.stopping = threading.Event()
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind((host or SCHEDULER_HOST, SCHEDULER_PORT if port is None else port))
+        self.sock.setblocking(False)
+        self.address = self.sock.getsockname()
+
+    def seconds_until_due(self, now=None):
+        """How long to sleep: until the next reminder after ``now``, capped"""
+        now = now or datetime.now()
+        next_due = get_next_due_time(after=now)
+        if next_due is None:
+            return self.max_sleep
+        return min(max((next_due - now).total_seconds(), 0), self.max_sleep)
+
+    def wait(self, timeout):
+        """Sleep up to ``timeout`` seconds; return True if woken by a ping"""
+        readable, _, _ = select.select([self.sock], [], [], timeout)
+        if not readable:
+            return False
+        # Several pings while we were busy count as one wake-up
+        while True:
+            try:
+                self.sock.recv(64)
+            except BlockingIOError:
+                return True
+
+    def run_once(self):
+        now = datetime.now()
+        # Waits out a sweep already running from /internal/sweep
+        with file_lock.exclusive_lock(SWEEP_LOCK):
+            check_and_send_reminders(self.app)
+        return self.seconds_until_due(now)
+
+    def run(self):
+        print(f"⏰ Scheduler listening for wake-ups on {self.address[0]}:{self.address[1]}")
+        while not self.stopping.is_set():
+            timeout = self.run_once()
+            # Close sessions past their idle timeout rather than leave them
+            # open through the sleep for the server to drop
+            smtp_pool.pool.evict_idle()
+            if timeout > 0 and not self.stopping.is_set():
+                self.wait(timeout)
+
+    def stop(self):
+        self.stopping.set()
+        notify_scheduler(*self.address)
+
+    def close(self):
+        self.sock.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Send due reminders, sleeping until the next one is due.')
+    parser.add_argument('--once', action='store_true', help='run a single sweep and exit')
+    parser.add_argument('--host', default=SCHEDULER_HOST, help='address to listen on for wake-up pings')
+    parser.add_argument('--port', type=int, default=SCHEDULER_PORT, help='UDP port to listen on for wake-up pings')
+    parser.add_argument('--max-sleep', type=float, default=SCHEDULER_MAX_SLEEP, help='longest single sleep, in seconds')
+    args = parser.parse_args(argv)
+
+    # Imported here: app imports reminders, which imports this module
+    from app import create_app
+    app = create_app()
+
+    if args.once:
+        with file_lock.exclusive_lock(SWEEP_LOCK):
+            check_and_send_reminders(app)
+        return
+
+    scheduler = Scheduler(app, args.host, args.port, args.max_sleep)
+    try:
+        scheduler.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        scheduler.close()
+
+if __name__ == '__main__':
+    main()
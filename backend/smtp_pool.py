@@ -0,0 +1,146 @@
+import os
+import smtplib
+import threading
+import time
+from contextlib import contextmanager
+
+from metrics import SMTP_SECONDS
+
+# SMTP server settings - Gmail by default, override for other providers or a local sink
+SMTP_HOST = os.environ.get('SMTP_HOST', 'smtp.gmail.com')
+SMTP_PORT = int(os.environ.get('SMTP_PORT', 587))
+SMTP_STARTTLS = os.environ.get('SMTP_STARTTLS', '1').lower() not in ('0', 'false', 'no')
+SMTP_TIMEOUT = float(os.environ.get('SMTP_TIMEOUT', 30))
+# Idle sessions older than this are closed instead of reused
+SMTP_IDLE_TIMEOUT = float(os.environ.get('SMTP_IDLE_TIMEOUT', 60))
+# Sessions idle for longer than this get a NOOP before they are reused
+SMTP_HEALTHCHECK_AFTER = float(os.environ.get('SMTP_HEALTHCHECK_AFTER', 5))
+
+class SMTPConnectionPool:
+    """Authenticated SMTP sessions kept open and reused per sender account.
+
+    Sessions are keyed by ``(sender_email, app_password)`` so the TCP/TLS
+    handshake and login are paid once per account rather than once per email.
+    A session is checked out for exclusive use, so several threads can send
+    for the same account at once, each on its own connection.
+    """
+
+    def __init__(self, host=None, port=None, starttls=None, idle_timeout=None, healthcheck_after=None):
+        self.host = host or SMTP_HOST
+        self.port = port or SMTP_PORT
+        self.starttls = SMTP_STARTTLS if starttls is None else starttls
+        self.idle_timeout = SMTP_IDLE_TIMEOUT if idle_timeout is None else idle_timeout
+        self.healthcheck_after = SMTP_HEALTHCHECK_AFTER if healthcheck_after is None else healthcheck_after
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def _connect(self, sender_email, app_password):
+        with SMTP_SECONDS.time('connect'):
+            server = smtplib.SMTP(self.host, self.port, timeout=SMTP_TIMEOUT)
+        try:
+            if self.starttls:
+                with SMTP_SECONDS.time('starttls'):
+                    server.starttls()
+            with SMTP_SECONDS.time('login'):
+                server.login(sender_email, app_password)
+        except Exception:
+            _close(server)
+            raise
+        return server
+
+    def acquire(self, sender_email, app_password):
+        """Check out a logged-in session, reusing an idle one when it is still healthy."""
+        key = (sender_email, app_password)
+        while True:
+            with self._lock:
+                idle = self._idle.get(key)
+                entry = idle.pop() if idle else None
+            if entry is None:
+                return self._connect(sender_email, app_password)
+
+            server, last_used = entry
+            idle_for = time.monotonic() - last_used
+            if idle_for > self.idle_timeout:
+                _close(server)
+                continue
+            if idle_for > self.healthcheck_after and not _is_alive(server):
+                _close(server)
+                continue
+            return server
+
+    def release(self, sender_email, app_password, server):
+        """Return a session to the pool for reuse."""
+        with self._lock:
+            self._idle.setdefault((sender_email, app_password), []).append((server, time.monotonic()))
+
+    def discard(self, server):
+        _close(server)
+
+    @contextmanager
+    def connection(self, sender_email, app_password):
+        server = self.acquire(sender_email, app_password)
+        try:
+            yield server
+        except smtplib.SMTPServerDisconnected:
+            self.discard(server)
+            raise
+        except Exception:
+            # The session may be mid-transaction; reset it or drop it
+            try:
+                server.rset()
+            except Exception:
+                self.discard(server)
+                raise
+            self.release(sender_email, app_password, server)
+            raise
+        else:
+            self.release(sender_email, app_password, server)
+
+    def sendmail(self, sender_email, app_password, to_addrs, message):
+        """Send one message, reconnecting once if the pooled session was dropped."""
+        try:
+            with self.connection(sender_email, app_password) as server:
+                with SMTP_SECONDS.time('send'):
+                    return server.sendmail(sender_email, to_addrs, message)
+        except smtplib.SMTPServerDisconnected:
+            with self.connection(sender_email, app_password) as server:
+                with SMTP_SECONDS.time('send'):
+                    return server.sendmail(sender_email, to_addrs, message)
+
+    def evict_idle(self):
+        """Close sessions that have been idle longer than ``idle_timeout``."""
+        now = time.monotonic()
+        expired = []
+        with self._lock:
+            for key, idle in list(self._idle.items()):
+                keep = [(s, t) for s, t in idle if now - t <= self.idle_timeout]
+                expired.extend(s for s, t in idle if now - t > self.idle_timeout)
+                if keep:
+                    self._idle[key] = keep
+                else:
+                    del self._idle[key]
+        for server in expired:
+            _close(server)
+        return len(expired)
+
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for entries in idle.values():
+            for server, _ in entries:
+                _close(server)
+
+def _is_alive(server):
+    try:
+        return server.noop()[0] == 250
+    except Exception:
+        return False
+
+def _close(server):
+    try:
+        server.quit()
+    except Exception:
+        server.close()
+
+# Shared pool, so sessions survive from one sweep to the next
+pool = SMTPConnectionPool()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Minimal local SMTP server that accepts and records every message.
+
+Used by the tests and benchmarks in place of Gmail. It speaks just enough
+ESMTP for smtplib: EHLO/HELO, AUTH PLAIN/LOGIN (any credentials), MAIL, RCPT,
+DATA, NOOP, RSET and QUIT. No STARTTLS, so point the app at it with
+SMTP_HOST=127.0.0.1 SMTP_PORT=<port> SMTP_STARTTLS=0.
+"""
+import socketserver
+import sys
+import threading
+
+class _SinkHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(line.encode('ascii') + b'\r\n')
+
+    def handle(self):
+        sink = self.server.sink
+        sink._opened(self.request)
+        try:
+            self.reply('220 sink ESMTP ready')
+            mail_from, rcpt_to = None, []
+            while True:
+                line = self.rfile.readline()
+                if not line:
+                    return
+                command = line.decode('utf-8', 'replace').strip()
+                verb = command.split(' ', 1)[0].upper()
+
+                if verb == 'EHLO':
+                    self.reply('250-sink')
+                    self.reply('250-AUTH PLAIN LOGIN')
+                    self.reply('250 8BITMIME')
+                elif verb == 'HELO':
+                    self.reply('250 sink')
+                elif verb == 'AUTH':
+                    if command.upper().startswith('AUTH LOGIN'):
+                        self.reply('334 VXNlcm5hbWU6')
+                        self.rfile.readline()
+                        self.reply('334 UGFzc3dvcmQ6')
+                        self.rfile.readline()
+                    sink._count('logins')
+                    self.reply('235 2.7.0 Authentication successful')
+                elif verb == 'MAIL':
+                    mail_from, rcpt_to = command[10:].strip('<> '), []
+                    self.reply('250 OK')
+                elif verb == 'RCPT':
+                    rcpt_to.append(command[8:].strip('<> '))
+                    self.reply('250 OK')
+                elif verb == 'DATA':
+                    self.reply('354 End data with <CR><LF>.<CR><LF>')
+                    lines = []
+                    while True:
+                        data = self.rfile.readline()
+                        if not data or data in (b'.\r\n', b'.\n'):
+                            break
+                        lines.append(data[1:] if data.startswith(b'..') else data)
+                    sink._received(mail_from, rcpt_to, b''.join(lines))
+                    mail_from, rcpt_to = None, []
+                    self.reply('250 OK: queued')
+                elif verb == 'NOOP':
+                    sink._count('noops')
+                    self.reply('250 OK')
+                elif verb == 'RSET':
+                    mail_from, rcpt_to = None, []
+                    self.reply('250 OK')
+                elif verb == 'QUIT':
+                    self.reply('221 Bye')
+                    return
+                else:
+                    self.reply('502 Command not implemented')
+        except OSError:
+            return
+        finally:
+            sink._closed(self.request)
+
+class _SinkServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+class SMTPSink:
+    """Threaded SMTP sink; use as a context manager or call start()/stop()."""
+
+    def __init__(self, host='127.0.0.1', port=0):
+        self.server = _SinkServer((host, port), _SinkHandler)
+        self.server.sink = self
+        self.host, self.port = self.server.server_address
+        self.messages = []
+        self.stats = {'connections': 0, 'logins': 0, 'noops': 0}
+        self._sockets = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def _opened(self, sock):
+        with self._lock:
+            self._sockets.add(sock)
+            self.stats['connections'] += 1
+
+    def _closed(self, sock):
+        with self._lock:
+            self._sockets.discard(sock)
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def _received(self, mail_from, rcpt_to, data):
+        with self._lock:
+            self.messages.append({'from': mail_from, 'to': list(rcpt_to), 'data': data})
+
+    def drop_connections(self):
+        """Close every open client connection, as a server timeout would."""
+        with self._lock:
+            sockets = list(self._sockets)
+        for sock in sockets:
+            try:
+                sock.shutdown(2)
+            except OSError:
+                pass
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.drop_connections()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+if __name__ == '__main__':
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 1025
+    sink = SMTPSink(port=port)
+    print(f"SMTP sink listening on {sink.host}:{sink.port} (Ctrl+C to stop)")
+    try:
+        sink.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,391 @@
+import csv
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+import csv_handler
+from records import EmailTakenError, Reminder, User, normalize_email
+from timestamps import format_time, parse_time
+
+# Database path - defaults next to the CSV files in /tmp
+SQLITE_PATH = os.environ.get('SQLITE_PATH', os.path.join(csv_handler.TMP_DIR, 'alertify.db'))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY,
+    username TEXT NOT NULL,
+    email TEXT NOT NULL,
+    password_hash TEXT NOT NULL,
+    app_password TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_users_email_key ON users (lower(trim(email)));
+
+CREATE TABLE IF NOT EXISTS reminders (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    title TEXT NOT NULL,
+    description TEXT NOT NULL DEFAULT '',
+    reminder_time TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    is_completed INTEGER NOT NULL DEFAULT 0,
+    recipient_email TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_reminders_user_id ON reminders (user_id);
+CREATE INDEX IF NOT EXISTS idx_reminders_due ON reminders (is_completed, reminder_time);
+CREATE INDEX IF NOT EXISTS idx_reminders_user_time ON reminders (user_id, reminder_time);
+CREATE INDEX IF NOT EXISTS idx_reminders_user_created ON reminders (user_id, created_at);
+"""
+
+# Bumped whenever SCHEMA changes; version 0 means a brand new database. Older
+# databases re-run SCHEMA, whose statements all skip what already exists
+# (3 added idx_users_email_key; 4 made reminders.id AUTOINCREMENT, so a
+# deleted reminder's id is never handed out again)
+SCHEMA_VERSION = 4
+
+REMINDER_COLUMNS = 'id, user_id, title, description, reminder_time, created_at, is_completed, recipient_email'
+
+_local = threading.local()
+_init_lock = threading.Lock()
+
+def _connect():
+    """Return this thread's connection, creating the schema on first use."""
+    conn = getattr(_local, 'conn', None)
+    if conn is not None and _local.path == SQLITE_PATH:
+        return conn
+
+    conn = sqlite3.connect(SQLITE_PATH, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    with _init_lock:
+        if conn.execute('PRAGMA user_version').fetchone()[0] < SCHEMA_VERSION:
+            _create_schema(conn)
+    _local.conn = conn
+    _local.path = SQLITE_PATH
+    return conn
+
+def _create_schema(conn):
+    with conn:
+        conn.execute('BEGIN IMMEDIATE')
+        # Another process may have finished while we waited for the write lock
+        version = conn.execute('PRAGMA user_version').fetchone()[0]
+        if version >= SCHEMA_VERSION:
+            return
+        if 0 < version < 4:
+            # AUTOINCREMENT can't be added in place: move the rows to a new table
+            conn.execute('ALTER TABLE reminders RENAME TO reminders_old')
+            _run_schema(conn)
+            conn.execute(f'INSERT INTO reminders ({REMINDER_COLUMNS}) SELECT {REMINDER_COLUMNS} FROM reminders_old')
+            # Dropping the old table frees its index names for the new one
+            conn.execute('DROP TABLE reminders_old')
+        _run_schema(conn)
+        if version == 0:
+            _migrate_csv(conn)
+        conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+
+def _run_schema(conn):
+    for statement in SCHEMA.split(';'):
+        if statement.strip():
+            conn.execute(statement)
+
+def _read_csv(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        return list(csv.DictReader(f))
+
+def _migrate_csv(conn):
+    """One-shot import of the existing users.csv/reminders.csv (or its shards)."""
+    users = _read_csv(csv_handler.USERS_CSV)
+    conn.executemany(
+        'INSERT OR IGNORE INTO users (id, username, email, password_hash, app_password) VALUES (?, ?, ?, ?, ?)',
+        [(int(u['id']), u['username'], u['email'], u['password_hash'], u.get('app_password') or '') for u in users]
+    )
+
+    # With sharding on, reminders.csv is gone and the manifest lists the shard files
+    stored = [csv_handler.REMINDERS_CSV, csv_handler.REMINDERS_CSV + csv_handler.MANIFEST_SUFFIX]
+    reminders = csv_handler.get_all_reminders() if any(map(os.path.exists, stored)) else []
+    conn.executemany(
+        'INSERT OR IGNORE INTO reminders (id, user_id, title, description, reminder_time, created_at, is_completed, recipient_email) '
+        'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+        [(
+            r.id,
+            r.user_id,
+            r.title,
+            r.description,
+            r['reminder_time'],
+            r['created_at'],
+            1 if r.is_completed else 0,
+            r.recipient_email
+        ) for r in reminders]
+    )
+    if users or reminders:
+        print(f"✅ Migrated {len(users)} users and {len(reminders)} reminders from CSV to SQLite")
+
+# Rows are handed out as the same record types as csv_handler
+def _user_record(row):
+    if row is None:
+        return None
+    return User(row['id'], row['username'], row['email'], row['password_hash'], row['app_password'])
+
+def _reminder_record(row):
+    if row is None:
+        return None
+    return Reminder(
+        row['id'],
+        row['user_id'],
+        row['title'],
+        row['description'],
+        parse_time(row['reminder_time']),
+        parse_time(row['created_at']),
+        bool(row['is_completed']),
+        row['recipient_email'],
+    )
+
+def init_storage():
+    _connect()
+
+# User management functions
+def get_next_user_id():
+    row = _connect().execute('SELECT COALESCE(MAX(id), 0) + 1 FROM users').fetchone()
+    return row[0]
+
+def add_user(username, email, password_hash, app_password=''):
+    conn = _connect()
+    with conn:
+        # One statement, so the uniqueness check and the insert can't be split
+        cursor = conn.execute(
+            'INSERT INTO users (username, email, password_hash, app_password) SELECT ?, ?, ?, ? '
+            'WHERE NOT EXISTS (SELECT 1 FROM users WHERE lower(trim(email)) = ?)',
+            (username, email, password_hash, app_password or '', normalize_email(email))
+        )
+    if cursor.rowcount == 0:
+        raise EmailTakenError(email)
+    return cursor.lastrowid
+
+def get_user_by_email(email):
+    row = _connect().execute('SELECT * FROM users WHERE lower(trim(email)) = ? ORDER BY id LIMIT 1',
+                             (normalize_email(email),)).fetchone()
+    return _user_record(row)
+
+def get_user_by_id(user_id):
+    row = _connect().execute('SELECT * FROM users WHERE id = ?', (user_id,)).fetchone()
+    return _user_record(row)
+
+def get_users_by_ids(user_ids):
+    """Resolve many users at once; returns {user_id (str): user} for the ones that exist"""
+    conn = _connect()
+    user_ids = list(set(map(str, user_ids)))
+    users = {}
+    # Stay well under SQLite's bound-parameter limit
+    for start in range(0, len(user_ids), 500):
+        chunk = user_ids[start:start + 500]
+        placeholders = ', '.join('?' * len(chunk))
+        for row in conn.execute(f'SELECT * FROM users WHERE id IN ({placeholders})', chunk):
+            user = _user_record(row)
+            users[user['id']] = user
+    return users
+
+def update_user_email_credentials(user_id, new_email, new_app_password):
+    conn = _connect()
+    with conn:
+        # One statement, so the uniqueness check and the update can't be split
+        cursor = conn.execute(
+            'UPDATE users SET email = ?, app_password = ? WHERE id = ? '
+            'AND NOT EXISTS (SELECT 1 FROM users WHERE lower(trim(email)) = ? AND id != ?)',
+            (new_email, new_app_password, user_id, normalize_email(new_email), user_id)
+        )
+        if cursor.rowcount == 0 and conn.execute('SELECT 1 FROM users WHERE id = ?', (user_id,)).fetchone():
+            raise EmailTakenError(new_email)
+    return cursor.rowcount > 0
+
+def update_user_password_hash(user_id, password_hash):
+    conn = _connect()
+    with conn:
+        cursor = conn.execute('UPDATE users SET password_hash = ? WHERE id = ?', (password_hash, user_id))
+    return cursor.rowcount > 0
+
+# Reminder management functions
+def get_next_reminder_id():
+    row = _connect().execute('SELECT COALESCE(MAX(id), 0) + 1 FROM reminders').fetchone()
+    return row[0]
+
+def add_reminder(user_id, title, description, reminder_time, recipient_email=None):
+    conn = _connect()
+    created_at = format_time(datetime.now())
+    with conn:
+        cursor = conn.execute(
+            'INSERT INTO reminders (user_id, title, description, reminder_time, created_at, is_completed, recipient_email) '
+            'VALUES (?, ?, ?, ?, ?, 0, ?)',
+            (user_id, title, description or '', format_time(reminder_time), created_at, recipient_email or '')
+        )
+    return cursor.lastrowid
+
+def upsert_reminders(user_id, inserts, updates):
+    """Add and update many of a user's reminders in one transaction; returns the new ids"""
+    conn = _connect()
+    created_at = format_time(datetime.now())
+    new_ids = []
+    with conn:
+        for insert in inserts:
+            cursor = conn.execute(
+                'INSERT INTO reminders (user_id, title, description, reminder_time, created_at, is_completed, recipient_email) '
+                'VALUES (?, ?, ?, ?, ?, 0, ?)',
+                (
+                    user_id,
+                    insert['title'],
+                    insert.get('description') or '',
+                    format_time(insert['reminder_time']),
+                    created_at,
+                    insert.get('recipient_email') or ''
+                )
+            )
+            new_ids.append(cursor.lastrowid)
+        conn.executemany(
+            'UPDATE reminders SET title = ?, description = ?, reminder_time = ?, recipient_email = ? WHERE id = ?',
+            [(
+                update['title'],
+                update.get('description') or '',
+                format_time(update['reminder_time']),
+                update.get('recipient_email') or '',
+                update['id']
+            ) for update in updates]
+        )
+    return new_ids
+
+def get_reminders_by_user_id(user_id):
+    rows = _connect().execute('SELECT * FROM reminders WHERE user_id = ? ORDER BY id', (user_id,))
+    return [_reminder_record(row) for row in rows]
+
+def iter_reminders_by_user_id(user_id):
+    """Yield a user's reminders one at a time instead of building a list"""
+    _connect()
+    # A separate connection, so the open cursor can't be disturbed by writes on this thread
+    conn = sqlite3.connect(SQLITE_PATH, timeout=30)
+    conn.row_factory = sqlite3.Row
+    try:
+        for row in conn.execute('SELECT * FROM reminders WHERE user_id = ? ORDER BY id', (user_id,)):
+            yield _reminder_record(row)
+    finally:
+        conn.close()
+
+def get_reminders_page(user_id, page=1, per_page=20, sort='created_at', order='asc', status=None, start=None, end=None):
+    """One page of a user's reminders and the number of reminders matching the filters"""
+    if sort not in ('reminder_time', 'created_at'):
+        raise ValueError(f'Cannot sort reminders by {sort!r}')
+    where = ['user_id = ?']
+    params = [user_id]
+    if status is not None:
+        where.append('is_completed = ?')
+        params.append(1 if status == 'completed' else 0)
+    if start:
+        where.append('reminder_time >= ?')
+        params.append(start)
+    if end:
+        where.append('reminder_time <= ?')
+        params.append(end)
+    where = ' AND '.join(where)
+    direction = 'DESC' if order == 'desc' else 'ASC'
+
+    conn = _connect()
+    total = conn.execute(f'SELECT COUNT(*) FROM reminders WHERE {where}', params).fetchone()[0]
+    rows = conn.execute(
+        f'SELECT * FROM reminders WHERE {where} ORDER BY {sort} {direction}, id {direction} LIMIT ? OFFSET ?',
+        params + [per_page, (max(page, 1) - 1) * per_page]
+    )
+    return [_reminder_record(row) for row in rows], total
+
+def get_reminder_by_id(reminder_id):
+    row = _connect().execute('SELECT * FROM reminders WHERE id = ?', (reminder_id,)).fetchone()
+    return _reminder_record(row)
+
+def update_reminder(reminder_id, title, description, reminder_time, recipient_email=None):
+    conn = _connect()
+    with conn:
+        cursor = conn.execute(
+            'UPDATE reminders SET title = ?, description = ?, reminder_time = ?, recipient_email = ? WHERE id = ?',
+            (title, description or '', format_time(reminder_time), recipient_email or '', reminder_id)
+        )
+    return cursor.rowcount > 0
+
+def update_reminders(updates):
+    """Apply several update_reminder calls in one transaction; returns how many were found"""
+    conn = _connect()
+    with conn:
+        cursor = conn.executemany(
+            'UPDATE reminders SET title = ?, description = ?, reminder_time = ?, recipient_email = ? WHERE id = ?',
+            [(
+                update['title'],
+                update.get('description') or '',
+                format_time(update['reminder_time']),
+                update.get('recipient_email') or '',
+                update['id']
+            ) for update in updates]
+        )
+    return cursor.rowcount
+
+def delete_reminder(reminder_id):
+    conn = _connect()
+    with conn:
+        cursor = conn.execute('DELETE FROM reminders WHERE id = ?', (reminder_id,))
+    return cursor.rowcount > 0
+
+def delete_reminders(reminder_ids):
+    """Delete several reminders in one transaction; returns how many were found"""
+    conn = _connect()
+    with conn:
+        cursor = conn.executemany('DELETE FROM reminders WHERE id = ?', [(reminder_id,) for reminder_id in reminder_ids])
+    return cursor.rowcount
+
+def iter_all_reminders():
+    """Yield every reminder without building a list"""
+    _connect()
+    # A separate connection, so the open cursor can't be disturbed by writes on this thread
+    conn = sqlite3.connect(SQLITE_PATH, timeout=30)
+    conn.row_factory = sqlite3.Row
+    try:
+        for row in conn.execute('SELECT * FROM reminders ORDER BY id'):
+            yield _reminder_record(row)
+    finally:
+        conn.close()
+
+def get_all_reminders():
+    rows = _connect().execute('SELECT * FROM reminders ORDER BY id')
+    return [_reminder_record(row) for row in rows]
+
+def get_due_reminders(now=None):
+    """Pending reminders whose reminder_time has passed, earliest first"""
+    now = now or datetime.now()
+    rows = _connect().execute(
+        'SELECT * FROM reminders WHERE is_completed = 0 AND reminder_time <= ? ORDER BY reminder_time',
+        (format_time(now),)
+    )
+    return [_reminder_record(row) for row in rows]
+
+def get_next_due_time(after=None):
+    """When the next pending reminder is due (after ``after`` if given), or None"""
+    if after is None:
+        row = _connect().execute('SELECT MIN(reminder_time) FROM reminders WHERE is_completed = 0').fetchone()
+    else:
+        row = _connect().execute(
+            'SELECT MIN(reminder_time) FROM reminders WHERE is_completed = 0 AND reminder_time > ?',
+            (format_time(after),)
+        ).fetchone()
+    return parse_time(row[0])
+
+def mark_reminder_completed(reminder_id):
+    conn = _connect()
+    with conn:
+        cursor = conn.execute('UPDATE reminders SET is_completed = 1 WHERE id = ?', (reminder_id,))
+    return cursor.rowcount > 0
+
+def mark_reminders_completed(reminder_ids):
+    """Mark several reminders completed in one transaction; returns how many were found"""
+    conn = _connect()
+    with conn:
+        cursor = conn.executemany(
+            'UPDATE reminders SET is_completed = 1 WHERE id = ?',
+            [(reminder_id,) for reminder_id in reminder_ids]
+        )
+    return cursor.rowcount
@@ -0,0 +1,73 @@
+"""
+Storage backend selection.
+
+The rest of the app imports its data functions from here rather than from a
+specific backend. Set STORAGE_BACKEND=sqlite to use the indexed SQLite store
+(sqlite_handler.py); the default is the CSV files (csv_handler.py).
+"""
+import importlib
+import os
+
+import metrics
+import user_cache
+from records import EmailTakenError
+
+BACKENDS = {
+    'csv': 'csv_handler',
+    'sqlite': 'sqlite_handler',
+}
+
+STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'csv').lower()
+if STORAGE_BACKEND not in BACKENDS:
+    raise ValueError(f"Unknown STORAGE_BACKEND '{STORAGE_BACKEND}', expected one of: {', '.join(BACKENDS)}")
+
+backend = importlib.import_module(BACKENDS[STORAGE_BACKEND])
+
+def _timed(name):
+    """The backend's function, timed under its name (see metrics.py)"""
+    return metrics.timed(metrics.STORAGE_SECONDS, name)(getattr(backend, name))
+
+init_storage = _timed('init_storage')
+
+# User management functions
+get_user_by_email = _timed('get_user_by_email')
+get_user_by_id = _timed('get_user_by_id')
+get_users_by_ids = _timed('get_users_by_ids')
+
+# User writes also drop the user from the login cache (see user_cache.py)
+@metrics.timed(metrics.STORAGE_SECONDS, 'add_user')
+def add_user(username, email, password_hash, app_password=''):
+    user_id = backend.add_user(username, email, password_hash, app_password)
+    user_cache.cache.invalidate(user_id)
+    return user_id
+
+@metrics.timed(metrics.STORAGE_SECONDS, 'update_user_email_credentials')
+def update_user_email_credentials(user_id, new_email, new_app_password):
+    updated = backend.update_user_email_credentials(user_id, new_email, new_app_password)
+    user_cache.cache.invalidate(user_id)
+    return updated
+
+@metrics.timed(metrics.STORAGE_SECONDS, 'update_user_password_hash')
+def update_user_password_hash(user_id, password_hash):
+    updated = backend.update_user_password_hash(user_id, password_hash)
+    user_cache.cache.invalidate(user_id)
+    return updated
+
+# Reminder management functions
+add_reminder = _timed('add_reminder')
+upsert_reminders = _timed('upsert_reminders')
+get_reminders_by_user_id = _timed('get_reminders_by_user_id')
+# Generators aren't timed: a wrapper would only see them being created
+iter_reminders_by_user_id = backend.iter_reminders_by_user_id
+get_reminders_page = _timed('get_reminders_page')
+get_reminder_by_id = _timed('get_reminder_by_id')
+update_reminder = _timed('update_reminder')
+update_reminders = _timed('update_reminders')
+delete_reminder = _timed('delete_reminder')
+delete_reminders = _timed('delete_reminders')
+get_all_reminders = _timed('get_all_reminders')
+iter_all_reminders = backend.iter_all_reminders
+get_due_reminders = _timed('get_due_reminders')
+get_next_due_time = _timed('get_next_due_time')
+mark_reminder_completed = _timed('mark_reminder_completed')
+mark_reminders_completed = _timed('mark_reminders_completed')
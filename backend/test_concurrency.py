@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Stress test: several processes hammer the CSV store at once
+"""
+import os
+import sys
+import csv
+import multiprocessing
+from datetime import datetime
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import csv_handler
+import file_lock
+
+WORKERS = int(os.environ.get('STRESS_WORKERS', 6))
+ROUNDS = int(os.environ.get('STRESS_ROUNDS', 40))
+
+def worker(users_csv, reminders_csv, journaled, worker_id, queue):
+    csv_handler.USERS_CSV = users_csv
+    csv_handler.REMINDERS_CSV = reminders_csv
+    csv_handler.REMINDERS_JOURNAL = journaled
+    csv_handler.init_csv_files()
+
+    user_id = csv_handler.add_user(f'worker{worker_id}', f'worker{worker_id}@example.com', 'hash')
+    when = datetime(2030, 1, 1, 9, 0, 0)
+    ids = []
+    for i in range(ROUNDS):
+        reminder_id = csv_handler.add_reminder(user_id, f'W{worker_id} R{i}', '', when)
+        ids.append(reminder_id)
+        if i % 3 == 1:
+            csv_handler.update_reminder(ids[i - 1], f'W{worker_id} R{i - 1} edited', 'edited', when)
+        if i % 5 == 4:
+            csv_handler.mark_reminder_completed(ids[i - 2])
+    queue.put((user_id, ids))
+
+def run_workers(tmp_dir, journaled):
+    # Files that don't exist yet, so the workers also race to create them
+    tmp_dir = os.path.join(tmp_dir, 'workers')
+    os.mkdir(tmp_dir)
+    users_csv = os.path.join(tmp_dir, 'users.csv')
+    reminders_csv = os.path.join(tmp_dir, 'reminders.csv')
+
+    context = multiprocessing.get_context('fork')
+    queue = context.Queue()
+    processes = [context.Process(target=worker, args=(users_csv, reminders_csv, journaled, n, queue)) for n in range(WORKERS)]
+    for process in processes:
+        process.start()
+    results = [queue.get(timeout=120) for _ in processes]
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+
+    # Check the files directly, not through any process's cache
+    csv_handler.USERS_CSV = users_csv
+    csv_handler.REMINDERS_CSV = reminders_csv
+    csv_handler.REMINDERS_JOURNAL = journaled
+    csv_handler.compact_reminders()
+
+    with open(users_csv, newline='', encoding='utf-8') as f:
+        users = list(csv.DictReader(f))
+    with open(reminders_csv, newline='', encoding='utf-8') as f:
+        reminders = list(csv.DictReader(f))
+
+    user_ids = [user_id for user_id, _ in results]
+    reminder_ids = [reminder_id for _, ids in results for reminder_id in ids]
+    assert len(set(user_ids)) == WORKERS
+    assert len(set(reminder_ids)) == WORKERS * ROUNDS
+    assert sorted(int(u['id']) for u in users) == sorted(user_ids)
+    assert sorted(int(r['id']) for r in reminders) == sorted(reminder_ids)
+
+    by_id = {int(r['id']): r for r in reminders}
+    for user_id, ids in results:
+        for i, reminder_id in enumerate(ids):
+            row = by_id[reminder_id]
+            assert row['user_id'] == str(user_id)
+            datetime.strptime(row['reminder_time'], '%Y-%m-%d %H:%M:%S')
+            edited = i % 3 == 0 and i + 1 < ROUNDS
+            assert row['description'] == ('edited' if edited else '')
+            completed = i % 5 == 2 and i + 2 < ROUNDS
+            assert row['is_completed'] == str(completed)
+
+def test_concurrent_workers(temp_files):
+    """Concurrent writers never lose rows or hand out the same id"""
+    if file_lock.fcntl is None:
+        print("⚠️ Skipped: no fcntl on this platform")
+        return
+    run_workers(temp_files, journaled=False)
+    print("✅ Concurrent workers keep the CSV consistent")
+
+def test_concurrent_workers_journaled(temp_files):
+    """Same, with reminder writes going through the journal"""
+    if file_lock.fcntl is None:
+        print("⚠️ Skipped: no fcntl on this platform")
+        return
+    run_workers(temp_files, journaled=True)
+    print("✅ Concurrent workers keep the journal consistent")
+
+def test_lock_reentrancy(tmp_path):
+    """Nested locks on the same file are no-ops; upgrading is refused"""
+    path = str(tmp_path / 'data.csv')
+    with file_lock.exclusive_lock(path):
+        with file_lock.shared_lock(path):
+            pass
+    with file_lock.shared_lock(path):
+        try:
+            with file_lock.exclusive_lock(path):
+                pass
+        except RuntimeError:
+            pass
+        else:
+            assert False, 'upgrading a shared lock should fail'
+    print("✅ Locks are re-entrant")
+
+def test_atomic_write_keeps_mode(tmp_path):
+    """Replaced files keep their permissions; new ones are 0644, not mkstemp's 0600"""
+    path = str(tmp_path / 'data.csv')
+    with file_lock.atomic_write(path) as f:
+        f.write('a\n')
+    assert os.stat(path).st_mode & 0o777 == 0o644
+    os.chmod(path, 0o640)
+    with file_lock.atomic_write(path) as f:
+        f.write('b\n')
+    assert os.stat(path).st_mode & 0o777 == 0o640
+    print("✅ Atomic writes keep the file mode")
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-q', '-s']))
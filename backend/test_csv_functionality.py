@@ -8,13 +8,15 @@ import sys
 import csv
 from datetime import datetime, timedelta
 
+import pytest
+
 # Add current directory to path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from app import create_app
 from csv_handler import add_user, add_reminder
 
-def test_csv_functionality():
+def test_csv_functionality(temp_files):
     """Test CSV export and import functionality"""
     
     # Create test app
@@ -89,4 +91,4 @@ def test_csv_functionality():
         return True
 
 if __name__ == '__main__':
-    test_csv_functionality()
+    sys.exit(pytest.main([__file__, '-q', '-s']))
@@ -2,21 +2,17 @@
 """
 Test script to verify CSV handler functionality
 """
-import os
+import sys
+import pytest
 from csv_handler import init_csv_files, add_user, get_user_by_email, add_reminder, get_reminders_by_user_id
 from datetime import datetime, timedelta
 
-def test_csv_handler():
+def test_csv_handler(temp_files):
     """Test CSV handler functionality"""
     print("Testing CSV Handler...")
     
-    # Clean up any existing CSV files
-    if os.path.exists('users.csv'):
-        os.remove('users.csv')
-    if os.path.exists('reminders.csv'):
-        os.remove('reminders.csv')
-    
-    # Initialize CSV files
+    # Initialize CSV files (temp_files starts them empty: emails are unique,
+    # so a leftover test user would clash)
     init_csv_files()
     
     # Test user creation
@@ -54,4 +50,4 @@ def test_csv_handler():
     return True
 
 if __name__ == '__main__':
-    test_csv_handler()
+    sys.exit(pytest.main([__file__, '-q', '-s']))
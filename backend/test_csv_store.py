@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the in-memory CSV store stays in sync with the files on disk
+"""
+import os
+import sys
+import csv
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import csv_handler
+import file_lock
+
+def test_lookups_and_write_through(temp_files):
+    """Lookups are served from memory and every change reaches the file"""
+
+    user_id = csv_handler.add_user('alice', 'alice@example.com', 'hash')
+    other_id = csv_handler.add_user('bob', 'bob@example.com', 'hash')
+    assert csv_handler.get_user_by_email('alice@example.com')['id'] == str(user_id)
+    assert csv_handler.get_user_by_id(other_id)['username'] == 'bob'
+
+    when = datetime.now() + timedelta(hours=1)
+    first = csv_handler.add_reminder(user_id, 'First', 'one', when)
+    second = csv_handler.add_reminder(user_id, 'Second', '', when, 'x@example.com')
+    csv_handler.add_reminder(other_id, 'Other', '', when)
+
+    assert [r['title'] for r in csv_handler.get_reminders_by_user_id(user_id)] == ['First', 'Second']
+
+    csv_handler.update_reminder(first, 'First (edited)', 'one', when)
+    csv_handler.mark_reminder_completed(second)
+    csv_handler.delete_reminder(second)
+    csv_handler.update_user_email_credentials(user_id, 'alice@work.example', 'secret')
+
+    assert csv_handler.get_user_by_email('alice@example.com') is None
+    assert csv_handler.get_user_by_email('alice@work.example')['app_password'] == 'secret'
+
+    with open(csv_handler.REMINDERS_CSV, newline='', encoding='utf-8') as f:
+        rows = list(csv.DictReader(f))
+    assert [r['title'] for r in rows] == ['First (edited)', 'Other']
+
+    # Rows come back as decoded, read-only records
+    reminder = csv_handler.get_reminder_by_id(first)
+    assert reminder.id == first and reminder.user_id == user_id and reminder.is_completed is False
+    assert reminder.reminder_time == when.replace(microsecond=0)
+    assert dict(reminder)['reminder_time'] == when.strftime('%Y-%m-%d %H:%M:%S')
+    try:
+        reminder['title'] = 'changed'
+    except TypeError:
+        pass
+    else:
+        assert False, 'records should not support item assignment'
+    print("✅ Lookups and write-through work")
+
+def test_reload_on_external_change(temp_files):
+    """A change made by another process is picked up on the next lookup"""
+    user_id = csv_handler.add_user('carol', 'carol@example.com', 'hash')
+    assert csv_handler.get_user_by_id(user_id) is not None
+
+    with open(csv_handler.USERS_CSV, 'a', newline='', encoding='utf-8') as f:
+        csv.writer(f).writerow([99, 'dave', 'dave@example.com', 'hash', ''])
+
+    assert csv_handler.get_user_by_email('dave@example.com')['id'] == '99'
+    print("✅ External changes are reloaded")
+
+def test_failed_write_is_not_cached(temp_files, monkeypatch):
+    """When writing a batch fails, lookups go back to what is in the file"""
+    user_id = csv_handler.add_user('erin', 'erin@example.com', 'hash')
+    when = datetime(2030, 1, 1, 9, 0, 0)
+    reminder_id = csv_handler.add_reminder(user_id, 'Kept', '', when)
+
+    def disk_full(*args, **kwargs):
+        raise OSError('No space left on device')
+    with monkeypatch.context() as patch:
+        patch.setattr(csv_handler._CsvTable, 'rewrite', disk_full)
+        patch.setattr(csv_handler._CsvTable, '_append', disk_full)
+        for change in (lambda: csv_handler.update_reminder(reminder_id, 'Lost', '', when),
+                       lambda: csv_handler.add_reminder(user_id, 'Also lost', '', when)):
+            try:
+                change()
+            except OSError:
+                pass
+            else:
+                assert False, 'the write should have failed'
+
+    assert [r['title'] for r in csv_handler.get_reminders_by_user_id(user_id)] == ['Kept']
+    print("✅ Failed writes don't linger in the cache")
+
+def test_malformed_rows_are_skipped(temp_files):
+    """A row that can't be decoded is left out; the rest still load"""
+    user_id = csv_handler.add_user('fay', 'fay@example.com', 'hash')
+    when = datetime.now() + timedelta(hours=1)
+    reminder_id = csv_handler.add_reminder(user_id, 'Kept', '', when)
+    with open(csv_handler.REMINDERS_CSV, 'a', newline='', encoding='utf-8') as f:
+        f.write('2,\n')
+        f.write('x,1,Bad id,,,,False,\n')
+
+    assert [r.id for r in csv_handler.get_reminders_by_user_id(user_id)] == [reminder_id]
+    assert csv_handler.get_reminder_by_id(2) is None
+    print("✅ Malformed rows are skipped")
+
+def test_legacy_duplicate_emails(temp_files):
+    """In a file with a repeated email the first row owns it, then the next one"""
+    user_id = csv_handler.add_user('erin', 'erin@example.com', 'hash')
+    with open(csv_handler.USERS_CSV, 'a', newline='', encoding='utf-8') as f:
+        csv.writer(f).writerow([99, 'erin2', 'Erin@example.com', 'hash', ''])
+
+    assert csv_handler.get_user_by_email('erin@example.com').id == user_id
+    csv_handler.update_user_email_credentials(user_id, 'erin.new@example.com', 'pw')
+    assert csv_handler.get_user_by_email('erin@example.com').id == 99
+    print("✅ Duplicate emails in old files stay findable")
+
+def test_id_sequence(temp_files):
+    """Ids come from the sidecar counter, which heals itself when lost"""
+    when = datetime.now() + timedelta(hours=1)
+    ids = [csv_handler.add_reminder(1, f'Reminder {i}', '', when) for i in range(3)]
+    assert ids == [1, 2, 3]
+
+    # Deleting the newest row does not hand its id out again
+    csv_handler.delete_reminder(3)
+    assert csv_handler.add_reminder(1, 'Next', '', when) == 4
+
+    seq_path = csv_handler.REMINDERS_CSV + csv_handler.SEQUENCE_SUFFIX
+    with open(seq_path, 'w') as f:
+        f.write('garbage')
+    assert csv_handler.get_next_reminder_id() == 5
+    assert csv_handler.add_reminder(1, 'Healed', '', when) == 5
+
+    os.remove(seq_path)
+    assert csv_handler.add_reminder(1, 'Healed again', '', when) == 6
+
+    # A counter that fell behind the data skips past existing ids
+    with open(seq_path, 'w') as f:
+        f.write('3')
+    assert csv_handler.add_reminder(1, 'Behind', '', when) == 7
+    print("✅ Id sequence works")
+
+def test_bulk_operations(temp_files):
+    """Bulk update/complete/delete each rewrite the file once"""
+    when = datetime.now() + timedelta(hours=1)
+    ids = [csv_handler.add_reminder(1, f'Reminder {i}', '', when) for i in range(6)]
+
+    rewrites = []
+    original = csv_handler._reminders.rewrite
+    csv_handler._reminders.rewrite = lambda: (rewrites.append(1), original())
+    try:
+        assert csv_handler.mark_reminders_completed(ids[:3] + [999]) == 3
+        assert csv_handler.update_reminders([
+            {'id': ids[3], 'title': 'Updated 3', 'reminder_time': when},
+            {'id': ids[4], 'title': 'Updated 4', 'description': 'd', 'reminder_time': when, 'recipient_email': 'r@example.com'},
+        ]) == 2
+        assert csv_handler.delete_reminders([ids[0], ids[5], 999]) == 2
+    finally:
+        del csv_handler._reminders.rewrite
+    assert len(rewrites) == 3
+
+    with open(csv_handler.REMINDERS_CSV, newline='', encoding='utf-8') as f:
+        rows = list(csv.DictReader(f))
+    assert [(r['title'], r['is_completed']) for r in rows] == [
+        ('Reminder 1', 'True'), ('Reminder 2', 'True'), ('Updated 3', 'False'), ('Updated 4', 'False')
+    ]
+    assert rows[3]['recipient_email'] == 'r@example.com'
+    assert not [name for name in os.listdir(os.path.dirname(csv_handler.REMINDERS_CSV)) if name.startswith('reminders.csv.')
+                and not name.endswith((csv_handler.SEQUENCE_SUFFIX, file_lock.LOCK_SUFFIX))]
+    print("✅ Bulk operations work")
+
+def test_due_queue(temp_files):
+    """Only pending, due reminders come off the queue, and it follows edits"""
+    now = datetime(2030, 1, 1, 12, 0, 0)
+    late = csv_handler.add_reminder(1, 'Late', '', now - timedelta(hours=2))
+    early = csv_handler.add_reminder(1, 'Early', '', now - timedelta(hours=3))
+    done = csv_handler.add_reminder(1, 'Done', '', now - timedelta(hours=1))
+    future = csv_handler.add_reminder(1, 'Future', '', now + timedelta(hours=1))
+    gone = csv_handler.add_reminder(1, 'Gone', '', now - timedelta(minutes=5))
+    csv_handler.mark_reminder_completed(done)
+    csv_handler.delete_reminder(gone)
+
+    assert [r['title'] for r in csv_handler.get_due_reminders(now)] == ['Early', 'Late']
+    # Still pending, so still due on the next sweep
+    assert [r['title'] for r in csv_handler.get_due_reminders(now)] == ['Early', 'Late']
+
+    csv_handler.update_reminder(future, 'Future', '', now - timedelta(hours=4))
+    csv_handler.update_reminder(early, 'Early', '', now + timedelta(days=1))
+    csv_handler.mark_reminder_completed(late)
+    assert [r['title'] for r in csv_handler.get_due_reminders(now)] == ['Future']
+    assert [r['title'] for r in csv_handler.get_due_reminders(now + timedelta(days=2))] == ['Future', 'Early']
+    print("✅ Due queue works")
+
+def test_journaled_mode(temp_files):
+    """Mutations go to the journal, reads merge it, compaction folds it back"""
+    csv_handler.REMINDERS_JOURNAL = True
+    try:
+        when = datetime.now() + timedelta(hours=1)
+        ids = [csv_handler.add_reminder(1, f'Reminder {i}', '', when) for i in range(5)]
+        csv_handler.compact_reminders()
+        base_size = os.path.getsize(csv_handler.REMINDERS_CSV)
+
+        csv_handler.update_reminder(ids[0], 'Edited, with "quotes"', 'multi\nline', when)
+        csv_handler.mark_reminder_completed(ids[1])
+        csv_handler.delete_reminder(ids[2])
+        assert os.path.getsize(csv_handler.REMINDERS_CSV) == base_size
+        assert os.path.exists(csv_handler.REMINDERS_CSV + '.journal')
+
+        # A second process sees the merged view
+        other = csv_handler._CsvTable(csv_handler.REMINDER_FIELDS, csv_handler.Reminder, grouped=('user_id',))
+        other.load(csv_handler.REMINDERS_CSV, journaled=True)
+        assert other.get(ids[0])['description'] == 'multi\nline'
+        assert other.get(ids[1])['is_completed'] == 'True'
+        assert other.get(ids[2]) is None
+        assert [r['id'] for r in other.group('user_id', '1')] == [str(i) for i in (ids[0], ids[1], ids[3], ids[4])]
+
+        csv_handler.compact_reminders()
+        assert not os.path.exists(csv_handler.REMINDERS_CSV + '.journal')
+        with open(csv_handler.REMINDERS_CSV, newline='', encoding='utf-8') as f:
+            rows = list(csv.DictReader(f))
+        assert [r['title'] for r in rows] == ['Edited, with "quotes"', 'Reminder 1', 'Reminder 3', 'Reminder 4']
+    finally:
+        csv_handler.REMINDERS_JOURNAL = False
+    print("✅ Journaled mode works")
+
+def test_sharded_reminders(temp_files):
+    """Existing reminders move into shards, each user's reminders stay in one file,
+    and going back to one file restores reminders.csv"""
+    tmp_dir = temp_files
+    when = datetime(2030, 1, 1, 9, 0, 0)
+    legacy = [csv_handler.add_reminder(user_id, f'Legacy {user_id}', '', when) for user_id in range(1, 9)]
+    csv_handler.delete_reminder(legacy[-1])
+
+    csv_handler.REMINDER_SHARDS = 4
+    try:
+        csv_handler.init_csv_files()
+        assert sorted(name for name in os.listdir(tmp_dir) if name.endswith('.csv')) == [
+            'reminders.0.csv', 'reminders.1.csv', 'reminders.2.csv', 'reminders.3.csv', 'users.csv'
+        ]
+        with open(csv_handler.REMINDERS_CSV + csv_handler.MANIFEST_SUFFIX, encoding='utf-8') as f:
+            manifest = json.load(f)
+        assert (manifest['shards'], manifest['first_id']) == (4, 9)
+
+        # Legacy ids are still found; new ids never reuse the deleted one
+        assert csv_handler.get_reminder_by_id(legacy[2])['title'] == 'Legacy 3'
+        new = {user_id: csv_handler.add_reminder(user_id, f'New {user_id}', '', when - timedelta(days=user_id))
+               for user_id in range(1, 9)}
+        assert len(set(new.values())) == 8 and min(new.values()) >= 9
+        assert csv_handler.get_next_reminder_id(1) not in new.values()
+
+        # A user's reminders live in exactly one shard
+        for user_id in range(1, 8):
+            path = csv_handler._user_shard(user_id)[0]
+            with open(path, newline='', encoding='utf-8') as f:
+                titles = [row['title'] for row in csv.DictReader(f) if row['user_id'] == str(user_id)]
+            assert titles == [f'Legacy {user_id}', f'New {user_id}']
+            assert [r['title'] for r in csv_handler.get_reminders_by_user_id(user_id)] == titles
+
+        assert csv_handler.update_reminder(new[3], 'Edited', '', when)
+        assert csv_handler.mark_reminders_completed([new[1], new[2], legacy[0]]) == 3
+        assert csv_handler.delete_reminders([new[4], legacy[1], 999]) == 2
+        assert len(list(csv_handler.iter_all_reminders())) == 13
+        due = csv_handler.get_due_reminders(when)
+        assert [r['reminder_time'] for r in due] == sorted(r['reminder_time'] for r in due)
+        assert len(due) == 10
+        assert csv_handler.get_next_due_time(when) is None
+    finally:
+        csv_handler.REMINDER_SHARDS = 1
+
+    csv_handler.init_csv_files()
+    assert not os.path.exists(csv_handler.REMINDERS_CSV + csv_handler.MANIFEST_SUFFIX)
+    assert not os.path.exists(os.path.join(tmp_dir, 'reminders.0.csv'))
+    assert len(csv_handler.get_all_reminders()) == 13
+    assert csv_handler.get_reminder_by_id(new[3])['title'] == 'Edited'
+    assert csv_handler.add_reminder(1, 'After', '', when) == max(new.values()) + 1
+    print("✅ Sharded reminders work")
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-q', '-s']))
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the due-reminder sweep end to end against a local SMTP sink
+"""
+import os
+import sys
+import email
+import email.policy
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from flask import Flask
+
+import csv_handler
+import email_service
+import smtp_pool
+from dispatcher import Dispatcher, TokenBucket
+from smtp_sink import SMTPSink
+
+def test_sweep_sends_and_completes(temp_files):
+    """Due reminders are sent once, grouped by sender, and marked completed"""
+    alice = csv_handler.add_user('alice', 'alice@example.com', 'hash', 'alice-pw')
+    bob = csv_handler.add_user('bob', 'bob@example.com', 'hash', 'bob-pw')
+    nocreds = csv_handler.add_user('carol', 'carol@example.com', 'hash')
+
+    past = datetime.now() - timedelta(minutes=5)
+    due = [csv_handler.add_reminder(alice, f'Alice {i}', '', past) for i in range(3)]
+    due.append(csv_handler.add_reminder(bob, 'Bob', 'desc', past, 'friend@example.com'))
+    skipped = csv_handler.add_reminder(nocreds, 'No credentials', '', past)
+    later = csv_handler.add_reminder(alice, 'Later', '', datetime.now() + timedelta(hours=1))
+
+    with SMTPSink() as sink:
+        email_service.smtp_pool.pool = smtp_pool.SMTPConnectionPool(host=sink.host, port=sink.port, starttls=False)
+        email_service.dispatcher = Dispatcher(workers=4, rate=1000, burst=1000)
+        lookups = []
+        original = email_service.get_users_by_ids
+        email_service.get_users_by_ids = lambda ids: (lookups.append(set(ids)), original(ids))[1]
+        try:
+            email_service.check_and_send_reminders(Flask(__name__))
+            email_service.check_and_send_reminders(Flask(__name__))
+        finally:
+            email_service.smtp_pool.pool.close_all()
+            email_service.get_users_by_ids = original
+        assert lookups[0] == {str(alice), str(bob), str(nocreds)}
+
+        assert len(sink.messages) == 4
+        assert sorted(m['from'] for m in sink.messages) == ['alice@example.com'] * 3 + ['bob@example.com']
+        assert ['friend@example.com'] in [m['to'] for m in sink.messages]
+        # One session per sender account
+        assert sink.stats['logins'] == 2
+
+    for reminder_id in due:
+        assert csv_handler.get_reminder_by_id(reminder_id)['is_completed'] == 'True'
+    assert csv_handler.get_reminder_by_id(skipped)['is_completed'] == 'False'
+    assert csv_handler.get_reminder_by_id(later)['is_completed'] == 'False'
+    print("✅ Sweep sends due reminders and marks them completed")
+
+def test_digest_coalesces_per_recipient(temp_files):
+    """With EMAIL_DIGEST on, a sender's due reminders for one recipient go out as one email"""
+    alice = csv_handler.add_user('alice', 'alice@example.com', 'hash', 'alice-pw')
+    past = datetime.now() - timedelta(minutes=5)
+    own = [csv_handler.add_reminder(alice, f'Alice {i}', '', past) for i in range(3)]
+    other = csv_handler.add_reminder(alice, 'For a friend', 'ünïcode', past, 'friend@example.com')
+
+    original = email_service.EMAIL_DIGEST
+    email_service.EMAIL_DIGEST = True
+    with SMTPSink() as sink:
+        email_service.smtp_pool.pool = smtp_pool.SMTPConnectionPool(host=sink.host, port=sink.port, starttls=False)
+        email_service.dispatcher = Dispatcher(workers=4, rate=1000, burst=1000)
+        try:
+            email_service.check_and_send_reminders(Flask(__name__))
+        finally:
+            email_service.smtp_pool.pool.close_all()
+            email_service.EMAIL_DIGEST = original
+
+        messages = {tuple(m['to']): email.message_from_bytes(m['data'], policy=email.policy.default)
+                    for m in sink.messages}
+    assert len(sink.messages) == 2
+    digest = messages[('alice@example.com',)]
+    assert digest['Subject'] == 'Reminders: 3 due'
+    assert not digest.is_multipart()
+    assert all(f'Alice {i}' in digest.get_content() for i in range(3))
+    single = messages[('friend@example.com',)]
+    assert single['Subject'] == 'Reminder: For a friend'
+    assert 'ünïcode' in single.get_content()
+
+    for reminder_id in own + [other]:
+        assert csv_handler.get_reminder_by_id(reminder_id).is_completed
+    print("✅ Digest mode sends one email per recipient")
+
+def test_token_bucket_paces_sends():
+    """After the burst, a sender is held to the configured rate"""
+    bucket = TokenBucket(rate=50, capacity=2)
+    start = time.monotonic()
+    for _ in range(7):
+        bucket.acquire()
+    elapsed = time.monotonic() - start
+    # 2 from the burst, the other 5 at 50/s
+    assert elapsed >= 0.09, elapsed
+    print("✅ Token bucket limits the send rate")
+
+def test_dispatch_stops_at_deadline():
+    """No job is started, or waited for, past the deadline"""
+    dispatcher = Dispatcher(workers=2, rate=1, burst=1)
+    started = time.monotonic()
+    results = dispatcher.dispatch([1, 2, 3], lambda job: 'alice@example.com', lambda job: True,
+                                  deadline=started + 0.2)
+    # The second token is a second away, so the rest are given up at once
+    assert time.monotonic() - started < 0.2
+    assert results == [(1, True), (2, None), (3, None)]
+    print("✅ Dispatch keeps to its deadline")
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-q', '-s']))
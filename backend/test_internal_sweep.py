@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Test script for the token-protected, time-bounded /internal/sweep endpoint
+"""
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import app as app_module
+import csv_handler
+import email_service
+import file_lock
+import internal
+from dispatcher import Dispatcher
+
+@pytest.fixture
+def client(temp_files):
+    internal.SWEEP_TOKEN = 'secret'
+    email_service.dispatcher = Dispatcher(workers=4, rate=1000, burst=1000)
+    app = app_module.create_app()
+    app.config['TESTING'] = True
+    return app.test_client()
+
+def test_requires_token(client):
+    """Disabled without a token; a wrong or missing token is refused"""
+    assert client.get('/internal/sweep', headers={'Authorization': 'Bearer wrong'}).status_code == 401
+    assert client.get('/internal/sweep').status_code == 401
+    response = client.get('/internal/sweep', headers={'Authorization': 'Bearer secret'})
+    assert response.status_code == 200
+    assert response.get_json()['done'] is True
+    internal.SWEEP_TOKEN = None
+    assert client.get('/internal/sweep', headers={'Authorization': 'Bearer secret'}).status_code == 404
+    print("✅ Sweep endpoint is protected")
+
+def test_budget_and_cursor(client):
+    """A slow backlog drains over several calls, each within its budget"""
+    user_id = csv_handler.add_user('alice', 'alice@example.com', 'hash', 'alice-pw')
+    past = datetime.now() - timedelta(minutes=10)
+    ids = [csv_handler.add_reminder(user_id, f'R{i}', '', past + timedelta(seconds=i)) for i in range(6)]
+
+    sent = []
+    original = email_service.send_digest_email
+    def slow_send(receiver_email, reminders, sender_email, app_password):
+        time.sleep(0.05)
+        sent.extend(reminder.id for reminder in reminders)
+        return True
+    email_service.send_digest_email = slow_send
+    headers = {'Authorization': 'Bearer secret'}
+    try:
+        # Sends take 0.05 s, so only the first few of a chunk fit in the budget
+        first = client.get('/internal/sweep?chunk=4&budget=0.12', headers=headers).get_json()
+        assert 1 <= first['sent'] < 4 and first['scanned'] == first['sent'] and first['chunks'] == 1
+        assert first['remaining'] == 6 - first['sent'] and not first['done']
+        assert first['cursor'] and first['elapsed'] < 0.12 + 0.05 + 0.05, first['elapsed']
+
+        # Without a cursor the saved checkpoint is used
+        second = client.get('/internal/sweep?chunk=4&budget=0.12', headers=headers).get_json()
+        assert second['sent'] >= 1 and second['remaining'] == 6 - first['sent'] - second['sent']
+
+        assert client.get('/internal/sweep?cursor=nonsense', headers=headers).status_code == 400
+        last = client.get('/internal/sweep?chunk=2', headers=headers).get_json()
+        assert last['sent'] == second['remaining'] and last['done'] and last['cursor'] is None
+        assert not os.path.exists(internal.SWEEP_CHECKPOINT)
+    finally:
+        email_service.send_digest_email = original
+
+    assert sent == ids
+    assert all(csv_handler.get_reminder_by_id(r).is_completed for r in ids)
+    print("✅ Sweep endpoint keeps to its budget and resumes from the cursor")
+
+def test_non_finite_arguments(client, monkeypatch):
+    """'inf' and 'nan' fall back to the configured budget and chunk size"""
+    calls = []
+    def fake_sweep(app, budget=None, chunk_size=None, cursor=None):
+        calls.append((budget, chunk_size))
+        return {'remaining': 0, 'cursor': None}
+    monkeypatch.setattr(internal, 'check_and_send_reminders', fake_sweep)
+    headers = {'Authorization': 'Bearer secret'}
+    for query in ('chunk=inf', 'chunk=nan', 'budget=nan', 'budget=inf&chunk=-inf'):
+        assert client.get(f'/internal/sweep?{query}', headers=headers).status_code == 200, query
+    assert calls == [(internal.SWEEP_TIME_BUDGET, internal.SWEEP_CHUNK_SIZE)] * 4
+    print("✅ Non-finite sweep arguments are ignored")
+
+def test_overlapping_sweeps_are_refused(client):
+    """A call made while another sweep holds the lock gets 409"""
+    holding, release = threading.Event(), threading.Event()
+    def hold():
+        with file_lock.exclusive_lock(internal.SWEEP_LOCK):
+            holding.set()
+            release.wait(5)
+    holder = threading.Thread(target=hold)
+    holder.start()
+    headers = {'Authorization': 'Bearer secret'}
+    try:
+        holding.wait(5)
+        assert client.get('/internal/sweep', headers=headers).status_code == 409
+    finally:
+        release.set()
+        holder.join()
+    assert client.get('/internal/sweep', headers=headers).status_code == 200
+    print("✅ Overlapping sweeps are refused")
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-q', '-s']))
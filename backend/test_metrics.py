@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Test script for the timing histograms and the /metrics endpoint
+"""
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from flask import Flask
+
+import app as app_module
+import email_service
+import metrics
+import smtp_pool
+import storage
+from dispatcher import Dispatcher
+from smtp_sink import SMTPSink
+
+def test_histogram_rendering():
+    """Buckets are cumulative and carry the labels"""
+    histogram = metrics.Histogram('test_seconds', 'Test', ('op',), buckets=(0.1, 1))
+    metrics.REGISTRY.remove(histogram)
+    histogram.observe(0.05, 'a')
+    histogram.observe(0.5, 'a')
+    histogram.observe(5, 'a')
+    lines = histogram.render()
+    assert 'test_seconds_bucket{op="a",le="0.1"} 1' in lines
+    assert 'test_seconds_bucket{op="a",le="1"} 2' in lines
+    assert 'test_seconds_bucket{op="a",le="+Inf"} 3' in lines
+    assert 'test_seconds_count{op="a"} 3' in lines
+    assert 'test_seconds_sum{op="a"} 5.55' in lines
+    print("✅ Histograms render in Prometheus format")
+
+def test_disabled_records_nothing(temp_files):
+    """With metrics off nothing is observed and /metrics is not served"""
+    metrics.reset()
+    original, metrics.METRICS_ENABLED = metrics.METRICS_ENABLED, False
+    try:
+        storage.add_user('dave', 'dave@example.com', 'hash')
+        assert 'alertify_storage_seconds_count' not in metrics.render()
+        client = app_module.create_app().test_client()
+        assert client.get('/metrics').status_code == 404
+    finally:
+        metrics.METRICS_ENABLED = original
+    print("✅ Disabled metrics record nothing")
+
+def test_storage_smtp_and_sweep_are_timed(temp_files):
+    """Storage calls, SMTP phases and sweeps show up at /metrics"""
+    metrics.reset()
+    original, metrics.METRICS_ENABLED = metrics.METRICS_ENABLED, True
+    try:
+        user_id = storage.add_user('erin', 'erin@example.com', 'hash', 'erin-pw')
+        storage.add_reminder(user_id, 'Due', '', datetime.now() - timedelta(minutes=1))
+        with SMTPSink() as sink:
+            email_service.smtp_pool.pool = smtp_pool.SMTPConnectionPool(host=sink.host, port=sink.port, starttls=False)
+            email_service.dispatcher = Dispatcher(workers=2, rate=1000, burst=1000)
+            try:
+                email_service.check_and_send_reminders(Flask(__name__))
+            finally:
+                email_service.smtp_pool.pool.close_all()
+
+        response = app_module.create_app().test_client().get('/metrics')
+        assert response.status_code == 200
+        assert response.mimetype == 'text/plain'
+        text = response.get_data(as_text=True)
+        for line in ('alertify_storage_seconds_count{operation="add_user"} 1',
+                     'alertify_storage_seconds_count{operation="add_reminder"} 1',
+                     'alertify_storage_seconds_count{operation="mark_reminders_completed"} 1',
+                     'alertify_smtp_seconds_count{phase="connect"} 1',
+                     'alertify_smtp_seconds_count{phase="login"} 1',
+                     'alertify_smtp_seconds_count{phase="send"} 1',
+                     'alertify_sweep_seconds_count 1',
+                     'alertify_sweep_chunk_seconds_count 1',
+                     'alertify_sweep_reminders_total{result="sent"} 1'):
+            assert line in text, line
+    finally:
+        metrics.METRICS_ENABLED = original
+    print("✅ Storage, SMTP and sweeps are timed")
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-q', '-s']))
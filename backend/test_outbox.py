@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Test script for the durable outbox: queueing from the sweep, idempotency,
+retries with backoff and dead letters
+"""
+import os
+import sys
+import time
+import socket
+from datetime import datetime, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from flask import Flask
+
+import csv_handler
+import email_service
+import outbox
+import smtp_pool
+import sqlite_handler
+from dispatcher import Dispatcher
+from smtp_sink import SMTPSink
+
+@pytest.fixture(autouse=True)
+def fast_dispatcher():
+    email_service.dispatcher = Dispatcher(workers=4, rate=1000, burst=1000)
+
+def sweep_into_outbox():
+    original = email_service.EMAIL_OUTBOX
+    email_service.EMAIL_OUTBOX = True
+    try:
+        email_service.check_and_send_reminders(Flask(__name__))
+    finally:
+        email_service.EMAIL_OUTBOX = original
+
+def test_sweep_queues_once_and_sender_drains(temp_files):
+    """The sweep only queues, once; reminders are completed when the sender sends them"""
+    alice = csv_handler.add_user('alice', 'alice@example.com', 'hash', 'alice-pw')
+    past = datetime.now() - timedelta(minutes=5)
+    due = [csv_handler.add_reminder(alice, f'Alice {i}', '', past) for i in range(3)]
+
+    sweep_into_outbox()
+    assert outbox.counts() == {outbox.PENDING: 3}
+    assert not any(csv_handler.get_reminder_by_id(r).is_completed for r in due)
+
+    # Still pending, so the next sweep sees them again but doesn't queue them twice
+    sweep_into_outbox()
+    assert outbox.counts() == {outbox.PENDING: 3}
+    assert not any(csv_handler.get_reminder_by_id(r).is_completed for r in due)
+
+    with SMTPSink() as sink:
+        email_service.smtp_pool.pool = smtp_pool.SMTPConnectionPool(host=sink.host, port=sink.port, starttls=False)
+        try:
+            assert email_service.drain_outbox() == 3
+            assert email_service.drain_outbox() == 0
+        finally:
+            email_service.smtp_pool.pool.close_all()
+        assert len(sink.messages) == 3
+    assert outbox.counts() == {outbox.SENT: 3}
+    assert all(csv_handler.get_reminder_by_id(r).is_completed for r in due)
+    print("✅ Sweep queues each reminder once and the sender drains it")
+
+def test_recreated_reminder_is_queued(temp_files, monkeypatch):
+    """A reminder deleted and re-created for the same time is a new email"""
+    for name in ('get_due_reminders', 'mark_reminders_completed', 'get_users_by_ids'):
+        monkeypatch.setattr(email_service, name, getattr(sqlite_handler, name))
+    carol = sqlite_handler.add_user('carol', 'carol@example.com', 'hash', 'carol-pw')
+    when = datetime(2020, 1, 1, 9, 0, 0)
+    first = sqlite_handler.add_reminder(carol, 'First', '', when)
+    sweep_into_outbox()
+    assert outbox.counts() == {outbox.PENDING: 1}
+
+    sqlite_handler.delete_reminder(first)
+    second = sqlite_handler.add_reminder(carol, 'Second', '', when)
+    assert second != first
+    sweep_into_outbox()
+    assert outbox.counts() == {outbox.PENDING: 2}
+    print("✅ Re-created reminders are queued again")
+
+def test_retry_backoff_and_dead_letters(temp_files):
+    """Failed sends back off exponentially and end up as dead letters"""
+    bob = csv_handler.add_user('bob', 'bob@example.com', 'hash', 'bob-pw')
+    reminder_id = csv_handler.add_reminder(bob, 'Bob', '', datetime.now() - timedelta(minutes=1))
+    sweep_into_outbox()
+
+    # Nothing listens on this port
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    email_service.smtp_pool.pool = smtp_pool.SMTPConnectionPool(host='127.0.0.1', port=port, starttls=False)
+
+    original = outbox.OUTBOX_MAX_ATTEMPTS, outbox.OUTBOX_BACKOFF_BASE
+    outbox.OUTBOX_MAX_ATTEMPTS, outbox.OUTBOX_BACKOFF_BASE = 3, 10
+    try:
+        now = time.time()
+        message = outbox.claim(now=now)[0]
+        assert message['attempts'] == 1
+        assert outbox.claim(now=now) == []  # leased
+        assert outbox.mark_failed(message, 'boom', now=now) == outbox.PENDING
+        delay = outbox.next_attempt_time() - now
+        assert 5 <= delay <= 10, delay
+        assert outbox.backoff(3) >= 20
+
+        # Due again: two more real failures use up the attempts
+        outbox._connect().execute('UPDATE outbox SET next_attempt = 0')
+        outbox._connect().commit()
+        assert email_service.drain_outbox() == 1
+        outbox._connect().execute('UPDATE outbox SET next_attempt = 0')
+        outbox._connect().commit()
+        assert email_service.drain_outbox() == 1
+        dead = outbox.dead_letters()
+        assert len(dead) == 1 and dead[0]['attempts'] == 3 and dead[0]['last_error']
+        assert email_service.drain_outbox() == 0
+        # Never sent, so the reminder is not completed, nor queued again
+        assert not csv_handler.get_reminder_by_id(reminder_id).is_completed
+        sweep_into_outbox()
+        assert outbox.counts() == {outbox.DEAD: 1}
+
+        assert outbox.retry_dead() == 1
+        assert outbox.counts() == {outbox.PENDING: 1}
+    finally:
+        outbox.OUTBOX_MAX_ATTEMPTS, outbox.OUTBOX_BACKOFF_BASE = original
+    print("✅ Failed sends are retried with backoff, then dead-lettered")
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-q', '-s']))
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Test script for password hashing settings, rehash-on-login and pooled verification
+"""
+import os
+import sys
+import hmac
+from concurrent.futures import Future
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import app as app_module
+import passwords
+import storage
+
+def legacy_hash(password, salt='abcdefgh'):
+    """A hash as the old register() stored it (generate_password_hash(method='sha256'))"""
+    return f"sha256${salt}${hmac.new(salt.encode(), password.encode(), 'sha256').hexdigest()}"
+
+def test_hash_and_verify():
+    """Current and legacy hashes verify; only the legacy one needs a rehash"""
+    password_hash = passwords.hash_password('secret')
+    assert passwords.verify_password(password_hash, 'secret')
+    assert not passwords.verify_password(password_hash, 'wrong')
+    assert not passwords.needs_rehash(password_hash)
+
+    old = legacy_hash('secret')
+    assert passwords.verify_password(old, 'secret')
+    assert not passwords.verify_password(old, 'wrong')
+    assert passwords.needs_rehash(old)
+    assert passwords.needs_rehash(passwords.hash_password('secret', method='pbkdf2:sha256:1000'))
+    assert not passwords.verify_password('', 'secret')
+    print("✅ Passwords hash and verify")
+
+def test_rehash_on_login(temp_files):
+    """Logging in with a legacy hash stores a hash with the current settings"""
+    user_id = storage.add_user('fran', 'fran@example.com', legacy_hash('secret'))
+
+    app = app_module.create_app()
+    app.config['TESTING'] = True
+    client = app.test_client()
+    response = client.post('/login', data={'email': 'fran@example.com', 'password': 'secret'})
+    assert response.status_code == 302
+
+    stored = storage.get_user_by_id(user_id)['password_hash']
+    assert not passwords.needs_rehash(stored)
+    assert passwords.verify_password(stored, 'secret')
+
+    # And the new hash logs in too
+    response = app.test_client().post('/login', data={'email': 'fran@example.com', 'password': 'secret'})
+    assert response.status_code == 302
+    assert storage.get_user_by_id(user_id)['password_hash'] == stored
+    print("✅ Legacy hashes are upgraded on login")
+
+def test_pooled_verification():
+    """With workers configured, verification runs in the process pool"""
+    original = passwords.PASSWORD_VERIFY_WORKERS
+    passwords.PASSWORD_VERIFY_WORKERS = 2
+    try:
+        password_hash = passwords.hash_password('secret', method='pbkdf2:sha256:1000')
+        assert passwords.verify_password(password_hash, 'secret')
+        assert not passwords.verify_password(password_hash, 'wrong')
+        assert passwords.verify_password(legacy_hash('secret'), 'secret')
+        assert passwords._pool is not None
+    finally:
+        passwords.shutdown_pool()
+        passwords.PASSWORD_VERIFY_WORKERS = original
+    print("✅ Pooled verification works")
+
+def test_verification_timeout(temp_files):
+    """A pool that doesn't answer in time fails the login with a retry message"""
+    storage.add_user('gus', 'gus@example.com', passwords.hash_password('secret'))
+
+    pending = Future()
+    class StuckPool:
+        def submit(self, *args):
+            return pending
+    originals = passwords.PASSWORD_VERIFY_WORKERS, passwords.PASSWORD_VERIFY_TIMEOUT, passwords._get_pool
+    passwords.PASSWORD_VERIFY_WORKERS, passwords.PASSWORD_VERIFY_TIMEOUT = 1, 0.01
+    passwords._get_pool = StuckPool
+    try:
+        try:
+            passwords.verify_password(passwords.hash_password('x'), 'x')
+            assert False, 'timeout was not raised'
+        except passwords.PasswordCheckTimeout:
+            pass
+        assert pending.cancelled()
+
+        pending = Future()
+        app = app_module.create_app()
+        app.config['TESTING'] = True
+        client = app.test_client()
+        response = client.post('/login', data={'email': 'gus@example.com', 'password': 'secret'})
+        assert response.status_code == 200
+        with client.session_transaction() as session:
+            assert 'try again' in session['_flashes'][-1][1]
+    finally:
+        passwords.PASSWORD_VERIFY_WORKERS, passwords.PASSWORD_VERIFY_TIMEOUT, passwords._get_pool = originals
+    print("✅ Verification timeouts fail the login cleanly")
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-q', '-s']))
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Test script to exercise the reminder routes through the Flask test client
+"""
+import io
+import os
+import gzip
+import sys
+import csv
+from datetime import datetime, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import csv_handler
+from app import create_app
+
+def logged_in_client():
+    """One user, and a test client logged in as that user"""
+    user_id = csv_handler.add_user('tester', 'tester@example.com', 'hash')
+
+    app = create_app()
+    app.config['TESTING'] = True
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+    return client, user_id
+
+def upload(client, rows, fieldnames=('title', 'description', 'reminder_time', 'recipient_email')):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(fieldnames)
+    writer.writerows(rows)
+    return client.post(
+        '/import_reminders',
+        data={'csv_file': (io.BytesIO(buf.getvalue().encode('utf-8')), 'reminders.csv')},
+        headers={'Accept': 'application/json'},
+    )
+
+def test_import_report_and_dedupe(temp_files):
+    """Imports insert new rows, update matches, and report every row"""
+    client, user_id = logged_in_client()
+    csv_handler.add_reminder(user_id, 'Existing', 'old', datetime(2030, 1, 1, 9, 0, 0))
+
+    response = upload(client, [
+        ['Existing', 'new description', '2030-01-01 09:00:00', ''],
+        ['Fresh', '', '2030-01-02 09:00:00', 'friend@example.com'],
+        ['Fresh', 'second copy', '2030-01-02 09:00:00', ''],
+        ['', 'no title', '2030-01-03 09:00:00', ''],
+        ['Bad date', '', 'tomorrow', ''],
+    ])
+    report = response.get_json()
+    assert (report['imported'], report['updated'], report['skipped']) == (1, 2, 2)
+    assert [row['status'] for row in report['rows']] == ['updated', 'imported', 'updated', 'skipped', 'skipped']
+    assert report['rows'][4]['line'] == 6
+
+    reminders = {r['title']: r for r in csv_handler.get_reminders_by_user_id(user_id)}
+    assert sorted(reminders) == ['Existing', 'Fresh']
+    assert reminders['Existing']['description'] == 'new description'
+    assert reminders['Fresh']['description'] == 'second copy'
+    print("✅ Import dedupes and reports per row")
+
+def test_import_unpadded_times(temp_files):
+    """Times without zero padding are read the way strptime reads them"""
+    client, user_id = logged_in_client()
+    report = upload(client, [['Unpadded', '', '2030-1-2 9:00:00', '']]).get_json()
+    assert report['imported'] == 1
+    assert csv_handler.get_reminders_by_user_id(user_id)[0]['reminder_time'] == '2030-01-02 09:00:00'
+    print("✅ Unpadded import times are accepted")
+
+def test_large_import_is_one_write(temp_files):
+    """Thousands of rows are applied with a single append"""
+    client, user_id = logged_in_client()
+    start = datetime(2030, 1, 1)
+    rows = [[f'Reminder {i}', '', (start + timedelta(minutes=i)).strftime('%Y-%m-%d %H:%M:%S'), ''] for i in range(5000)]
+
+    writes = []
+    original = csv_handler._reminders.write_batch
+    csv_handler._reminders.write_batch = lambda *args, **kwargs: (writes.append(1), original(*args, **kwargs))
+    try:
+        report = upload(client, rows).get_json()
+    finally:
+        del csv_handler._reminders.write_batch
+
+    assert report['imported'] == 5000
+    assert len(writes) == 1
+    assert len(csv_handler.get_reminders_by_user_id(user_id)) == 5000
+    print("✅ Large import is a single write")
+
+def test_streaming_export(temp_files):
+    """Exports stream in chunks, plain or gzipped, with the same content"""
+    client, user_id = logged_in_client()
+    when = datetime(2030, 1, 1, 9, 0, 0)
+    for i in range(3000):
+        csv_handler.add_reminder(user_id, f'Reminder {i}', 'x' * 50, when)
+    csv_handler.mark_reminder_completed(1)
+
+    response = client.get('/export_reminders')
+    assert response.is_streamed
+    assert response.headers['Content-Type'].startswith('text/csv')
+    assert 'attachment' in response.headers['Content-Disposition']
+    assert 'Content-Length' not in response.headers
+    chunks = list(response.response)
+    assert len(chunks) > 1
+    plain = b''.join(chunks)
+    rows = list(csv.reader(io.StringIO(plain.decode('utf-8'))))
+    assert rows[0][0] == 'id' and len(rows) == 3001
+    assert rows[1][6] == 'Yes' and rows[2][6] == 'No'
+
+    response = client.get('/export_reminders', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    compressed = b''.join(response.response)
+    assert gzip.decompress(compressed) == plain
+    assert len(compressed) < len(plain)
+    print("✅ Export streams in chunks")
+
+def test_dashboard_pagination(temp_files):
+    """The dashboard and its JSON variant only return the requested page"""
+    client, user_id = logged_in_client()
+    start = datetime(2030, 1, 1, 9, 0, 0)
+    ids = [csv_handler.add_reminder(user_id, f'Reminder {i:02d}', '', start + timedelta(days=i % 10, minutes=i)) for i in range(45)]
+    csv_handler.mark_reminders_completed(ids[:5])
+
+    data = client.get('/api/reminders?per_page=20&page=3').get_json()
+    assert (data['total'], data['pages'], len(data['reminders'])) == (45, 3, 5)
+    assert data['reminders'][0]['title'] == 'Reminder 40'
+
+    data = client.get('/api/reminders?sort=reminder_time&order=desc&per_page=3').get_json()
+    times = [r['reminder_time'] for r in data['reminders']]
+    assert times == sorted(times, reverse=True) and times[0].startswith('2030-01-10')
+
+    data = client.get('/api/reminders?status=completed').get_json()
+    assert sorted(r['title'] for r in data['reminders']) == [f'Reminder {i:02d}' for i in range(5)]
+
+    data = client.get('/api/reminders?status=pending&sort=reminder_time&start=2030-01-02&end=2030-01-03').get_json()
+    assert data['total'] == 8
+    assert all('2030-01-02' <= r['reminder_time'] <= '2030-01-03 23:59:59' for r in data['reminders'])
+
+    # The cached views follow edits
+    csv_handler.delete_reminder(ids[44])
+    assert client.get('/api/reminders').get_json()['total'] == 44
+
+    html = client.get('/dashboard?per_page=10&page=2&status=pending').get_data(as_text=True)
+    assert 'Page 2 of 4' in html
+    assert html.count('/edit_reminder/') == 10
+    assert 'status=pending' in html
+
+    # Unknown parameters are not carried into the page links
+    response = client.get('/dashboard?per_page=10&_method=POST&_external=1')
+    assert response.status_code == 200
+    assert '_method' not in response.get_data(as_text=True)
+    print("✅ Dashboard pagination works")
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-q', '-s']))
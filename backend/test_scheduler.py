@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Test script for the wake-at-next-due scheduler
+"""
+import os
+import sys
+import time
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import csv_handler
+import scheduler
+import smtp_pool
+
+def test_next_due_time(temp_files):
+    """The next due time skips completed reminders and ones not after ``after``"""
+    base = datetime(2030, 1, 1, 9, 0, 0)
+    first = csv_handler.add_reminder(1, 'First', '', base)
+    csv_handler.add_reminder(1, 'Second', '', base + timedelta(hours=1))
+    csv_handler.add_reminder(1, 'Third', '', base + timedelta(hours=2))
+
+    assert csv_handler.get_next_due_time() == base
+    assert csv_handler.get_next_due_time(after=base) == base + timedelta(hours=1)
+    csv_handler.mark_reminder_completed(first)
+    assert csv_handler.get_next_due_time() == base + timedelta(hours=1)
+    assert csv_handler.get_next_due_time(after=base + timedelta(hours=2)) is None
+    print("✅ Next due time follows the pending reminders")
+
+def test_wakes_for_due_and_on_ping(temp_files):
+    """The loop sleeps until the next due reminder and wakes early when pinged"""
+    sweeps = []
+    evictions = []
+    original = scheduler.check_and_send_reminders
+    scheduler.check_and_send_reminders = lambda app: sweeps.append(datetime.now())
+    smtp_pool.pool = smtp_pool.SMTPConnectionPool()
+    smtp_pool.pool.evict_idle = lambda: evictions.append(len(sweeps))
+    runner = scheduler.Scheduler(app=None, port=0, max_sleep=30)
+    thread = threading.Thread(target=runner.run)
+    try:
+        thread.start()
+        time.sleep(0.2)
+        # Nothing pending: one sweep at start-up, then a long sleep
+        assert len(sweeps) == 1
+        # Idle SMTP sessions are closed after every sweep
+        assert evictions == [1]
+
+        # A new reminder plus a ping: woken at once, then again when it's due
+        due = datetime.now().replace(microsecond=0) + timedelta(seconds=2)
+        csv_handler.add_reminder(1, 'Soon', '', due)
+        scheduler.notify_scheduler(*runner.address)
+        time.sleep(0.2)
+        assert len(sweeps) == 2
+        # select() can return a few ms early, which adds a sweep just before
+        # the due time; what matters is that one runs once it is due
+        while sweeps[-1] < due and datetime.now() < due + timedelta(seconds=2):
+            time.sleep(0.05)
+        assert due <= sweeps[-1] < due + timedelta(seconds=1)
+    finally:
+        runner.stop()
+        thread.join(5)
+        runner.close()
+        scheduler.check_and_send_reminders = original
+    assert not thread.is_alive()
+    print("✅ Scheduler wakes when reminders are due or changed")
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-q', '-s']))
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Test script to verify pooled SMTP sessions against a local SMTP sink
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from smtp_pool import SMTPConnectionPool
+from smtp_sink import SMTPSink
+
+MESSAGE = 'Subject: Reminder\r\n\r\nHello!\r\n'
+
+def make_pool(sink, **kwargs):
+    return SMTPConnectionPool(host=sink.host, port=sink.port, starttls=False, **kwargs)
+
+def test_sessions_are_reused():
+    """One connection and login per account, however many messages"""
+    with SMTPSink() as sink:
+        pool = make_pool(sink)
+        for i in range(5):
+            pool.sendmail('a@example.com', 'pw', f'to{i}@example.com', MESSAGE)
+        pool.sendmail('b@example.com', 'pw', 'to@example.com', MESSAGE)
+        pool.close_all()
+
+        assert len(sink.messages) == 6
+        assert sink.messages[0]['to'] == ['to0@example.com']
+        assert sink.stats['connections'] == 2
+        assert sink.stats['logins'] == 2
+    print("✅ SMTP sessions are reused per account")
+
+def test_reconnects_after_disconnect():
+    """A session dropped by the server is replaced transparently"""
+    with SMTPSink() as sink:
+        pool = make_pool(sink, healthcheck_after=3600)
+        pool.sendmail('a@example.com', 'pw', 'to@example.com', MESSAGE)
+        sink.drop_connections()
+        time.sleep(0.1)
+        pool.sendmail('a@example.com', 'pw', 'to@example.com', MESSAGE)
+        pool.close_all()
+
+        assert len(sink.messages) == 2
+        assert sink.stats['connections'] == 2
+    print("✅ Dropped sessions are reconnected")
+
+def test_healthcheck_and_idle_eviction():
+    """Idle sessions get a NOOP before reuse and are closed once too old"""
+    with SMTPSink() as sink:
+        pool = make_pool(sink, healthcheck_after=0, idle_timeout=3600)
+        pool.sendmail('a@example.com', 'pw', 'to@example.com', MESSAGE)
+        pool.sendmail('a@example.com', 'pw', 'to@example.com', MESSAGE)
+        assert sink.stats['noops'] == 1
+        assert sink.stats['connections'] == 1
+
+        pool.idle_timeout = 0
+        time.sleep(0.01)
+        assert pool.evict_idle() == 1
+        pool.sendmail('a@example.com', 'pw', 'to@example.com', MESSAGE)
+        assert sink.stats['connections'] == 2
+        pool.close_all()
+    print("✅ Health checks and idle eviction work")
+
+if __name__ == '__main__':
+    test_sessions_are_reused()
+    test_reconnects_after_disconnect()
+    test_healthcheck_and_idle_eviction()
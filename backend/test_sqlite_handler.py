@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the SQLite storage backend and the CSV migration
+"""
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import csv_handler
+import records
+import sqlite_handler
+
+def test_migration_from_csv(temp_files):
+    """Existing CSV data is imported once, keeping ids"""
+    csv_handler.init_csv_files()
+    user_id = csv_handler.add_user('alice', 'alice@example.com', 'hash', 'app-pass')
+    when = datetime(2030, 1, 1, 9, 0, 0)
+    reminder_id = csv_handler.add_reminder(user_id, 'Migrated', 'from csv', when)
+    csv_handler.mark_reminder_completed(reminder_id)
+
+    assert sqlite_handler.get_user_by_email('alice@example.com') == csv_handler.get_user_by_email('alice@example.com')
+    assert sqlite_handler.get_reminder_by_id(reminder_id) == csv_handler.get_reminder_by_id(reminder_id)
+
+    # Later CSV changes are not migrated again
+    csv_handler.add_user('bob', 'bob@example.com', 'hash')
+    sqlite_handler._local.conn = None
+    assert sqlite_handler.get_user_by_email('bob@example.com') is None
+    print("✅ CSV migration works")
+
+def test_migration_from_sharded_csv(temp_files):
+    """Reminders spread over shard files are all imported"""
+    csv_handler.REMINDER_SHARDS = 4
+    csv_handler.init_csv_files()
+    when = datetime(2030, 1, 1, 9, 0, 0)
+    ids = [csv_handler.add_reminder(user_id, f'Shard {user_id}', '', when) for user_id in range(1, 6)]
+    assert not os.path.exists(csv_handler.REMINDERS_CSV)
+
+    assert [sqlite_handler.get_reminder_by_id(reminder_id).title for reminder_id in ids] == \
+        [f'Shard {user_id}' for user_id in range(1, 6)]
+    print("✅ Sharded CSV migration works")
+
+def test_api_matches_csv_handler(temp_files):
+    """The SQLite backend returns the same shapes as the CSV backend"""
+    sqlite_handler.init_storage()
+
+    user_id = sqlite_handler.add_user('carol', 'carol@example.com', 'hash')
+    assert sqlite_handler.get_user_by_id(str(user_id))['username'] == 'carol'
+    assert sqlite_handler.update_user_email_credentials(user_id, 'carol@work.example', 'secret')
+    assert sqlite_handler.get_user_by_email('carol@work.example')['app_password'] == 'secret'
+
+    when = datetime.now() + timedelta(hours=1)
+    first = sqlite_handler.add_reminder(str(user_id), 'First', None, when)
+    second = sqlite_handler.add_reminder(user_id, 'Second', 'two', when, 'x@example.com')
+    assert sqlite_handler.update_reminder(first, 'First (edited)', '', when)
+    assert sqlite_handler.mark_reminder_completed(second)
+
+    reminders = sqlite_handler.get_reminders_by_user_id(user_id)
+    assert [r['title'] for r in reminders] == ['First (edited)', 'Second']
+    assert reminders[0]['user_id'] == str(user_id)
+    assert reminders[0]['reminder_time'] == when.strftime('%Y-%m-%d %H:%M:%S')
+    assert [r['is_completed'] for r in reminders] == ['False', 'True']
+    assert sqlite_handler.get_next_due_time() == when.replace(microsecond=0)
+    assert sqlite_handler.get_next_due_time(after=when) is None
+
+    assert sqlite_handler.delete_reminder(first)
+    assert not sqlite_handler.delete_reminder(first)
+    assert [r['id'] for r in sqlite_handler.get_all_reminders()] == [str(second)]
+    print("✅ SQLite backend matches the CSV API")
+
+def test_pages_match_csv_handler(temp_files):
+    """Paging, sorting and filtering give the same pages on both backends"""
+    csv_handler.init_csv_files()
+    sqlite_handler.init_storage()
+    start = datetime(2030, 1, 1, 9, 0, 0)
+    for i in range(30):
+        when = start + timedelta(hours=(i * 7) % 30)
+        csv_handler.add_reminder(1, f'Reminder {i}', '', when)
+        sqlite_handler.add_reminder(1, f'Reminder {i}', '', when)
+    csv_handler.mark_reminders_completed(range(1, 30, 3))
+    sqlite_handler.mark_reminders_completed(range(1, 30, 3))
+
+    queries = [
+        dict(page=2, per_page=7),
+        dict(sort='reminder_time', order='desc', per_page=5, page=3),
+        dict(status='pending', sort='reminder_time', start='2030-01-01 12:00:00', end='2030-01-02 06:00:00'),
+        dict(status='completed', order='desc', start='2030-01-01 12:00:00'),
+    ]
+    for query in queries:
+        csv_rows, csv_total = csv_handler.get_reminders_page(1, **query)
+        sqlite_rows, sqlite_total = sqlite_handler.get_reminders_page(1, **query)
+        assert csv_total == sqlite_total, query
+        assert [r['id'] for r in csv_rows] == [r['id'] for r in sqlite_rows], query
+    print("✅ Pages match the CSV backend")
+
+def test_unique_emails(temp_files):
+    """Both backends look emails up case-insensitively and refuse duplicates"""
+    csv_handler.init_csv_files()
+    for backend in (sqlite_handler, csv_handler):
+        user_id = backend.add_user('carol', 'Carol@Example.com', 'hash')
+        assert backend.get_user_by_email('carol@example.com').id == user_id
+        assert backend.get_user_by_email(' CAROL@EXAMPLE.COM ').id == user_id
+        try:
+            backend.add_user('carol2', 'carol@example.COM', 'hash')
+            assert False, 'duplicate email was accepted'
+        except records.EmailTakenError:
+            pass
+        assert backend.get_user_by_id(user_id + 1) is None
+
+        # Nor can another user switch to a taken email; keeping your own is fine
+        dave_id = backend.add_user('dave', 'dave@example.com', 'hash')
+        try:
+            backend.update_user_email_credentials(dave_id, ' CAROL@example.com', 'pw')
+            assert False, 'duplicate email was accepted on update'
+        except records.EmailTakenError:
+            pass
+        assert backend.update_user_email_credentials(dave_id, 'Dave@Example.com', 'pw')
+        assert backend.get_user_by_email('carol@example.com').id == user_id
+        assert backend.get_user_by_email('dave@example.com').id == dave_id
+
+    # The CSV index is rebuilt from the file by a fresh process-level table
+    csv_handler._users.signature = None
+    assert csv_handler.get_user_by_email('CAROL@example.com')['username'] == 'carol'
+    print("✅ Emails are unique and case-insensitive")
+
+def test_schema_upgrade(temp_files):
+    """A database made by an older version gets the new indexes and keeps its reminders"""
+    conn = sqlite_handler._connect()
+    conn.execute('DROP INDEX idx_users_email_key')
+    # The reminders table as versions before 4 made it
+    conn.execute('DROP TABLE reminders')
+    conn.execute(sqlite_handler.SCHEMA.split(';')[2].replace(' AUTOINCREMENT', ''))
+    conn.execute("INSERT INTO reminders (id, user_id, title, reminder_time, created_at) "
+                 "VALUES (5, 1, 'Old', '2030-01-01 09:00:00', '2029-01-01 09:00:00')")
+    conn.execute('PRAGMA user_version = 2')
+    conn.commit()
+    conn.close()
+    sqlite_handler._local.conn = None
+
+    conn = sqlite_handler._connect()
+    assert conn.execute('PRAGMA user_version').fetchone()[0] == sqlite_handler.SCHEMA_VERSION
+    names = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert {'idx_users_email_key', 'idx_reminders_user_id', 'idx_reminders_due'} <= names
+    assert sqlite_handler.get_reminder_by_id(5).title == 'Old'
+
+    # A deleted reminder's id is not handed out again
+    sqlite_handler.delete_reminder(5)
+    assert sqlite_handler.add_reminder(1, 'New', '', datetime(2030, 1, 1, 9, 0, 0)) == 6
+    print("✅ Older databases are upgraded")
+
+def test_indexes_are_used(temp_files):
+    """Lookups by email, user and due time are index searches"""
+    conn = sqlite_handler._connect()
+    assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    queries = [
+        ("SELECT * FROM users WHERE lower(trim(email)) = ?", ('a@example.com',)),
+        ("SELECT * FROM reminders WHERE user_id = ?", (1,)),
+        ("SELECT * FROM reminders WHERE is_completed = 0 AND reminder_time <= ?", ('2030-01-01 00:00:00',)),
+    ]
+    for sql, params in queries:
+        plan = ' '.join(row[-1] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql, params))
+        assert 'USING INDEX' in plan, plan
+    print("✅ Indexes are used")
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-q', '-s']))
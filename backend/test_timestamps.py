@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Test script for the fixed-format timestamp codec and the optional epoch column
+"""
+import os
+import sys
+import csv
+from datetime import datetime
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import csv_handler
+import timestamps
+from records import Reminder
+
+def test_parse_and_format():
+    """Only exact 'YYYY-MM-DD HH:MM:SS' strings parse, and they round-trip"""
+    when = timestamps.parse_time('2030-02-03 04:05:06')
+    assert when == datetime(2030, 2, 3, 4, 5, 6)
+    assert when == datetime.strptime('2030-02-03 04:05:06', timestamps.TIME_FORMAT)
+    assert timestamps.format_time(when) == '2030-02-03 04:05:06'
+    assert timestamps.format_time(datetime(2030, 2, 3, 4, 5, 6, 789)) == '2030-02-03 04:05:06'
+    assert timestamps.format_time(None) == ''
+
+    for bad in ('', None, '2030-02-03', '2030-02-03T04:05:06', '2030-02-30 04:05:06', '2030/02/03 04:05:06', 'tomorrow'):
+        assert timestamps.parse_time(bad) is None, bad
+
+    # Repeated values share one cached datetime
+    assert timestamps.parse_time('2030-02-03 04:05:06') is when
+    print("✅ Timestamps parse and format")
+
+def test_epoch():
+    """Epoch seconds follow the stored clock and round-trip"""
+    assert timestamps.to_epoch(datetime(1970, 1, 1, 0, 1, 0)) == 60
+    when = datetime(2030, 2, 3, 4, 5, 6)
+    assert timestamps.from_epoch(timestamps.to_epoch(when)) == when
+    assert timestamps.from_epoch(str(timestamps.to_epoch(when))) == when
+    print("✅ Epoch conversion works")
+
+def test_epoch_column(tmp_path):
+    """With the epoch column on, reminder_epoch is written and preferred on load"""
+    path = str(tmp_path / 'reminders.csv')
+    fields = csv_handler.REMINDER_FIELDS + ['reminder_epoch']
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        csv.writer(f).writerow(fields)
+
+    when = datetime(2030, 2, 3, 4, 5, 6)
+    table = csv_handler._ReminderTable(fields, Reminder, grouped=('user_id',)).load(path)
+    table.insert(Reminder(1, 7, 'Epoch', '', when, when))
+    with open(path, newline='', encoding='utf-8') as f:
+        rows = list(csv.DictReader(f))
+    assert rows[0]['reminder_time'] == '2030-02-03 04:05:06'
+    assert rows[0]['reminder_epoch'] == str(timestamps.to_epoch(when))
+    assert 'reminder_epoch' not in dict(table.get(1))
+
+    # The epoch wins over the string
+    rows[0]['reminder_time'] = 'garbled'
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(rows)
+    table = csv_handler._ReminderTable(fields, Reminder, grouped=('user_id',)).load(path)
+    assert table.get(1).reminder_time == when
+    print("✅ Epoch column is written and read")
+
+def test_epoch_column_on_existing_file(tmp_path):
+    """Switching the epoch column on for an existing file rewrites its header"""
+    path = str(tmp_path / 'reminders.csv')
+    when = datetime(2030, 2, 3, 4, 5, 6)
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=csv_handler.REMINDER_FIELDS, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerow(Reminder(1, 7, 'Before', '', when, when))
+
+    fields = csv_handler.REMINDER_FIELDS + ['reminder_epoch']
+    table = csv_handler._ReminderTable(fields, Reminder, grouped=('user_id',)).load(path)
+    table.insert(Reminder(2, 7, 'After', '', when, when))
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        rows = list(reader)
+    assert reader.fieldnames == fields
+    assert [row['title'] for row in rows] == ['Before', 'After']
+    assert all(row['reminder_epoch'] == str(timestamps.to_epoch(when)) for row in rows)
+    assert all(None not in row for row in rows)
+    print("✅ Epoch column is added to existing files")
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-q', '-s']))
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Test script for the user cache in front of the Flask-Login user loader
+"""
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import app as app_module
+import storage
+import user_cache
+
+def test_ttl_and_lru():
+    """Entries expire after the TTL and the least recently used go first"""
+    loads = []
+    cache = user_cache.UserCache(maxsize=2, ttl=0.2)
+    load = lambda user_id: (loads.append(user_id), f'user {user_id}')[1]
+
+    assert cache.get(1, load) == 'user 1'
+    assert cache.get('1', load) == 'user 1'
+    assert loads == ['1']
+
+    cache.get(2, load)
+    cache.get(1, load)
+    cache.get(3, load)  # evicts 2, the least recently used
+    assert len(cache) == 2
+    cache.get(1, load)
+    cache.get(2, load)
+    assert loads == ['1', '2', '3', '2']
+
+    time.sleep(0.25)
+    cache.get(1, load)
+    assert loads[-1] == '1'
+    print("✅ User cache honours TTL and size")
+
+def test_loader_uses_cache_and_invalidation(temp_files):
+    """Authenticated requests don't hit storage; credential updates are seen at once"""
+    user_id = storage.add_user('dana', 'dana@example.com', 'hash')
+    app = app_module.create_app()
+    app.config['TESTING'] = True
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+
+    lookups = []
+    original = app_module.get_user_by_id
+    app_module.get_user_by_id = lambda user_id: (lookups.append(user_id), original(user_id))[1]
+    try:
+        for _ in range(5):
+            assert client.get('/email_credentials').status_code == 200
+        assert lookups == [str(user_id)]
+
+        storage.update_user_email_credentials(user_id, 'dana@work.example', 'pw')
+        html = client.get('/dashboard').get_data(as_text=True)
+        assert len(lookups) == 2
+        assert 'dana' in html
+    finally:
+        app_module.get_user_by_id = original
+    print("✅ User loader is cached and invalidated")
+
+def test_user_from_session(temp_files):
+    """With USER_SESSION_CACHE on, the loader builds the user from the session"""
+    user_id = storage.add_user('erin', 'erin@example.com', 'hash')
+    app = app_module.create_app()
+    app.config['TESTING'] = True
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+        session['_user'] = {'id': str(user_id), 'username': 'erin', 'email': 'erin@example.com'}
+
+    original, app_module.USER_SESSION_CACHE = app_module.USER_SESSION_CACHE, True
+    original_get = app_module.get_user_by_id
+    app_module.get_user_by_id = None  # any storage hit from the loader would fail
+    try:
+        html = client.get('/dashboard').get_data(as_text=True)
+        assert 'erin' in html
+    finally:
+        app_module.USER_SESSION_CACHE = original
+        app_module.get_user_by_id = original_get
+    print("✅ User loader can serve from the session")
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-q', '-s']))
@@ -0,0 +1,58 @@
+"""
+Codec for the fixed-format timestamps we store ('YYYY-MM-DD HH:MM:SS').
+
+strptime re-interprets its format string through a regex on every call,
+which made it the hottest thing in loads and sweeps. Since the format never
+varies, parsing goes through datetime.fromisoformat after a cheap shape check
+and formatting through isoformat. Both are memoized: stored timestamps
+repeat a lot (batch imports share a created_at, reminders cluster on the
+hour), and a repeated value then also shares one datetime object.
+
+Epoch helpers convert to and from integer seconds since 1970-01-01 00:00:00
+on the same naive clock as the strings, so they sort and compare exactly
+like the stored values.
+"""
+import os
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+TIMESTAMP_CACHE_SIZE = int(os.environ.get('TIMESTAMP_CACHE_SIZE', 4096))
+EPOCH = datetime(1970, 1, 1)
+
+@lru_cache(maxsize=TIMESTAMP_CACHE_SIZE)
+def _parse(value):
+    # fromisoformat accepts other ISO shapes too; only take exactly TIME_FORMAT
+    if (len(value) != 19 or value[4] != '-' or value[7] != '-' or value[10] != ' '
+            or value[13] != ':' or value[16] != ':'):
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
+@lru_cache(maxsize=TIMESTAMP_CACHE_SIZE)
+def _format(value):
+    return value.isoformat(' ', 'seconds')
+
+def parse_time(value):
+    """A stored timestamp as a datetime, or None if it is empty or malformed"""
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        return value
+    return _parse(value)
+
+def format_time(value):
+    """A datetime in the stored format ('' for None); sub-second parts are dropped"""
+    if value is None:
+        return ''
+    return _format(value)
+
+def to_epoch(value):
+    """Whole seconds from EPOCH to ``value``"""
+    return (value - EPOCH) // timedelta(seconds=1)
+
+@lru_cache(maxsize=TIMESTAMP_CACHE_SIZE)
+def from_epoch(seconds):
+    return EPOCH + timedelta(seconds=int(seconds))
@@ -0,0 +1,62 @@
+"""
+Bounded TTL/LRU cache in front of the Flask-Login user loader.
+
+Every request that touches current_user goes through the loader. The cache
+keeps the built user objects (and misses) for USER_CACHE_TTL seconds, holding
+at most USER_CACHE_SIZE of them with the least recently used evicted first.
+storage.add_user and storage.update_user_email_credentials invalidate the
+entry they touch; the TTL bounds how long a change made by another worker
+process can go unseen.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE', 1024))
+USER_CACHE_TTL = float(os.environ.get('USER_CACHE_TTL', 60))
+
+class UserCache:
+    def __init__(self, maxsize=None, ttl=None):
+        self.maxsize = maxsize if maxsize is not None else USER_CACHE_SIZE
+        self.ttl = ttl if ttl is not None else USER_CACHE_TTL
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped on every invalidation, so a load that raced with one isn't cached
+        self._generation = 0
+
+    def get(self, user_id, load):
+        """The cached value for ``user_id``, or ``load(user_id)`` cached for next time"""
+        key = str(user_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                return entry[1]
+            generation = self._generation
+
+        value = load(key)
+
+        with self._lock:
+            if generation == self._generation and self.maxsize > 0:
+                self._entries[key] = (time.monotonic() + self.ttl, value)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._generation += 1
+            self._entries.pop(str(user_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+# Shared by the app's user loader and the storage write paths
+cache = UserCache()